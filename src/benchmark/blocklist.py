@@ -0,0 +1,101 @@
+"""
+Microbenchmark: compile, cache load and per-request matching cost of the content blocklist with 50k rules.
+
+Usage: python benchmark/blocklist.py [--rules 50000] [--requests 100000] [--list easylist.txt ...]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lib.blocklist import Blocklist
+
+
+WORDS = ('ads', 'track', 'pixel', 'banner', 'stats', 'metrics', 'promo', 'sponsor', 'beacon', 'analytics',
+         'cdn', 'static', 'img', 'video', 'api', 'assets', 'news', 'shop', 'media', 'widget')
+TYPES = ('script', 'image', 'stylesheet', 'xmlhttprequest', 'subdocument', 'media', 'font', 'other')
+
+
+def word():
+    return random.choice(WORDS) + str(random.randrange(10000))
+
+
+def synthetic_rules(count):
+    # Roughly the shape of EasyList plus EasyPrivacy: mostly domains, then paths, options and exceptions
+    for i in range(count):
+        kind = i % 20
+        if kind < 11:
+            yield '||%s.%s^' % (word(), random.choice(('com', 'net', 'io', 'co.uk')))
+        elif kind < 13:
+            yield '||%s.com^$third-party' % word()
+        elif kind < 17:
+            yield '/%s/%s*%s.' % (word(), random.choice(WORDS), random.choice(('js', 'gif', 'php')))
+        elif kind < 18:
+            yield '-%s-%dx%d.' % (word(), random.choice((300, 728, 160)), random.choice((250, 90, 600)))
+        elif kind < 19:
+            yield '/%s^$script,domain=%s.com|~%s.org' % (word(), word(), word())
+        else:
+            yield '@@||%s.com/%s^' % (word(), word())
+
+
+def synthetic_requests(count, rules):
+    # One third aimed at rule domains, the rest ordinary traffic
+    domains = [rule[2:].split('^')[0] for rule in rules if rule.startswith('||')]
+    for i in range(count):
+        if i % 3 == 0:
+            url = 'https://%s/%s/%s.js?v=%d' % (random.choice(domains).split('/')[0], word(), word(), i)
+        else:
+            url = 'https://%s.example.org/%s/%s/%s.%s?id=%d' % (word(), word(), random.choice(WORDS), word(),
+                                                              random.choice(('js', 'css', 'png', 'html')), i)
+        yield url, 'https://www.%s.com/article/%d' % (word(), i), random.choice(TYPES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rules', type=int, default=50000, help='Synthetic rules, ignored with --list')
+    parser.add_argument('--requests', type=int, default=100000, help='Requests to match')
+    parser.add_argument('--list', nargs='*', default=[], help='Real filter list files to use instead')
+    args = parser.parse_args()
+
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = args.list
+        if not paths:
+            paths = [os.path.join(tmp, 'rules.txt')]
+            with open(paths[0], 'w') as file:
+                file.write('\n'.join(synthetic_rules(args.rules)))
+        with open(paths[0]) as file:
+            rules = file.read().splitlines()
+
+        cache_dir = os.path.join(tmp, 'compiled')
+        start = time.perf_counter()
+        blocklist = Blocklist.load(paths, cache_dir)
+        compile_time = time.perf_counter() - start
+        start = time.perf_counter()
+        blocklist = Blocklist.load(paths, cache_dir)
+        load_time = time.perf_counter() - start
+
+        requests = list(synthetic_requests(args.requests, rules))
+        samples = []
+        blocked = 0
+        for url, page_url, resource_type in requests:
+            start = time.perf_counter()
+            blocked += blocklist.match(url, page_url, resource_type)
+            samples.append(time.perf_counter() - start)
+
+    samples.sort()
+    print('%d rules compiled (%d skipped): compile %.2f s, load from cache %.3f s' % (
+        blocklist.count, blocklist.skipped, compile_time, load_time))
+    print('%d requests, %d blocked: mean %.1f us, p50 %.1f us, p95 %.1f us, p99 %.1f us per request' % (
+        len(samples), blocked, statistics.fmean(samples) * 1e6, samples[len(samples) // 2] * 1e6,
+        samples[int(len(samples) * 0.95)] * 1e6, samples[int(len(samples) * 0.99)] * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Microbenchmark: Bookmark.is_bookmarked through the in-memory URL index against SQL lookups, with 100k bookmarks.
+
+Usage: python benchmark/bookmark_index.py [--bookmarks 100000] [--lookups 20000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lib.bookmark import Bookmark
+from lib.storage import Storage
+
+
+def per_lookup(func, urls):
+    start = time.perf_counter()
+    for url in urls:
+        func(url)
+    return (time.perf_counter() - start) / len(urls) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bookmarks', type=int, default=100000, help='Bookmarks in the database')
+    parser.add_argument('--lookups', type=int, default=20000, help='is_bookmarked calls per case')
+    args = parser.parse_args()
+
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bookmark.db')
+        bookmark_manager = Bookmark(db_path)
+        with bookmark_manager.storage.transaction() as cursor:
+            cursor.executemany('INSERT INTO bookmark (title, url) VALUES (?, ?)',
+                               [('Page %d' % i, 'https://site%d.example.com/page/%d' % (i % 997, i))
+                                for i in range(args.bookmarks)])
+
+        # Startup cost: one scan of the table into the index
+        Bookmark.indexes.clear()
+        start = time.perf_counter()
+        bookmark_manager = Bookmark(db_path)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        # Half hits, half misses, with URL variants the index normalizes
+        urls = []
+        for _ in range(args.lookups):
+            i = random.randrange(args.bookmarks * 2)
+            urls.append('http://SITE%d.example.com/page/%d/' % (i % 997, i))
+
+        conn = sqlite3.connect(db_path)
+        indexed = per_lookup(bookmark_manager.is_bookmarked, urls)
+        sql_index = per_lookup(lambda url: conn.execute('SELECT id FROM bookmark WHERE url = ?', (url,)).fetchone(), urls)
+        conn.execute('DROP INDEX idx_bookmark_url')
+        sql_scan = per_lookup(lambda url: conn.execute('SELECT id FROM bookmark WHERE url = ?', (url,)).fetchone(),
+                              urls[:max(1, args.lookups // 100)])
+        conn.close()
+        Storage.close_all()
+
+    print('index load for %d bookmarks: %.1f ms' % (args.bookmarks, load_ms))
+    print('%-28s %12s' % ('lookup', 'us/call'))
+    print('%-28s %12.2f' % ('in-memory index', indexed))
+    print('%-28s %12.2f' % ('SQL with url index', sql_index))
+    print('%-28s %12.2f' % ('SQL full scan', sql_scan))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Synthetic data: reproducible history, bookmark and folder datasets of realistic shape for benchmarks.
+
+Usage: python benchmark/dataset.py DIR [--visits 100000] [--bookmarks 10000] [--folders 500] [--seed 1]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lib.bookmark import Bookmark
+from lib.favicon import Favicon
+from lib.history import History
+
+
+WORDS = ('python', 'release', 'notes', 'weather', 'dhaka', 'news', 'football', 'recipe', 'rice', 'travel',
+         'guide', 'review', 'laptop', 'phone', 'price', 'music', 'video', 'tutorial', 'sqlite', 'browser',
+         'privacy', 'security', 'update', 'science', 'space', 'health', 'market', 'stock', 'election', 'movie',
+         'book', 'history', 'map', 'train', 'ticket', 'hotel', 'design', 'photo', 'garden', 'coffee')
+TLDS = ('com', 'com', 'com', 'org', 'net', 'io', 'com.bd', 'co.uk', 'dev')
+FOLDER_NAMES = ('Work', 'Reading', 'Recipes', 'Travel', 'News', 'Tools', 'Music', 'Projects', 'Shopping', 'Research')
+# Folders are nested at most this deep, like a hand-made tree
+MAX_DEPTH = 4
+
+
+def make_pages(rng, count, sites):
+    # Distinct (url, title) pairs spread over a number of sites
+    domains = ['%s%s.%s' % (rng.choice(WORDS), rng.choice(WORDS) if rng.random() < 0.5 else '', rng.choice(TLDS))
+               for _ in range(sites)]
+    pages = []
+    for i in range(count):
+        words = rng.sample(WORDS, rng.randint(2, 5))
+        domain = domains[i % sites]
+        pages.append(('https://%s%s/%s/%d' % ('www.' if i % 3 == 0 else '', domain, '-'.join(words), i),
+                      '%s - %s' % (' '.join(words).capitalize(), domain)))
+    return pages
+
+
+def fill_history(history_manager, visits, seed=1, days=365, now=None):
+    """
+    Insert visits to up to visits / 4 pages, a few pages taking most visits, spread over the last days.
+
+    Rows are written straight to the tables in one transaction, so the full-text index is filled by
+    its triggers as it is in use. Visit ids grow with time, as when they are recorded.
+
+    :param history_manager: History on the database to fill, normally empty.
+    :param visits: Number of visits.
+    :param seed: Random seed; the same seed gives the same rows.
+    :param days: Period covered by the visits.
+    :param now: Unix time of the latest visit, the current time when None.
+    :return: List of the page URLs, most visited first.
+    :since: 1.0.0
+    """
+    rng = random.Random(seed)
+    now = int(now or time.time())
+    pages = make_pages(rng, max(1, visits // 4), max(1, visits // 100))
+
+    # Zipf-like popularity: page i is visited about 1 / (i + 1) as often as the first one
+    weights = []
+    total = 0.0
+    for i in range(len(pages)):
+        total += 1.0 / (i + 1)
+        weights.append(total)
+    url_ids = rng.choices(range(1, len(pages) + 1), cum_weights=weights, k=visits)
+    times = sorted(rng.randrange(now - days * 86400, now + 1) for _ in range(visits))
+
+    counts = [0] * (len(pages) + 1)
+    last_visit = [None] * (len(pages) + 1)
+    for url_id, visit_time in zip(url_ids, times):
+        counts[url_id] += 1
+        last_visit[url_id] = visit_time
+
+    history_manager.flush()
+    with history_manager.storage.transaction() as cursor:
+        cursor.executemany('INSERT INTO urls (id, url, title, visit_count, last_visit) VALUES (?, ?, ?, ?, ?)',
+                           [(url_id, url, title, counts[url_id], last_visit[url_id])
+                            for url_id, (url, title) in enumerate(pages, 1) if counts[url_id]])
+        cursor.executemany('INSERT INTO visits (url_id, time) VALUES (?, ?)', zip(url_ids, times))
+    return [url for url_id, (url, _) in enumerate(pages, 1) if counts[url_id]]
+
+
+def fill_bookmarks(bookmark_manager, bookmarks, folders, seed=1, urls=None):
+    """
+    Insert a folder tree and bookmarks spread over it, a tenth of them outside any folder.
+
+    :param bookmark_manager: Bookmark on the database to fill, normally empty.
+    :param bookmarks: Number of bookmarks.
+    :param folders: Number of folders, nested at most MAX_DEPTH deep.
+    :param seed: Random seed; the same seed gives the same rows.
+    :param urls: Page URLs to bookmark some of, e.g. from fill_history(), so bookmarks overlap history.
+    :return: List of the folder ids.
+    :since: 1.0.0
+    """
+    rng = random.Random(seed + 1)
+    stamp = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    rows = []
+    depths = {}
+    for folder_id in range(1, folders + 1):
+        parents = [parent for parent in rng.sample(range(1, folder_id), min(folder_id - 1, 3))
+                   if depths[parent] < MAX_DEPTH]
+        parent_id = parents[0] if parents and rng.random() < 0.7 else None
+        depths[folder_id] = depths[parent_id] + 1 if parent_id else 1
+        rows.append((folder_id, '%s %d' % (rng.choice(FOLDER_NAMES), folder_id), parent_id, stamp))
+
+    pages = make_pages(rng, bookmarks, max(1, bookmarks // 20))
+    if urls:
+        pages = [(rng.choice(urls), title) if rng.random() < 0.3 else (url, title) for url, title in pages]
+
+    with bookmark_manager.storage.transaction() as cursor:
+        cursor.executemany('INSERT INTO folder (id, name, parent_id, time) VALUES (?, ?, ?, ?)', rows)
+        cursor.executemany('INSERT INTO bookmark (title, url, time, folder_id) VALUES (?, ?, ?, ?)',
+                           [(title, url, stamp, rng.randint(1, folders) if folders and rng.random() < 0.9 else None)
+                            for url, title in pages])
+
+    # The URL index is shared per database file; rebuild it from the new rows
+    with Bookmark.indexes_lock:
+        Bookmark.indexes.pop(bookmark_manager.storage.db_path, None)
+    bookmark_manager.index = bookmark_manager.load_index()
+    return list(range(1, folders + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', help='Directory for history.db, bookmark.db and favicon.db')
+    parser.add_argument('--visits', type=int, default=100000, help='History visits')
+    parser.add_argument('--bookmarks', type=int, default=10000, help='Bookmarks')
+    parser.add_argument('--folders', type=int, default=500, help='Bookmark folders')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    for name in ('history.db', 'bookmark.db'):
+        if os.path.exists(os.path.join(args.directory, name)):
+            sys.exit(f"{name} already exists in {args.directory}")
+
+    favicon_manager = Favicon(os.path.join(args.directory, 'favicon.db'))
+    start = time.perf_counter()
+    urls = fill_history(History(os.path.join(args.directory, 'history.db'), favicon_manager), args.visits, args.seed)
+    print('history: %d visits to %d pages in %.1f s' % (args.visits, len(urls), time.perf_counter() - start))
+    start = time.perf_counter()
+    fill_bookmarks(Bookmark(os.path.join(args.directory, 'bookmark.db'), favicon_manager), args.bookmarks,
+                   args.folders, args.seed, urls)
+    print('bookmarks: %d in %d folders in %.1f s' % (args.bookmarks, args.folders, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark: latency of internal pages over the loopback Flask server against the in-process jaal:// dispatch.
+
+Usage: python benchmark/internal_pages.py [--requests 500] [--data DIR]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from werkzeug.serving import make_server
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lib.scheme import dispatch
+
+
+PAGES = ('jaal://home', 'jaal://history', 'jaal://get_history?limit=100', 'jaal://get_bookmark', 'jaal://history/css/main.css')
+
+
+def http_latency(base_url, url):
+    path = url[len('jaal://'):]
+    start = time.perf_counter()
+    with urllib.request.urlopen(base_url + path) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def scheme_latency(client, app, url):
+    start = time.perf_counter()
+    dispatch(client, app, url)
+    return time.perf_counter() - start
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.95) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500, help='Requests per page and transport')
+    parser.add_argument('--data', help='Databases to serve, e.g. made by benchmark/dataset.py; empty ones by default')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Set before the server is imported, so it never opens the user's databases
+        os.environ['JAAL_DATA_DIR'] = os.path.abspath(args.data) if args.data else scratch
+        from server.app import app
+        run(app, args.requests)
+
+
+def run(app, requests):
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = 'http://127.0.0.1:%d/' % server.server_port
+    client = app.test_client()
+
+    print('%-32s %14s %14s %14s %14s' % ('page', 'http p50 ms', 'http p95 ms', 'jaal p50 ms', 'jaal p95 ms'))
+    for url in PAGES:
+        http = summarize([http_latency(base_url, url.replace('history/css', 'css')) for _ in range(requests)])
+        scheme = summarize([scheme_latency(client, app, url) for _ in range(requests)])
+        print('%-32s %14.3f %14.3f %14.3f %14.3f' % (url, http[0], http[1], scheme[0], scheme[1]))
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Microbenchmark: address bar suggestion latency per keystroke over a large history.
+
+Usage: python benchmark/omnibox.py [--urls 500000] [--queries 200]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lib.bookmark import Bookmark
+from lib.history import History
+from lib.omnibox import Omnibox
+from lib.storage import Storage
+
+
+WORDS = ('news', 'mail', 'docs', 'shop', 'video', 'wiki', 'blog', 'maps', 'code', 'music', 'forum', 'cloud')
+
+
+def synthetic_urls(count):
+    now = int(time.time())
+    for i in range(count):
+        site = '%s%d.example.com' % (WORDS[i % len(WORDS)], i % 5000)
+        url = 'https://%s%s/%s/%d' % ('www.' if i % 3 == 0 else '', site, WORDS[(i // 7) % len(WORDS)], i)
+        title = '%s %s page %d' % (WORDS[(i // 3) % len(WORDS)].title(), WORDS[(i // 11) % len(WORDS)], i)
+        # Few URLs are visited often, most once
+        yield url, title, int(random.paretovariate(1.2)), now - random.randrange(365 * 24 * 3600)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--urls', type=int, default=500000, help='History URLs in the database')
+    parser.add_argument('--queries', type=int, default=200, help='Typed URLs, each measured keystroke by keystroke')
+    args = parser.parse_args()
+
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        history_manager = History(os.path.join(tmp, 'history.db'))
+        bookmark_manager = Bookmark(os.path.join(tmp, 'bookmark.db'))
+        rows = list(synthetic_urls(args.urls))
+        with history_manager.storage.transaction() as cursor:
+            cursor.executemany('INSERT INTO urls (url, title, visit_count, last_visit) VALUES (?, ?, ?, ?)', rows)
+
+        omnibox = Omnibox(history_manager, bookmark_manager)
+        start = time.perf_counter()
+        omnibox.load(background=False)
+        build = time.perf_counter() - start
+
+        # Type real URLs and titles one character at a time, as the address bar sees them
+        samples = []
+        for _ in range(args.queries):
+            url, title, _, _ = random.choice(rows)
+            typed = random.choice((url.split('://', 1)[1], title.lower()))[:24]
+            for end in range(1, len(typed) + 1):
+                start = time.perf_counter()
+                omnibox.suggest(typed[:end])
+                samples.append(time.perf_counter() - start)
+
+        # Incremental updates while the index is live
+        start = time.perf_counter()
+        for url, title, _, _ in rows[:10000]:
+            omnibox.record_visit(url, title)
+        visit = (time.perf_counter() - start) / 10000
+
+        Storage.close_all()
+
+    samples.sort()
+    print('index build for %d URLs: %.2f s' % (args.urls, build))
+    print('suggest per keystroke over %d keystrokes: p50 %.3f ms, p95 %.3f ms, p99 %.3f ms, max %.3f ms' % (
+        len(samples), statistics.median(samples) * 1000, samples[int(len(samples) * 0.95)] * 1000,
+        samples[int(len(samples) * 0.99)] * 1000, samples[-1] * 1000))
+    print('record_visit on an indexed URL: %.1f us' % (visit * 1e6))
+
+
+if __name__ == '__main__':
+    main()
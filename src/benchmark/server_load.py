@@ -0,0 +1,84 @@
+"""
+Load test: requests per second of the internal server on /get_history and /get_bookmark.
+
+Usage: python benchmark/server_load.py [--engine threaded|asgi] [--clients 8] [--seconds 5] [--data DIR]
+"""
+
+import argparse
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server.runner import ENGINES, ServerThread
+
+
+def worker(port, path, deadline, counts, errors):
+    # One keep-alive connection per client, like a page issuing several API calls
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    done = 0
+    while time.perf_counter() < deadline:
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                done += 1
+            else:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(e)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.close()
+    counts.append(done)
+
+
+def load(port, path, clients, seconds):
+    counts = []
+    errors = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=worker, args=(port, path, deadline, counts, errors)) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--engine', choices=ENGINES, default='threaded', help='Server engine')
+    parser.add_argument('--port', type=int, default=5055, help='Port to listen on')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent keep-alive clients')
+    parser.add_argument('--seconds', type=float, default=5, help='Duration per route')
+    parser.add_argument('--data', help='Databases to serve, e.g. made by benchmark/dataset.py; empty ones by default')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Set before the server is imported, so it never opens the user's databases
+        os.environ['JAAL_DATA_DIR'] = os.path.abspath(args.data) if args.data else scratch
+        from server.app import app
+        run(app, args)
+
+
+def run(app, args):
+    server = ServerThread(app, port=args.port, engine=args.engine)
+    server.start()
+    if not server.wait_ready():
+        sys.exit(f"Server did not start: {server.error}")
+
+    print('%-36s %12s %8s' % ('route (%s, %d clients)' % (args.engine, args.clients), 'req/s', 'errors'))
+    for path in ('/get_history?limit=100', '/get_bookmark'):
+        rate, errors = load(args.port, path, args.clients, args.seconds)
+        print('%-36s %12.0f %8d' % (path, rate, errors))
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
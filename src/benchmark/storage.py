@@ -0,0 +1,80 @@
+"""
+Benchmark: pooled Storage connections against the connect-per-call pattern.
+
+Usage: python benchmark/storage.py [--ops 2000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lib.storage import Storage
+
+
+SCHEMA = 'CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, url TEXT, time TEXT, favicon BLOB)'
+INSERT = 'INSERT INTO history (title, url, time, favicon) VALUES (?, ?, ?, ?)'
+SELECT = 'SELECT COUNT(*) FROM history WHERE url = ?'
+
+
+def connect_per_call_insert(db_path, i):
+    conn = sqlite3.connect(db_path)
+    conn.execute(INSERT, ('Title %d' % i, 'https://example.com/%d' % i, '2024-01-01 00:00:00', None))
+    conn.commit()
+    conn.close()
+
+
+def connect_per_call_select(db_path, i):
+    conn = sqlite3.connect(db_path)
+    conn.execute(SELECT, ('https://example.com/%d' % i,)).fetchone()
+    conn.close()
+
+
+def pooled_insert(storage, i):
+    with storage.transaction() as cursor:
+        cursor.execute(INSERT, ('Title %d' % i, 'https://example.com/%d' % i, '2024-01-01 00:00:00', None))
+
+
+def pooled_select(storage, i):
+    storage.execute(SELECT, ('https://example.com/%d' % i,)).fetchone()
+
+
+def measure(func, target, ops):
+    start = time.perf_counter()
+    for i in range(ops):
+        func(target, i)
+    return ops / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ops', type=int, default=2000, help='Operations per case')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_path = os.path.join(tmp, 'plain.db')
+        conn = sqlite3.connect(plain_path)
+        conn.execute(SCHEMA)
+        conn.close()
+
+        storage = Storage.get(os.path.join(tmp, 'pooled.db'))
+        with storage.transaction() as cursor:
+            cursor.execute(SCHEMA)
+
+        results = [
+            ('insert', measure(connect_per_call_insert, plain_path, args.ops), measure(pooled_insert, storage, args.ops)),
+            ('select', measure(connect_per_call_select, plain_path, args.ops), measure(pooled_select, storage, args.ops)),
+        ]
+        Storage.close_all()
+
+    print('%-8s %18s %18s %8s' % ('case', 'connect/call op/s', 'pooled op/s', 'speedup'))
+    for name, plain, pooled in results:
+        print('%-8s %18.0f %18.0f %7.1fx' % (name, plain, pooled, pooled / plain))
+
+
+if __name__ == '__main__':
+    main()
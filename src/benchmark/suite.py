@@ -0,0 +1,278 @@
+"""
+Benchmark suite: History, Bookmark and Setting methods and their Flask routes on synthetic data, as JSON.
+
+Each size is the number of history visits; the dataset also has size / 10 bookmarks in size / 1000
+folders (at least 10), generated by benchmark/dataset.py with a fixed seed. Results hold the
+commit, so runs of two commits can be compared with --compare.
+
+Usage: python benchmark/suite.py [--sizes 10000 100000] [--repeat 20] [--output results.json] [--compare baseline.json]
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark.dataset import fill_bookmarks, fill_history
+from lib.bookmark import Bookmark
+from lib.favicon import Favicon
+from lib.history import History
+from lib.setting import Setting
+
+
+# A word in about one title in ten, for the full-text cases
+QUERY = 'python'
+# Pages of the history list, as history.html asks for them
+PAGE = 100
+
+
+def environment():
+    # What the numbers depend on besides the code
+    root = os.path.join(os.path.dirname(__file__), '..')
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'processor': platform.machine(),
+    }
+
+
+def percentile(values, fraction):
+    # Nearest rank of sorted values
+    return values[min(len(values) - 1, max(math.ceil(fraction * len(values)) - 1, 0))]
+
+
+def measure(func, repeat):
+    # One untimed call warms the statement and page caches, like a browser that has been running
+    func(0)
+    gc.collect()
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'samples': len(samples),
+        'min_ms': round(samples[0], 4),
+        'p50_ms': round(percentile(samples, 0.5), 4),
+        'p95_ms': round(percentile(samples, 0.95), 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+    }
+
+
+def once(func):
+    start = time.perf_counter()
+    func()
+    elapsed = round((time.perf_counter() - start) * 1000, 4)
+    return {'samples': 1, 'min_ms': elapsed, 'p50_ms': elapsed, 'p95_ms': elapsed, 'mean_ms': elapsed}
+
+
+def request(client, method, path, data=None):
+    response = client.open(path, method=method, json=data)
+    if response.status_code != 200:
+        raise RuntimeError(f"{method} {path} returned {response.status_code}")
+    return response.get_data()
+
+
+def cases(history_manager, bookmark_manager, setting_manager, client, urls, visits, folder_ids):
+    # (name, function of the iteration number); writes come after the reads of the same tables
+    week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+    middle = visits // 2
+    roots = [folder[0] for folder in bookmark_manager.get_folder(None)]
+
+    def add_visits(i):
+        for j in range(PAGE):
+            history_manager.add_history_entry('Page %d' % j, urls[(i * PAGE + j) % len(urls)],
+                                              datetime.now().strftime('%Y-%m-%d %H:%M:%S'), None)
+        history_manager.flush()
+
+    def add_folder_route(i):
+        request(client, 'POST', '/add_folder', {'name': 'Benchmark %d' % i, 'parent_id': roots[0] if roots else None})
+
+    def remove_folder_route(i):
+        # The oldest folder left, at first a generated top-level folder with its whole subtree and bookmarks
+        folder_id = bookmark_manager.storage.execute('SELECT MIN(id) FROM folder').fetchone()[0]
+        if folder_id is None:
+            bookmark_manager.add_folder('Benchmark %d' % i)
+            folder_id = bookmark_manager.storage.execute('SELECT MIN(id) FROM folder').fetchone()[0]
+        request(client, 'POST', '/remove_folder', {'id': folder_id})
+
+    def folder(i):
+        return folder_ids[(i * 7919) % len(folder_ids)]
+
+    return [
+        ('history.get_history first page', lambda i: history_manager.get_history(limit=PAGE)),
+        ('history.get_history middle page', lambda i: history_manager.get_history(before_id=middle, limit=PAGE)),
+        ('history.get_history query', lambda i: history_manager.get_history(limit=PAGE, query=QUERY)),
+        ('history.get_history last week', lambda i: history_manager.get_history(limit=PAGE, start_time=week_ago)),
+        ('history.search', lambda i: history_manager.search(QUERY)),
+        ('history.is_in_history', lambda i: history_manager.is_in_history(urls[(i * 7919) % len(urls)])),
+        ('GET /get_history', lambda i: request(client, 'GET', '/get_history?limit=%d' % PAGE)),
+        ('GET /get_history middle page',
+         lambda i: request(client, 'GET', '/get_history?limit=%d&before_id=%d' % (PAGE, middle))),
+        ('GET /get_history query', lambda i: request(client, 'GET', '/get_history?limit=%d&q=%s' % (PAGE, QUERY))),
+        ('GET /get_history last week',
+         lambda i: request(client, 'GET', '/get_history?limit=%d&from=%s' % (PAGE, week_ago))),
+        ('GET /search', lambda i: request(client, 'GET', '/search?q=%s' % QUERY)),
+        ('history.add_history_entry x%d + flush' % PAGE, add_visits),
+
+        ('bookmark.get_bookmark root', lambda i: bookmark_manager.get_bookmark(None)),
+        ('bookmark.get_bookmark folder', lambda i: bookmark_manager.get_bookmark(folder(i))),
+        ('bookmark.get_folder', lambda i: bookmark_manager.get_folder(None)),
+        ('bookmark.get_tree', lambda i: bookmark_manager.get_tree()),
+        ('bookmark.get_tree folder', lambda i: bookmark_manager.get_tree(folder(i))),
+        ('bookmark.search', lambda i: bookmark_manager.search(QUERY)),
+        ('bookmark.is_bookmarked', lambda i: bookmark_manager.is_bookmarked(urls[(i * 7919) % len(urls)])),
+        ('GET /get_bookmark', lambda i: request(client, 'GET', '/get_bookmark')),
+        ('GET /get_bookmark folder', lambda i: request(client, 'GET', '/get_bookmark?folder_id=%d' % folder(i))),
+        ('GET /get_folder', lambda i: request(client, 'GET', '/get_folder')),
+        ('GET /get_tree', lambda i: request(client, 'GET', '/get_tree')),
+        ('GET /get_tree folder', lambda i: request(client, 'GET', '/get_tree?folder_id=%d' % folder(i))),
+        ('bookmark.add_bookmark', lambda i: bookmark_manager.add_bookmark(
+            'Benchmark %d' % i, 'https://bench.example.com/%d' % i, folder_id=folder(i))),
+        ('POST /add_bookmark', lambda i: request(client, 'POST', '/add_bookmark', {
+            'title': 'Benchmark %d' % i, 'url': 'https://bench.example.org/%d' % i, 'folder_id': folder(i)})),
+        ('POST /add_folder', add_folder_route),
+        ('POST /remove_folder', remove_folder_route),
+
+        ('setting.get_setting', lambda i: setting_manager.get_setting('homepage')),
+        ('setting.get_all_setting', lambda i: setting_manager.get_all_setting()),
+        ('setting.update_setting + flush', lambda i: setting_manager.update_setting(
+            'mode', ('dark', 'light')[i % 2], defer=False)),
+        ('GET /get_setting', lambda i: request(client, 'GET', '/get_setting')),
+        ('GET /get_setting name', lambda i: request(client, 'GET', '/get_setting?name=homepage')),
+        ('POST /update_setting', lambda i: request(client, 'POST', '/update_setting', {'mode': ('dark', 'light')[i % 2]})),
+    ]
+
+
+def run_size(size, repeat, seed, log):
+    bookmarks = size // 10
+    folders = max(10, size // 1000)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        favicon_manager = Favicon(os.path.join(tmp, 'favicon.db'))
+        history_manager = History(os.path.join(tmp, 'history.db'), favicon_manager)
+        bookmark_manager = Bookmark(os.path.join(tmp, 'bookmark.db'), favicon_manager)
+        setting_manager = Setting(os.path.join(tmp, 'bookmark.db'))
+
+        start = time.perf_counter()
+        urls = fill_history(history_manager, size, seed)
+        folder_ids = fill_bookmarks(bookmark_manager, bookmarks, folders, seed, urls)
+        log('%d visits, %d bookmarks in %d folders generated in %.1f s' % (
+            size, bookmarks, folders, time.perf_counter() - start))
+
+        # Imported here, once JAAL_DATA_DIR is set, so the server never opens the user's databases;
+        # the routes use the module's managers, which are pointed at the generated databases
+        from server import app as web
+        web.favicon_manager = favicon_manager
+        web.history_manager = history_manager
+        web.bookmark_manager = bookmark_manager
+        web.setting_manager = setting_manager
+        client = web.app.test_client()
+
+        def record(name, stats):
+            results.append(dict({'size': size, 'name': name}, **stats))
+            log('  %-44s p50 %10.3f ms   p95 %10.3f ms' % (name, stats['p50_ms'], stats['p95_ms']))
+
+        for name, func in cases(history_manager, bookmark_manager, setting_manager, client, urls, size, folder_ids):
+            record(name, measure(func, repeat))
+
+        # Destructive, so timed once on the full dataset
+        record('POST /clear_history', once(lambda: request(client, 'POST', '/clear_history')))
+
+        for storage in (history_manager.storage, bookmark_manager.storage, favicon_manager.storage):
+            storage.close()
+        for cache in (Bookmark.indexes, Setting.caches):
+            for path in [path for path in cache if path.startswith(os.path.abspath(tmp))]:
+                del cache[path]
+    return results
+
+
+def compare(results, baseline, threshold, log):
+    # Median time of each case against the baseline; small absolute differences are noise
+    before = {(entry['size'], entry['name']): entry for entry in baseline['results']}
+    regressions = 0
+    log('%-8s %-44s %10s %10s %8s' % ('size', 'case', 'base ms', 'now ms', 'ratio'))
+    for entry in results['results']:
+        old = before.get((entry['size'], entry['name']))
+        if old is None:
+            continue
+        ratio = entry['p50_ms'] / old['p50_ms'] if old['p50_ms'] else float('inf')
+        slower = ratio > 1 + threshold and entry['p50_ms'] - old['p50_ms'] > 0.05
+        regressions += slower
+        log('%-8d %-44s %10.3f %10.3f %7.2fx%s' % (
+            entry['size'], entry['name'], old['p50_ms'], entry['p50_ms'], ratio, '  slower' if slower else ''))
+    log('baseline %s, now %s: %d slower by more than %d%%' % (
+        (baseline['environment'].get('commit') or '?')[:10], (results['environment'].get('commit') or '?')[:10],
+        regressions, threshold * 100))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                        help='History visits per dataset, e.g. 10000 100000 1000000')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed calls per case')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed of the datasets')
+    parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+    parser.add_argument('--input', help='Compare these saved results instead of running the suite')
+    parser.add_argument('--compare', help='Baseline results to compare with; exits with 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Slowdown of p50 counted as a regression')
+    args = parser.parse_args()
+
+    def log(line):
+        print(line, file=sys.stderr)
+
+    if args.input:
+        with open(args.input) as file:
+            results = json.load(file)
+    else:
+        results = {
+            'environment': environment(),
+            'config': {'sizes': args.sizes, 'repeat': args.repeat, 'seed': args.seed},
+            'results': [],
+        }
+        with tempfile.TemporaryDirectory() as scratch:
+            os.environ['JAAL_DATA_DIR'] = scratch
+            for size in args.sizes:
+                results['results'].extend(run_size(size, args.repeat, args.seed, log))
+
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(results, file, indent=2)
+            log(f"Results written to {args.output}")
+        else:
+            json.dump(results, sys.stdout, indent=2)
+            print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold, log):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Microbenchmark: cost of a dark/light mode toggle (Ctrl+M) with regenerated versus cached stylesheets.
+
+Usage: QT_QPA_PLATFORM=offscreen python benchmark/theme.py [--toggles 20] [--tabs 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import qdarktheme
+from PyQt6.QtWidgets import QApplication, QLineEdit, QMainWindow, QTabWidget, QTextEdit, QToolBar
+
+from lib.theme import CUSTOM_QSS, ThemeCache
+
+
+def window(tabs):
+    # The widgets of the browser window, with plain widgets standing in for the web views
+    main = QMainWindow()
+    toolbar = QToolBar()
+    for name in ('Back', 'Forward', 'Reload', 'Stop', 'Home', 'New Tab', 'Add Bookmark'):
+        toolbar.addAction(name)
+    toolbar.addWidget(QLineEdit())
+    main.addToolBar(toolbar)
+    tab_widget = QTabWidget()
+    for i in range(tabs):
+        tab_widget.addTab(QTextEdit(), 'Tab %d' % i)
+    main.setCentralWidget(tab_widget)
+    for name in ('File', 'Edit', 'View', 'Help'):
+        main.menuBar().addMenu(name).addAction(name)
+    main.statusBar().showMessage('Ready')
+    main.show()
+    return main
+
+
+def regenerate(app, mode):
+    # What apply_mode did before: rebuild the palette, then append the custom QSS to the current sheet
+    app.setStyleSheet(qdarktheme.load_stylesheet(mode))
+    if mode == 'dark':
+        app.setStyleSheet(app.styleSheet() + CUSTOM_QSS['dark'])
+
+
+def toggles(app, count, apply):
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        apply(app, ('dark', 'light')[i % 2])
+        app.processEvents()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--toggles', type=int, default=20, help='Mode toggles per variant')
+    parser.add_argument('--tabs', type=int, default=20, help='Tabs in the window')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    main_window = window(args.tabs)
+
+    before = toggles(app, args.toggles, regenerate)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        ThemeCache(tmp).stylesheet('dark')
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        ThemeCache(tmp).stylesheet('dark')
+        load = time.perf_counter() - start
+
+        app.setStyleSheet('')
+        theme = ThemeCache(tmp)
+        theme.stylesheet('light')
+        sizes = set()
+        after = toggles(app, args.toggles, lambda app, mode: (theme.apply(app, mode), sizes.add(len(app.styleSheet()))))
+
+    main_window.close()
+    print('dark stylesheet: build %.1f ms, load from disk cache %.2f ms' % (build * 1000, load * 1000))
+    for name, samples in (('regenerated', before), ('cached', after)):
+        print('%-11s toggle over %d tabs: mean %.1f ms, p50 %.1f ms, max %.1f ms' % (
+            name, args.tabs, statistics.fmean(samples) * 1000, statistics.median(samples) * 1000, max(samples) * 1000))
+    print('cached stylesheet sizes seen: %s characters' % sorted(sizes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,426 @@
+import hashlib
+import os
+import pickle
+import re
+import sys
+import time
+import urllib.request
+from collections import deque
+
+
+# Bump when the compiled layout changes so stale caches are not loaded
+COMPILER_VERSION = 1
+
+TYPES = ('script', 'image', 'stylesheet', 'object', 'xmlhttprequest', 'subdocument', 'ping', 'media', 'font',
+         'websocket', 'other', 'document')
+TYPE_BITS = {name: 1 << bit for bit, name in enumerate(TYPES)}
+TYPE_ALIASES = {'xhr': 'xmlhttprequest', 'css': 'stylesheet', 'frame': 'subdocument', 'doc': 'document',
+                'object-subrequest': 'object'}
+ALL_TYPES = (1 << len(TYPES)) - 1
+# Rules without a type option do not apply to the top-level document
+DEFAULT_TYPES = ALL_TYPES & ~TYPE_BITS['document']
+
+# Options that only change cosmetic filtering or need features this matcher does not have
+UNSUPPORTED_OPTIONS = {'popup', 'csp', 'redirect', 'redirect-rule', 'rewrite', 'replace', 'removeparam',
+                       'generichide', 'elemhide', 'specifichide', 'genericblock', 'content', 'webrtc', 'badfilter',
+                       'header', 'permissions', 'empty', 'mp4', 'inline-script', 'inline-font', 'cname'}
+
+MIN_KEYWORD = 3
+DOMAIN_RULE = re.compile(r'^\|\|([a-z0-9.-]+\.[a-z0-9-]+)\^?\|?$')
+OPTIONS = re.compile(r'^[\w~,=|.\-*]+$')
+
+
+def registrable_domain(host) -> str:
+    # Without a public suffix list: last two labels, three for ccTLD forms like example.co.uk
+    labels = host.rsplit('.', 3)
+    if len(labels) >= 3 and len(labels[-1]) == 2 and len(labels[-2]) <= 3:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def host_of(url) -> str:
+    rest = url.partition('://')[2]
+    end = len(rest)
+    for delimiter in '/?#':
+        position = rest.find(delimiter)
+        if -1 < position < end:
+            end = position
+    host = rest[:end].rpartition('@')[2]
+    if host.startswith('['):
+        return host
+    return host.partition(':')[0]
+
+
+def suffixes(host):
+    # a.b.example.com, b.example.com, example.com, com
+    while host:
+        yield host
+        host = host.partition('.')[2]
+
+
+def to_regex(pattern) -> str:
+    # Adblock Plus pattern syntax to a Python regex over the lower-cased URL
+    start = ''
+    if pattern.startswith('||'):
+        start = r'^[a-z][a-z0-9+.-]*://(?:[^/?#]*\.)?'
+        pattern = pattern[2:]
+    elif pattern.startswith('|'):
+        start = '^'
+        pattern = pattern[1:]
+    end = ''
+    if pattern.endswith('|'):
+        end = '$'
+        pattern = pattern[:-1]
+    body = ''.join(
+        '.*' if char == '*' else r'(?:[^\w\-.%]|$)' if char == '^' else re.escape(char)
+        for char in pattern
+    )
+    return start + body + end
+
+
+def keyword(pattern) -> str:
+    # The longest literal part of a pattern; every matching URL contains it
+    parts = re.split(r'[*^|]', pattern.lstrip('|'))
+    return max(parts, key=len) if parts else ''
+
+
+class RuleSet:
+    """
+    Compiled network rules of one kind (blocking or exception).
+
+    ``||example.com^`` rules without options, the bulk of most lists, go into a set probed with
+    every parent domain of the request host. Other rules are found through an Aho-Corasick automaton
+    over their longest literal part and then checked against their full pattern and options; rules
+    without a literal of MIN_KEYWORD characters are checked one by one.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self):
+        self.domains = set()
+        self.domain_rules = {}
+        self.rules = []
+        self.keywords = {}
+        self.generic = []
+        self.goto = {}
+        self.fail = []
+        self.starts = frozenset()
+        self.out = {}
+        self._compiled = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_compiled'] = {}
+        return state
+
+    def add(self, pattern, options):
+        third_party, types, include, exclude, match_case, important = options
+        plain = third_party is None and types == DEFAULT_TYPES and not include and not exclude and not important
+        domain = DOMAIN_RULE.match(pattern)
+        if domain and plain:
+            self.domains.add(domain.group(1))
+            return
+
+        rule_id = len(self.rules)
+        self.rules.append((to_regex(pattern if match_case else pattern.lower()), third_party, types,
+                           include, exclude, match_case, important))
+        if domain:
+            self.domain_rules.setdefault(domain.group(1), []).append(rule_id)
+            return
+        word = keyword(pattern.lower())
+        if len(word) >= MIN_KEYWORD:
+            self.keywords.setdefault(word, []).append(rule_id)
+        else:
+            self.generic.append(rule_id)
+
+    def build(self):
+        # Aho-Corasick over the keyword bytes; transitions are keyed by state * 256 + byte
+        goto = {}
+        outputs = [()]
+        for word, rule_ids in self.keywords.items():
+            state = 0
+            for byte in word.encode():
+                key = state * 256 + byte
+                following = goto.get(key)
+                if following is None:
+                    following = len(outputs)
+                    goto[key] = following
+                    outputs.append(())
+                state = following
+            outputs[state] = tuple(rule_ids)
+
+        children = [[] for _ in outputs]
+        for key, state in goto.items():
+            children[key // 256].append((key % 256, state))
+
+        fail = [0] * len(outputs)
+        queue = deque(state for _, state in children[0])
+        while queue:
+            state = queue.popleft()
+            for byte, child in children[state]:
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and fallback * 256 + byte not in goto:
+                    fallback = fail[fallback]
+                target = goto.get(fallback * 256 + byte, 0)
+                fail[child] = target if target != child else 0
+                # Keywords ending at the fail state end here too
+                if outputs[fail[child]]:
+                    outputs[child] = outputs[child] + outputs[fail[child]]
+
+        self.goto = goto
+        self.fail = fail
+        # Bytes that can leave the root state; everything else is skipped there without a lookup
+        self.starts = frozenset(key for key in goto if key < 256)
+        self.out = {state: rule_ids for state, rule_ids in enumerate(outputs) if rule_ids}
+        self.keywords = {}
+
+    def candidates(self, data):
+        get = self.goto.get
+        fail = self.fail
+        out = self.out
+        found = []
+        state = 0
+        starts = self.starts
+        for byte in data:
+            if not state and byte not in starts:
+                continue
+            following = get(state * 256 + byte)
+            while following is None and state:
+                state = fail[state]
+                following = get(state * 256 + byte)
+            if following:
+                state = following
+                if state in out:
+                    found.extend(out[state])
+            else:
+                state = 0
+        return found
+
+    def check(self, rule_id, url, lower, host, page_host, third_party, type_bit):
+        pattern, rule_third_party, types, include, exclude, match_case, _ = self.rules[rule_id]
+        if not types & type_bit:
+            return False
+        if rule_third_party is not None and rule_third_party != third_party:
+            return False
+        if include or exclude:
+            page_domains = set(suffixes(page_host))
+            if include and not include & page_domains:
+                return False
+            if exclude and exclude & page_domains:
+                return False
+        regex = self._compiled.get(rule_id)
+        if regex is None:
+            regex = self._compiled[rule_id] = re.compile(pattern)
+        return regex.search(url if match_case else lower) is not None
+
+    def match(self, url, lower, host, page_host, third_party, type_bit):
+        """
+        Return the id of a rule matching the request, -1 for a plain domain rule, or None.
+
+        :since: 1.0.0
+        """
+        check = self.check
+        plain = type_bit & DEFAULT_TYPES
+        for domain in suffixes(host):
+            if plain and domain in self.domains:
+                return -1
+            for rule_id in self.domain_rules.get(domain, ()):
+                if check(rule_id, url, lower, host, page_host, third_party, type_bit):
+                    return rule_id
+        for rule_id in self.candidates(lower.encode()):
+            if check(rule_id, url, lower, host, page_host, third_party, type_bit):
+                return rule_id
+        for rule_id in self.generic:
+            if check(rule_id, url, lower, host, page_host, third_party, type_bit):
+                return rule_id
+        return None
+
+
+def parse_options(text):
+    # (third_party, types, include, exclude, match_case, important), or None to skip the rule
+    third_party = None
+    include_types = 0
+    exclude_types = 0
+    include = set()
+    exclude = set()
+    match_case = False
+    important = False
+    for option in text.split(','):
+        option = option.strip().lower()
+        negated = option.startswith('~')
+        name = option.lstrip('~')
+        name = TYPE_ALIASES.get(name, name)
+        if name in ('third-party', '3p'):
+            third_party = not negated
+        elif name in ('first-party', '1p'):
+            third_party = negated
+        elif name in TYPE_BITS:
+            if negated:
+                exclude_types |= TYPE_BITS[name]
+            else:
+                include_types |= TYPE_BITS[name]
+        elif name.startswith('domain='):
+            for domain in name[7:].split('|'):
+                if domain.startswith('~'):
+                    exclude.add(domain[1:])
+                elif domain:
+                    include.add(domain)
+        elif name == 'match-case':
+            match_case = True
+        elif name == 'important':
+            important = True
+        elif name in UNSUPPORTED_OPTIONS or name.partition('=')[0] in UNSUPPORTED_OPTIONS:
+            return None
+        else:
+            # Unknown options could change the meaning; better not to apply the rule at all
+            return None
+    types = include_types or (ALL_TYPES if exclude_types else DEFAULT_TYPES)
+    return third_party, types & ~exclude_types, frozenset(include), frozenset(exclude), match_case, important
+
+
+class Blocklist:
+    """
+    Adblock Plus / EasyList network rules compiled for fast matching.
+
+    Cosmetic rules, regular-expression rules and rules with options this matcher cannot honor are
+    skipped; ``skipped`` counts them.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self):
+        self.block = RuleSet()
+        self.allow = RuleSet()
+        self.count = 0
+        self.skipped = 0
+
+    @classmethod
+    def compile(cls, lines):
+        """
+        Compile filter list lines.
+
+        :param lines: Iterable of rule lines.
+        :return: Blocklist
+        :since: 1.0.0
+        """
+        blocklist = cls()
+        for line in lines:
+            line = line.strip()
+            if not line or line[0] in '![' or '##' in line or '#@#' in line or '#?#' in line or '#$#' in line:
+                continue
+            rules = blocklist.block
+            if line.startswith('@@'):
+                rules = blocklist.allow
+                line = line[2:]
+
+            options = (None, DEFAULT_TYPES, frozenset(), frozenset(), False, False)
+            position = line.rfind('$')
+            if position > 0 and OPTIONS.match(line[position + 1:]):
+                options = parse_options(line[position + 1:])
+                line = line[:position]
+            if options is None or not line or len(line) > 2 and line[0] == '/' and line[-1] == '/':
+                blocklist.skipped += 1
+                continue
+            rules.add(line, options)
+            blocklist.count += 1
+
+        blocklist.block.build()
+        blocklist.allow.build()
+        return blocklist
+
+    @classmethod
+    def load(cls, paths, cache_dir):
+        """
+        Compile filter list files, reusing the compiled form cached on disk for the same contents.
+
+        :param paths: Filter list files.
+        :param cache_dir: Directory holding compiled lists.
+        :return: Blocklist
+        :since: 1.0.0
+        """
+        digest = hashlib.sha1(('%d %s' % (COMPILER_VERSION, sys.version)).encode())
+        sources = []
+        for path in paths:
+            with open(path, 'rb') as file:
+                data = file.read()
+            digest.update(data)
+            sources.append(data.decode('utf-8', 'replace'))
+        cache_path = os.path.join(cache_dir, digest.hexdigest() + '.pickle')
+
+        try:
+            with open(cache_path, 'rb') as file:
+                return pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+
+        blocklist = cls.compile(line for source in sources for line in source.splitlines())
+        os.makedirs(cache_dir, exist_ok=True)
+        temporary = cache_path + '.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump(blocklist, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, cache_path)
+
+        # Compiled forms of older list versions are never read again
+        for name in os.listdir(cache_dir):
+            if name.endswith('.pickle') and name != os.path.basename(cache_path):
+                os.remove(os.path.join(cache_dir, name))
+        return blocklist
+
+    def match(self, url, page_url='', resource_type='other'):
+        """
+        Decide whether a request is blocked.
+
+        :param url: Requested URL.
+        :param page_url: URL of the page making the request.
+        :param resource_type: One of TYPES.
+        :return: True if a blocking rule matches and no exception rule does.
+        :since: 1.0.0
+        """
+        lower = url.lower()
+        host = host_of(lower)
+        page_host = host_of(page_url.lower()) if page_url else ''
+        third_party = bool(page_host) and registrable_domain(host) != registrable_domain(page_host)
+        type_bit = TYPE_BITS.get(resource_type, TYPE_BITS['other'])
+
+        rule_id = self.block.match(url, lower, host, page_host, third_party, type_bit)
+        if rule_id is None:
+            return False
+        if rule_id >= 0 and self.block.rules[rule_id][6]:
+            # $important beats exception rules
+            return True
+        return self.allow.match(url, lower, host, page_host, third_party, type_bit) is None
+
+
+def fetch_lists(sources, directory, max_age=4 * 24 * 3600):
+    """
+    Return local paths of filter lists, downloading remote ones that are missing or older than max_age.
+
+    A list that cannot be downloaded is used from its previous copy when there is one.
+
+    :param sources: Local paths or http(s) URLs.
+    :param directory: Directory for downloaded lists.
+    :param max_age: Seconds before a downloaded list is refreshed.
+    :return: list
+    :since: 1.0.0
+    """
+    paths = []
+    for source in sources:
+        if not source.startswith(('http://', 'https://')):
+            if os.path.exists(source):
+                paths.append(source)
+            continue
+        path = os.path.join(directory, hashlib.sha1(source.encode()).hexdigest() + '.txt')
+        if not os.path.exists(path) or time.time() - os.path.getmtime(path) > max_age:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                with urllib.request.urlopen(source, timeout=30) as response:
+                    data = response.read()
+                with open(path + '.tmp', 'wb') as file:
+                    file.write(data)
+                os.replace(path + '.tmp', path)
+            except OSError as e:
+                print(f"Error downloading filter list {source}: {e}")
+        if os.path.exists(path):
+            paths.append(path)
+    return paths
@@ -1,107 +1,279 @@
 import os
-import sqlite3
+import threading
 from datetime import datetime
 
+from lib.favicon import Favicon
+from lib.storage import Storage, create_fts_index, like_pattern, match_expression
+
+
+# Version 2 stores favicon hashes from the shared favicon store instead of image bytes
+SCHEMA_VERSION = 2
+
+
+def normalize_url(url) -> str:
+    # http/https, host case, a trailing slash and the fragment do not make a different bookmark
+    url = url.strip()
+    scheme, separator, rest = url.partition('://')
+    if not separator or scheme.lower() not in ('http', 'https'):
+        return url
+
+    # String slicing instead of urlsplit: this runs on every page load and for every bookmark at startup
+    rest = rest.partition('#')[0]
+    end = len(rest)
+    for delimiter in '/?':
+        position = rest.find(delimiter)
+        if -1 < position < end:
+            end = position
+    path, separator, query = rest[end:].partition('?')
+    key = rest[:end].lower() + path.rstrip('/')
+    return key + separator + query if query else key
+
+
+class UrlIndex:
+    """
+    In-memory map of normalized bookmark URLs to bookmark ids, shared by every Bookmark on one database.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, rows):
+        self.lock = threading.Lock()
+        self.by_url = {}
+        self.by_id = {}
+        for bookmark_id, url in rows:
+            key = normalize_url(url)
+            self.by_id[bookmark_id] = key
+            ids = self.by_url.get(key)
+            if ids is None:
+                self.by_url[key] = {bookmark_id}
+            else:
+                ids.add(bookmark_id)
+
+    def add(self, bookmark_id, url):
+        key = normalize_url(url)
+        with self.lock:
+            self.by_url.setdefault(key, set()).add(bookmark_id)
+            self.by_id[bookmark_id] = key
+
+    def remove(self, bookmark_id):
+        with self.lock:
+            key = self.by_id.pop(bookmark_id, None)
+            ids = self.by_url.get(key)
+            if ids is not None:
+                ids.discard(bookmark_id)
+                if not ids:
+                    del self.by_url[key]
+
+    def ids(self, url) -> set:
+        with self.lock:
+            return set(self.by_url.get(normalize_url(url), ()))
+
+    def __contains__(self, url):
+        return normalize_url(url) in self.by_url
+
 
 class Bookmark:
-    def __init__(self):
+    # One URL index per database file, so the browser and the server thread see the same bookmarks
+    indexes = {}
+    indexes_lock = threading.Lock()
+    # Callbacks run after bookmarks were added in bulk, per database file
+    listeners = {}
+
+    def __init__(self, db_path=None, favicon_manager=None):
         # Use absolute path for database file
         current_dir = os.path.dirname(__file__)
-        self.db_path = os.path.join(current_dir, '..', 'data', 'bookmark.db')
+        self.db_path = db_path or os.path.join(current_dir, '..', 'data', 'bookmark.db')
+        self.storage = Storage.get(self.db_path)
+        self.favicon_manager = favicon_manager or Favicon(os.path.join(os.path.dirname(self.db_path), 'favicon.db'))
         self.init_db()
+        self.index = self.load_index()
 
     def init_db(self):
-        # Ensure directory exists before connecting
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        # Create tables if they don't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bookmark (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                url TEXT NOT NULL,
-                time TEXT,
-                favicon BLOB,
-                folder_id INTEGER,
-                FOREIGN KEY (folder_id) REFERENCES folder(id)
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS folder (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                parent_id INTEGER,
-                time TEXT,
-                FOREIGN KEY (parent_id) REFERENCES folder(id)
-            )
-        ''')
+        with self.storage.transaction() as cursor:
+            # Create tables if they don't exist
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS bookmark (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    time TEXT,
+                    favicon TEXT,
+                    folder_id INTEGER,
+                    FOREIGN KEY (folder_id) REFERENCES folder(id)
+                )
+            ''')
 
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS folder (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    parent_id INTEGER,
+                    time TEXT,
+                    FOREIGN KEY (parent_id) REFERENCES folder(id)
+                )
+            ''')
+
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_bookmark_url ON bookmark (url)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_bookmark_folder_id ON bookmark (folder_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_folder_parent_id ON folder (parent_id)')
+
+            # Full-text index over title and URL, falls back to LIKE scans without FTS5
+            self.fts = create_fts_index(cursor, 'bookmark', ('title', 'url'))
+
+            if cursor.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+                # Move inline icons to the favicon store; early builds stored the result of QImage.save()
+                for bookmark_id, url, favicon in cursor.execute(
+                        'SELECT id, url, favicon FROM bookmark WHERE favicon IS NOT NULL').fetchall():
+                    cursor.execute('UPDATE bookmark SET favicon = ? WHERE id = ?',
+                                   (self.favicon_manager.add_favicon(favicon, url), bookmark_id))
+                cursor.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+
+    def load_index(self):
+        with Bookmark.indexes_lock:
+            index = Bookmark.indexes.get(self.storage.db_path)
+            if index is None:
+                index = UrlIndex(self.storage.execute('SELECT id, url FROM bookmark'))
+                Bookmark.indexes[self.storage.db_path] = index
+            return index
+
+    def subscribe(self, callback):
+        """
+        Call ``callback()`` after bookmarks of this database were imported, from any thread.
+
+        :param callback: Function without arguments.
+        :return: The callback.
+        :since: 1.0.0
+        """
+        Bookmark.listeners.setdefault(self.storage.db_path, []).append(callback)
+        return callback
+
+    def notify(self):
+        for callback in list(Bookmark.listeners.get(self.storage.db_path, ())):
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in bookmark listener: {e}")
 
     def add_bookmark(self, title, url, time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'), favicon=None, folder_id=None):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('INSERT INTO bookmark (title, url, time, favicon, folder_id) VALUES (?, ?, ?, ?, ?)',
-                       (title, url, time, favicon, folder_id))
-        conn.commit()
-        conn.close()
+        # Favicons may arrive as raw bytes or as a hash already in the favicon store
+        if not isinstance(favicon, str):
+            favicon = self.favicon_manager.add_favicon(favicon, url)
+        with self.storage.transaction() as cursor:
+            cursor.execute('INSERT INTO bookmark (title, url, time, favicon, folder_id) VALUES (?, ?, ?, ?, ?)',
+                           (title, url, time, favicon, folder_id))
+        self.index.add(cursor.lastrowid, url)
 
     def get_bookmark(self, folder_id=None):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         if folder_id:
-            cursor.execute('SELECT id, title, url, favicon, folder_id FROM bookmark WHERE folder_id = ?', (folder_id,))
+            cursor = self.storage.execute(
+                'SELECT id, title, url, favicon, folder_id FROM bookmark WHERE folder_id = ?', (folder_id,))
         else:
-            cursor.execute('SELECT id, title, url, favicon, folder_id FROM bookmark WHERE folder_id IS NULL')
-        bookmark = cursor.fetchall()
-        conn.close()
-        return bookmark
+            cursor = self.storage.execute(
+                'SELECT id, title, url, favicon, folder_id FROM bookmark WHERE folder_id IS NULL')
+        return cursor.fetchall()
 
     def remove_bookmark(self, bookmark_id):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM bookmark WHERE id = ?', (bookmark_id,))
-        conn.commit()
-        conn.close()
+        with self.storage.transaction() as cursor:
+            cursor.execute('DELETE FROM bookmark WHERE id = ?', (bookmark_id,))
+        self.index.remove(bookmark_id)
+
+    def remove_bookmark_url(self, url):
+        # Remove every bookmark of the page, whichever variant of its URL was saved
+        ids = self.index.ids(url)
+        with self.storage.transaction() as cursor:
+            cursor.executemany('DELETE FROM bookmark WHERE id = ?', [(bookmark_id,) for bookmark_id in ids])
+        for bookmark_id in ids:
+            self.index.remove(bookmark_id)
+        return len(ids)
 
     def is_bookmarked(self, url) -> bool:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id FROM bookmark WHERE url = ?', (url,))
-        bookmark = cursor.fetchone()
-        conn.close()
-        return bookmark is not None
+        return url in self.index
+
+    def search(self, query, limit=50):
+        # Best matches first, ranked by bm25 over title and URL
+        if not self.fts:
+            pattern = like_pattern(query)
+            return self.storage.execute('''
+                SELECT id, title, url, favicon, folder_id FROM bookmark
+                WHERE title LIKE ? ESCAPE '\\' OR url LIKE ? ESCAPE '\\'
+                LIMIT ?
+            ''', (pattern, pattern, limit)).fetchall()
+        expression = match_expression(query)
+        if not expression:
+            return []
+        return self.storage.execute('''
+            SELECT bookmark.id, bookmark.title, bookmark.url, bookmark.favicon, bookmark.folder_id
+            FROM bookmark_fts JOIN bookmark ON bookmark.id = bookmark_fts.rowid
+            WHERE bookmark_fts MATCH ?
+            ORDER BY bm25(bookmark_fts)
+            LIMIT ?
+        ''', (expression, limit)).fetchall()
 
     def add_folder(self, name, time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'), parent_id=None):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('INSERT INTO folder (name, time, parent_id) VALUES (?, ?, ?)', (name, time,  parent_id))
-        conn.commit()
-        conn.close()
+        with self.storage.transaction() as cursor:
+            cursor.execute('INSERT INTO folder (name, time, parent_id) VALUES (?, ?, ?)', (name, time, parent_id))
 
     def get_folder(self, parent_id=None):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         if parent_id:
-            cursor.execute('SELECT id, name, parent_id FROM folder WHERE parent_id = ?', (parent_id,))
+            cursor = self.storage.execute('SELECT id, name, parent_id FROM folder WHERE parent_id = ?', (parent_id,))
         else:
-            cursor.execute('SELECT id, name, parent_id FROM folder WHERE parent_id IS NULL')
-        folder = cursor.fetchall()
-        conn.close()
-        return folder
+            cursor = self.storage.execute('SELECT id, name, parent_id FROM folder WHERE parent_id IS NULL')
+        return cursor.fetchall()
 
-    def remove_folder(self, folder_id):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_tree(self, folder_id=None):
+        # The whole tree, or the subtree under folder_id, in two queries; UNION also stops parent_id cycles
+        if folder_id:
+            start = 'SELECT id, name, parent_id FROM folder WHERE id = ?'
+            params = (folder_id,)
+        else:
+            start = 'SELECT id, name, parent_id FROM folder WHERE parent_id IS NULL'
+            params = ()
+        subtree = '''
+            WITH RECURSIVE subtree (id, name, parent_id) AS (
+                %s
+                UNION
+                SELECT folder.id, folder.name, folder.parent_id FROM folder JOIN subtree ON folder.parent_id = subtree.id
+            )
+        ''' % start
+        folders = self.storage.execute(subtree + 'SELECT id, name, parent_id FROM subtree', params).fetchall()
+        bookmarks = self.storage.execute(
+            subtree + '''
+                SELECT id, title, url, favicon, folder_id FROM bookmark
+                WHERE folder_id IN (SELECT id FROM subtree) %s
+                ORDER BY id
+            ''' % ('' if folder_id else 'OR folder_id IS NULL'),
+            params
+        ).fetchall()
+
+        nodes = {None: {'id': None, 'name': None, 'parent_id': None, 'folders': [], 'bookmarks': []}}
+        for folder in folders:
+            nodes[folder[0]] = {'id': folder[0], 'name': folder[1], 'parent_id': folder[2], 'folders': [], 'bookmarks': []}
+        for folder in folders:
+            parent = nodes.get(folder[2], nodes[None])
+            if folder[0] != folder_id:
+                parent['folders'].append(nodes[folder[0]])
+        for bookmark in bookmarks:
+            nodes.get(bookmark[4], nodes[None])['bookmarks'].append(
+                {'id': bookmark[0], 'title': bookmark[1], 'url': bookmark[2], 'favicon': bookmark[3], 'folder_id': bookmark[4]})
+        return nodes[folder_id] if folder_id in nodes else None
 
-        # Remove all bookmark in the folder
-        cursor.execute('DELETE FROM bookmark WHERE folder_id = ?', (folder_id,))
+    def remove_folder(self, folder_id):
+        # Remove the folder with all its subfolders and their bookmarks in one transaction
+        subtree = '''
+            WITH RECURSIVE subtree (id) AS (
+                SELECT ?
+                UNION
+                SELECT folder.id FROM folder JOIN subtree ON folder.parent_id = subtree.id
+            )
+        '''
+        with self.storage.transaction() as cursor:
+            ids = [row[0] for row in cursor.execute(
+                subtree + 'SELECT id FROM bookmark WHERE folder_id IN (SELECT id FROM subtree)', (folder_id,))]
 
-        # Remove the folder itself
-        cursor.execute('DELETE FROM folder WHERE id = ?', (folder_id,))
+            # Remove all bookmark in the subtree
+            cursor.execute(subtree + 'DELETE FROM bookmark WHERE folder_id IN (SELECT id FROM subtree)', (folder_id,))
 
-        conn.commit()
-        conn.close()
+            # Remove the folders themselves
+            cursor.execute(subtree + 'DELETE FROM folder WHERE id IN (SELECT id FROM subtree)', (folder_id,))
+        for bookmark_id in ids:
+            self.index.remove(bookmark_id)
@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future, TimeoutError
+
+
+WIDGETS = ('weather', 'news', 'currency')
+
+# After a failed fetch the widget is not tried again for this long, however many tabs ask
+ERROR_TTL = 60
+# Stale values are served while revalidating, but not when older than this
+MAX_STALE = 24 * 3600
+# Longest a request waits for a widget that has no value yet; internal pages may be served on the GUI thread
+DEFAULT_WAIT = 0.5
+
+
+def parse_weather(data):
+    return {'temp': data['main']['temp'], 'description': data['weather'][0]['description']}
+
+
+def parse_news(data):
+    return [{'title': article['title']['rendered'], 'link': article['link'], 'date': article['date']}
+            for article in data]
+
+
+def parse_currency(data):
+    return {'rate': data['rates']['BDT']}
+
+
+PARSERS = {
+    'weather': parse_weather,
+    'news': parse_news,
+    'currency': parse_currency,
+}
+
+
+class TTLCache:
+    """
+    Values kept for a TTL, served stale while one background fetch revalidates them.
+
+    Concurrent misses of the same key share a single fetch. A failed fetch keeps the stale value and
+    blocks new fetches of that key for ERROR_TTL seconds.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key: [value, fetched at, failed at]
+        self.entries = {}
+        self.pending = {}
+        self.fetches = 0
+
+    def get(self, key, fetch, ttl, wait=DEFAULT_WAIT):
+        """
+        Return the value of key, fetching it when missing or older than ttl.
+
+        :param key: Cache key.
+        :param fetch: Function returning a fresh value, may raise OSError or ValueError.
+        :param ttl: Seconds a value is fresh.
+        :param wait: Seconds to wait for a value when there is none to serve yet.
+        :return: The value, or None while it is still being fetched or could not be fetched.
+        :since: 1.0.0
+        """
+        now = time.monotonic()
+        with self.lock:
+            value, fetched, failed = self.entries.get(key, (None, None, None))
+            if fetched is not None and now - fetched < ttl:
+                return value
+            if failed is not None and now - failed < ERROR_TTL:
+                return value
+            future = self.pending.get(key)
+            if future is None:
+                future = Future()
+                self.pending[key] = future
+                self.fetches += 1
+                threading.Thread(target=self.refresh, args=(key, fetch, future), daemon=True).start()
+
+        if fetched is not None and now - fetched < MAX_STALE:
+            return value
+        try:
+            return future.result(timeout=max(wait, 0))
+        except TimeoutError:
+            return None
+
+    def refresh(self, key, fetch, future):
+        try:
+            value = fetch()
+        except (OSError, ValueError, KeyError, IndexError, TypeError) as e:
+            print(f"Error fetching {key}: {e}")
+            with self.lock:
+                entry = self.entries.setdefault(key, [None, None, None])
+                entry[2] = time.monotonic()
+                del self.pending[key]
+                value = entry[0] if entry[1] is not None and time.monotonic() - entry[1] < MAX_STALE else None
+            future.set_result(value)
+            return
+        with self.lock:
+            self.entries[key] = [value, time.monotonic(), None]
+            del self.pending[key]
+        future.set_result(value)
+
+    def is_pending(self, key) -> bool:
+        with self.lock:
+            return key in self.pending
+
+
+class Dashboard:
+    """
+    Weather, news and currency for the home page widgets, fetched once for all open home tabs.
+
+    Upstream URLs come from the ``dashboard_<widget>_url`` settings unless given to the constructor,
+    e.g. a local stub server in tests. They are part of the cache key, so changing one takes effect
+    on the next request. Upstream responses are reduced to what the widgets show.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, setting_manager, upstreams=None, timeout=10):
+        self.setting_manager = setting_manager
+        self.upstreams = upstreams or {}
+        self.timeout = timeout
+        self.cache = TTLCache()
+
+    def upstream(self, widget) -> str:
+        return self.upstreams.get(widget) or self.setting_manager.get_setting(f'dashboard_{widget}_url')
+
+    def fetch(self, widget, url):
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return PARSERS[widget](json.loads(response.read()))
+
+    def get(self, widgets=WIDGETS, wait=DEFAULT_WAIT):
+        """
+        Return the current value of each widget.
+
+        :param widgets: Names of the widgets.
+        :param wait: Seconds to wait in total for widgets without a value yet.
+        :return: Dictionary with a value (or None) per widget and the widgets still being fetched.
+        :since: 1.0.0
+        """
+        ttl = self.setting_manager.get_setting('dashboard_ttl')
+        deadline = time.monotonic() + wait
+        requests = []
+        for widget in widgets:
+            url = self.upstream(widget)
+            if widget in PARSERS and url:
+                requests.append((widget, (widget, url), lambda widget=widget, url=url: self.fetch(widget, url)))
+
+        # Start every fetch before waiting on any, so the waits overlap
+        for _, key, fetch in requests:
+            self.cache.get(key, fetch, ttl, 0)
+        values = {}
+        pending = []
+        for widget, key, fetch in requests:
+            values[widget] = self.cache.get(key, fetch, ttl, deadline - time.monotonic())
+            if self.cache.is_pending(key):
+                pending.append(widget)
+        return {'widgets': values, 'pending': pending}
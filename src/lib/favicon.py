@@ -0,0 +1,74 @@
+import hashlib
+import os
+from urllib.parse import urlparse
+
+from lib.storage import Storage
+
+
+def favicon_hash(data) -> str:
+    # Icons are addressed by the SHA-1 of their bytes, so each distinct icon is stored once
+    return hashlib.sha1(data).hexdigest()
+
+
+def favicon_mime(data) -> str:
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data.startswith(b'\x00\x00\x01\x00'):
+        return 'image/x-icon'
+    if data.startswith(b'GIF8'):
+        return 'image/gif'
+    if data.startswith(b'\xff\xd8'):
+        return 'image/jpeg'
+    if data.lstrip().startswith(b'<'):
+        return 'image/svg+xml'
+    return 'application/octet-stream'
+
+
+class Favicon:
+    def __init__(self, db_path=None):
+        # Use absolute path for database file
+        current_dir = os.path.dirname(__file__)
+        self.db_path = db_path or os.path.join(current_dir, '..', 'data', 'favicon.db')
+        self.storage = Storage.get(self.db_path)
+        self.known = set()
+        self.init_db()
+
+    def init_db(self):
+        with self.storage.transaction() as cursor:
+            # Create tables if they don't exist
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS icon (
+                    hash TEXT PRIMARY KEY,
+                    data BLOB NOT NULL
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS domain (
+                    domain TEXT PRIMARY KEY,
+                    hash TEXT NOT NULL
+                )
+            ''')
+
+    def add_favicon(self, data, url=None):
+        if not data or not isinstance(data, (bytes, bytearray)):
+            return None
+        data = bytes(data)
+        digest = favicon_hash(data)
+        domain = urlparse(url).netloc if url else None
+
+        with self.storage.transaction() as cursor:
+            if digest not in self.known:
+                cursor.execute('INSERT OR IGNORE INTO icon (hash, data) VALUES (?, ?)', (digest, data))
+            if domain:
+                cursor.execute('INSERT OR REPLACE INTO domain (domain, hash) VALUES (?, ?)', (domain, digest))
+        self.known.add(digest)
+        return digest
+
+    def get_favicon(self, digest):
+        icon = self.storage.execute('SELECT data FROM icon WHERE hash = ?', (digest,)).fetchone()
+        return icon[0] if icon else None
+
+    def get_domain_favicon(self, domain):
+        icon = self.storage.execute('SELECT hash FROM domain WHERE domain = ?', (domain,)).fetchone()
+        return icon[0] if icon else None
@@ -1,63 +1,329 @@
 import os
-import random
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from lib.favicon import Favicon
+from lib.storage import Storage, WriteBehind, create_fts_index, like_pattern, match_expression
+
+
+# Version 1 is the original single "history" table with one row per visit
+SCHEMA_VERSION = 2
+
+
+def to_timestamp(value):
+    # History times arrive as local 'YYYY-MM-DD HH:MM:SS' strings and are stored as Unix seconds
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return int(datetime.strptime(value, fmt).timestamp())
+        except ValueError:
+            pass
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        return None
+
+
+def create_schema(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS urls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL UNIQUE,
+            title TEXT,
+            visit_count INTEGER NOT NULL DEFAULT 0,
+            last_visit INTEGER,
+            favicon TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS visits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url_id INTEGER NOT NULL,
+            time INTEGER NOT NULL,
+            FOREIGN KEY (url_id) REFERENCES urls(id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_visits_time ON visits (time)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_visits_url_id ON visits (url_id, time)')
+
+    # Keep the per-URL counters right however visits are deleted, and drop URLs without visits
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS visits_delete AFTER DELETE ON visits BEGIN
+            UPDATE urls SET
+                visit_count = visit_count - 1,
+                last_visit = (SELECT MAX(time) FROM visits WHERE url_id = old.url_id)
+            WHERE id = old.url_id;
+            DELETE FROM urls WHERE id = old.url_id AND visit_count <= 0;
+        END
+    ''')
+
+
+def migrate(cursor, favicon_manager) -> int:
+    """
+    Bring a history database up to SCHEMA_VERSION and return the version it had before.
+
+    Version 1 databases are converted in bulk: one urls row per distinct URL carrying the latest
+    title, visit count and last visit, and one visits row per old history row (ids are kept).
+    Favicons move to the shared favicon store and are referenced by hash.
+
+    :param cursor: Cursor inside an open transaction.
+    :param favicon_manager: Favicon store receiving the icons.
+    :return: int
+    :since: 1.0.0
+    """
+    version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    legacy = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history'").fetchone()
+    if version == 0 and legacy:
+        version = 1
+    if version >= SCHEMA_VERSION:
+        return version
+
+    create_schema(cursor)
+
+    if version == 1:
+        # SQLite takes the bare title column from the row holding the MAX(), i.e. the latest visit
+        cursor.execute('''
+            INSERT INTO urls (url, title, visit_count, last_visit)
+            SELECT url, title, COUNT(*), MAX(COALESCE(CAST(strftime('%s', time, 'utc') AS INTEGER), 0))
+            FROM history WHERE url IS NOT NULL GROUP BY url
+        ''')
+        cursor.execute('''
+            INSERT INTO visits (id, url_id, time)
+            SELECT history.id, urls.id, COALESCE(CAST(strftime('%s', history.time, 'utc') AS INTEGER), 0)
+            FROM history JOIN urls ON urls.url = history.url
+        ''')
+
+        # The latest real icon of each URL; early builds stored the boolean result of QImage.save()
+        rows = cursor.execute('''
+            SELECT url, favicon, MAX(id) FROM history
+            WHERE url IS NOT NULL AND typeof(favicon) = 'blob'
+            GROUP BY url
+        ''').fetchall()
+        for url, data, _ in rows:
+            cursor.execute('UPDATE urls SET favicon = ? WHERE url = ?', (favicon_manager.add_favicon(data, url), url))
+
+        cursor.execute('DROP TABLE IF EXISTS history_fts')
+        cursor.execute('DROP TABLE history')
+
+    cursor.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+    return version
 
 
 class History:
-    def __init__(self):
+    # Callbacks run after history is deleted, per database file, shared by the browser and the server
+    listeners = {}
+
+    def __init__(self, db_path=None, favicon_manager=None):
         # Use absolute path for database file
         current_dir = os.path.dirname(__file__)
-        self.db_path = os.path.join(current_dir, '..', 'data', 'history.db')
+        self.db_path = db_path or os.path.join(current_dir, '..', 'data', 'history.db')
+        self.storage = Storage.get(self.db_path)
+        self.favicon_manager = favicon_manager or Favicon(os.path.join(os.path.dirname(self.db_path), 'favicon.db'))
         self.init_db()
 
+        # Visits are buffered and written in batches off the GUI thread
+        self.writer = WriteBehind(self.storage, self.write_visits)
+
     def init_db(self):
-        # Ensure directory exists before connecting
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        # Create table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT,
-                url TEXT,
-                time TEXT,
-                favicon BLOB
-            )
-        ''')
-        conn.commit()
-        conn.close()
+        with self.storage.transaction() as cursor:
+            migrate(cursor, self.favicon_manager)
+
+            # Full-text index over title and URL, falls back to LIKE scans without FTS5
+            self.fts = create_fts_index(cursor, 'urls', ('title', 'url'))
+
+    def write_visits(self, cursor, rows):
+        for title, url, time, favicon in rows:
+            # Favicons may arrive as raw bytes or as a hash already in the favicon store
+            digest = favicon if isinstance(favicon, str) else self.favicon_manager.add_favicon(favicon, url)
+
+            time = to_timestamp(time) or int(datetime.now().timestamp())
+            cursor.execute('''
+                INSERT INTO urls (url, title, visit_count, last_visit, favicon) VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    title = COALESCE(excluded.title, title),
+                    visit_count = visit_count + 1,
+                    last_visit = MAX(COALESCE(last_visit, 0), excluded.last_visit),
+                    favicon = COALESCE(excluded.favicon, favicon)
+            ''', (url, title, time, digest))
+            cursor.execute('INSERT INTO visits (url_id, time) SELECT id, ? FROM urls WHERE url = ?', (time, url))
 
     def add_history_entry(self, title, url, time, favicon):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO history (title, url, time, favicon) VALUES (?, ?, ?, ?)',
-            (title, url, time, favicon)
-        )
-        conn.commit()
-        conn.close()
+        self.writer.put((title, url, time, favicon))
+
+    def flush(self):
+        return self.writer.flush()
 
     def is_in_history(self, url):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM history WHERE url=?', (url,))
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count > 0
-
-    def get_history(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, title, url, time, favicon FROM history ORDER BY id DESC')
-        history_entries = cursor.fetchall()
-        conn.close()
-        return history_entries
+        if any(entry[1] == url for entry in self.writer.snapshot()):
+            return True
+        return self.storage.execute('SELECT 1 FROM urls WHERE url = ?', (url,)).fetchone() is not None
+
+    def get_history(self, before_id=None, limit=None, start_time=None, end_time=None, query=None):
+        # Write pending visits first so they show up with their real ids
+        self.writer.flush()
+
+        # Keyset pagination: newest first, continue below the last id the caller has seen
+        conditions = []
+        params = []
+        if before_id is not None:
+            conditions.append('visits.id < ?')
+            params.append(before_id)
+        if start_time:
+            conditions.append('visits.time >= ?')
+            params.append(to_timestamp(start_time))
+        if end_time:
+            conditions.append('visits.time <= ?')
+            params.append(to_timestamp(end_time))
+        if query and self.fts and match_expression(query):
+            conditions.append('visits.url_id IN (SELECT rowid FROM urls_fts WHERE urls_fts MATCH ?)')
+            params.append(match_expression(query))
+        elif query:
+            conditions.append("(urls.title LIKE ? ESCAPE '\\' OR urls.url LIKE ? ESCAPE '\\')")
+            params.extend((like_pattern(query), like_pattern(query)))
+
+        sql = '''
+            SELECT visits.id, urls.title, urls.url, datetime(visits.time, 'unixepoch', 'localtime'), urls.favicon
+            FROM visits
+            JOIN urls ON urls.id = visits.url_id
+        '''
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY visits.id DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return self.storage.execute(sql, params).fetchall()
+
+    def search(self, query, limit=50):
+        # Best matches first, ranked by bm25 over title and URL, one row per URL with its latest visit
+        if not self.fts:
+            return self.get_history(limit=limit, query=query)
+        expression = match_expression(query)
+        if not expression:
+            return []
+        self.writer.flush()
+        return self.storage.execute('''
+            SELECT
+                (SELECT MAX(id) FROM visits WHERE url_id = urls.id),
+                urls.title, urls.url, datetime(urls.last_visit, 'unixepoch', 'localtime'), urls.favicon
+            FROM urls_fts
+            JOIN urls ON urls.id = urls_fts.rowid
+            WHERE urls_fts MATCH ?
+            ORDER BY bm25(urls_fts)
+            LIMIT ?
+        ''', (expression, limit)).fetchall()
+
+    def subscribe(self, callback):
+        """
+        Call ``callback()`` after history entries of this database were deleted or imported, from any thread.
+
+        :param callback: Function without arguments.
+        :return: The callback.
+        :since: 1.0.0
+        """
+        History.listeners.setdefault(self.storage.db_path, []).append(callback)
+        return callback
+
+    def notify(self):
+        for callback in list(History.listeners.get(self.storage.db_path, ())):
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in history listener: {e}")
 
     def remove_history_entry(self, history_id):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM history WHERE id=?', (history_id,))
-        conn.commit()
-        conn.close()
+        with self.storage.transaction() as cursor:
+            cursor.execute('DELETE FROM visits WHERE id = ?', (history_id,))
+        self.notify()
+
+    def remove_history_entries(self, history_ids, vacuum=False):
+        # All ids in one transaction; the visits_delete trigger keeps urls in step
+        self.writer.flush()
+        with self.storage.transaction() as cursor:
+            cursor.executemany('DELETE FROM visits WHERE id = ?', [(history_id,) for history_id in history_ids])
+            count = cursor.rowcount
+        self.notify()
+        if vacuum:
+            self.vacuum()
+        return count
+
+    def remove_history_range(self, start_time=None, end_time=None, vacuum=False):
+        # Either bound may be left open; both open means everything
+        if start_time is None and end_time is None:
+            return self.clear_history(vacuum)
+        self.writer.flush()
+        with self.storage.transaction() as cursor:
+            cursor.execute('DELETE FROM visits WHERE time >= ? AND time <= ?', (
+                to_timestamp(start_time) if start_time is not None else 0,
+                to_timestamp(end_time) if end_time is not None else 2 ** 63 - 1
+            ))
+            count = cursor.rowcount
+        self.notify()
+        if vacuum:
+            self.vacuum()
+        return count
+
+    def remove_history_domain(self, domain, vacuum=False):
+        # The domain itself and all of its subdomains, whatever the scheme or port
+        domain = domain.strip().lower().rstrip('.')
+        if not domain:
+            return 0
+        self.writer.flush()
+        # Only URLs containing the domain are candidates; their host is then checked exactly
+        pattern = '%' + domain.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        with self.storage.transaction() as cursor:
+            url_ids = []
+            for url_id, url in cursor.execute("SELECT id, url FROM urls WHERE url LIKE ? ESCAPE '\\'", (pattern,)):
+                try:
+                    host = urlsplit(url).hostname or ''
+                except ValueError:
+                    continue
+                if host == domain or host.endswith('.' + domain):
+                    url_ids.append((url_id,))
+            cursor.executemany('DELETE FROM visits WHERE url_id = ?', url_ids)
+            count = cursor.rowcount
+        self.notify()
+        if vacuum:
+            self.vacuum()
+        return count
+
+    def clear_history(self, vacuum=True):
+        # Pending visits are written first so they are cleared as well
+        self.writer.flush()
+        with self.storage.transaction() as cursor:
+            count = cursor.execute('DELETE FROM visits').rowcount
+            cursor.execute('DELETE FROM urls')
+            if self.fts:
+                # The per-row triggers only add tombstones to the index, drop its segments outright
+                cursor.execute("INSERT INTO urls_fts (urls_fts) VALUES ('delete-all')")
+        self.notify()
+        if vacuum:
+            self.vacuum()
+        return count
+
+    def vacuum(self, pages=None):
+        """
+        Give pages freed by deletions back to the file system.
+
+        Incremental when the database has auto_vacuum = INCREMENTAL (new files do), otherwise a full
+        VACUUM, which also switches older files to incremental mode for next time.
+
+        :param pages: Maximum number of pages to free, all when None.
+        :return: None
+        :since: 1.0.0
+        """
+        conn = self.storage.connection()
+        try:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                # Each step of the pragma frees one page, executescript() runs it to the end
+                conn.executescript('PRAGMA incremental_vacuum(%d);' % (pages or 0))
+            else:
+                conn.execute('VACUUM')
+            # Freed pages only leave the file once the WAL is checkpointed
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+        except sqlite3.Error as e:
+            print(f"Error vacuuming history: {e}")
@@ -0,0 +1,189 @@
+import hashlib
+import os
+import threading
+
+
+# Widths of the generated variants; a variant is never wider than its source
+WIDTHS = (1280, 1920, 2560)
+QUALITY = 80
+
+
+def pick_width(viewport_width, pixel_ratio=1.0, widths=WIDTHS) -> int:
+    # Smallest variant covering the viewport in device pixels, the largest one beyond that
+    needed = viewport_width * max(pixel_ratio, 1.0)
+    for width in widths:
+        if width >= needed:
+            return width
+    return widths[-1]
+
+
+class ImageVariants:
+    """
+    Downscaled WebP variants of static images, generated once into a disk cache.
+
+    Variants are named by the SHA-1 of the source bytes and the width, so a changed source gets new
+    names and a name always serves the same bytes, which makes them safe to cache as immutable.
+    Source hashes are remembered per (path, size, mtime) so a request never rehashes a file.
+    Encoding needs Pillow; without it, or when encoding fails, callers serve the source itself.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, source_dir, cache_dir=None, widths=WIDTHS):
+        current_dir = os.path.dirname(__file__)
+        self.source_dir = source_dir
+        self.cache_dir = cache_dir or os.path.join(current_dir, '..', 'data', 'image')
+        self.widths = widths
+        self.digests = {}
+        self.paths = {}
+        self.sizes = {}
+        self.lock = threading.Lock()
+        self.warming = None
+
+    def source(self, name):
+        # Path of a source image, None for anything outside source_dir
+        path = os.path.join(self.source_dir, os.path.basename(name))
+        return path if os.path.isfile(path) else None
+
+    def digest(self, path) -> str:
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        digest = self.digests.get(key)
+        if digest is None:
+            with open(path, 'rb') as file:
+                digest = hashlib.sha1(file.read()).hexdigest()[:16]
+            self.digests[key] = digest
+            self.paths[digest] = path
+        return digest
+
+    def widths_of(self, path):
+        # Variant widths for a source: the configured ones below its own width, then its own width
+        digest = self.digest(path)
+        widths = self.sizes.get(digest)
+        if widths is None:
+            try:
+                from PIL import Image
+
+                with Image.open(path) as image:
+                    width = image.width
+            except (ImportError, OSError):
+                return ()
+            widths = tuple(w for w in self.widths if w < width)
+            if len(widths) < len(self.widths):
+                widths += (width,)
+            self.sizes[digest] = widths
+        return widths
+
+    def variant_path(self, digest, width) -> str:
+        return os.path.join(self.cache_dir, f"{digest}-{width}.webp")
+
+    def variant(self, name, width):
+        """
+        Return (digest, width, path) of the variant of an image for a display width, generating it if needed.
+
+        :param name: File name of the source image.
+        :param width: Wanted width in pixels, rounded up to a variant width.
+        :return: Tuple, or None when there is no such image or no variant can be made.
+        :since: 1.0.0
+        """
+        path = self.source(name)
+        if path is None:
+            return None
+        widths = self.widths_of(path)
+        if not widths:
+            return None
+        width = pick_width(width, 1.0, widths)
+        digest = self.digest(path)
+        target = self.variant_path(digest, width)
+        if not os.path.exists(target) and not self.generate(path, target, width):
+            return None
+        return digest, width, target
+
+    def find(self, digest, width):
+        """
+        Return the path of a variant addressed by source digest and exact width, as srcset URLs address it.
+
+        :param digest: Source digest from the URL.
+        :param width: Variant width from the URL.
+        :return: str, or None when the digest or width is unknown.
+        :since: 1.0.0
+        """
+        if digest not in self.paths:
+            # After a restart, cached pages may ask for variants before any srcset was built
+            for name in os.listdir(self.source_dir):
+                if self.source(name):
+                    self.digest(self.source(name))
+        path = self.paths.get(digest)
+        if path is None or width not in self.widths_of(path):
+            return None
+        target = self.variant_path(digest, width)
+        if not os.path.exists(target) and not self.generate(path, target, width):
+            return None
+        return target
+
+    def generate(self, path, target, width) -> bool:
+        with self.lock:
+            if os.path.exists(target):
+                return True
+            try:
+                from PIL import Image
+
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with Image.open(path) as image:
+                    # draft() lets the JPEG decoder skip to a smaller scale, which is much faster
+                    image.draft('RGB', (width, width * image.height // image.width))
+                    image = image.convert('RGB')
+                    if image.width > width:
+                        image = image.resize((width, round(image.height * width / image.width)),
+                                             Image.Resampling.LANCZOS)
+                    image.save(target + '.tmp', 'WEBP', quality=QUALITY, method=4)
+                os.replace(target + '.tmp', target)
+                return True
+            except ImportError:
+                return False
+            except OSError as e:
+                print(f"Error generating {target}: {e}")
+                return False
+
+    def srcset(self, name):
+        """
+        Return the srcset of an image, with URLs of its variants generated on first use.
+
+        :param name: File name of the source image.
+        :return: List of (url, width) pairs, empty when no variants can be made.
+        :since: 1.0.0
+        """
+        path = self.source(name)
+        if path is None:
+            return []
+        digest = self.digest(path)
+        return [(f"img/{digest}/{width}.webp", width) for width in self.widths_of(path)]
+
+    def warm(self, names=None):
+        """
+        Generate the missing variants of every image in a daemon thread.
+
+        No thread is started when every variant exists or one is already generating them.
+
+        :param names: Source file names, all images in source_dir when None.
+        :return: None
+        :since: 1.0.0
+        """
+        missing = []
+        for name in names if names is not None else sorted(os.listdir(self.source_dir)):
+            path = self.source(name)
+            if path is None:
+                continue
+            for width in self.widths_of(path):
+                target = self.variant_path(self.digest(path), width)
+                if not os.path.exists(target):
+                    missing.append((path, target, width))
+        if not missing or (self.warming is not None and self.warming.is_alive()):
+            return
+
+        def run():
+            for path, target, width in missing:
+                self.generate(path, target, width)
+
+        self.warming = threading.Thread(target=run, daemon=True)
+        self.warming.start()
@@ -0,0 +1,189 @@
+import os
+import time
+
+from PyQt6.QtCore import QObject, QTimer, QUrl
+from PyQt6.QtWebEngineCore import QWebEnginePage
+
+
+LifecycleState = QWebEnginePage.LifecycleState
+
+
+def renderer_memory():
+    # Resident memory of the QtWebEngine helper processes, or None without psutil
+    try:
+        import psutil
+    except ImportError:
+        return None
+    total = 0
+    for process in psutil.Process(os.getpid()).children(recursive=True):
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+class TabLifecycle(QObject):
+    """
+    Load background tabs on first activation, and freeze or discard tabs left in the background.
+
+    A tab idle for ``tab_freeze_after`` seconds is frozen (no JavaScript, no timers) and one idle for
+    ``tab_discard_after`` seconds is discarded (renderer memory released). When the renderers use
+    more than ``tab_memory_budget`` MB, the least recently used tab is discarded on every check.
+    Chromium's recommended state caps how far a page goes down, so pages playing audio or holding
+    form input stay active. Focusing a tab makes it active again; a discarded page reloads its URL
+    and gets its scroll position back.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, tabs, setting_manager, interval=30000, parent=None):
+        super().__init__(parent)
+        self.tabs = tabs
+        self.setting_manager = setting_manager
+        self.pending = {}
+        self.last_active = {}
+        self.scroll = {}
+        self.current = None
+        self.preload_queue = []
+        self.preloading = None
+        self.tabs.currentChanged.connect(self.activate)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.hibernate)
+        self.timer.start(interval)
+
+    def track(self, view):
+        """
+        Start managing a tab.
+
+        :param view: QWebEngineView of the tab.
+        :return: None
+        :since: 1.0.0
+        """
+        self.last_active[view] = time.monotonic()
+        view.loadFinished.connect(lambda ok: self.load_finished(view))
+
+    def defer(self, view, url):
+        """
+        Manage a tab whose URL is only loaded when it is first shown.
+
+        :param view: QWebEngineView of the tab.
+        :param url: URL to load on activation.
+        :return: None
+        :since: 1.0.0
+        """
+        self.track(view)
+        self.pending[view] = url
+
+    def preload(self, views, after=None):
+        """
+        Load deferred tabs in the background one at a time, in the given order.
+
+        :param views: Tabs to load, most important first.
+        :param after: Tab whose current load has to finish before the first one starts.
+        :return: None
+        :since: 1.0.0
+        """
+        self.preload_queue = [view for view in views if view in self.pending]
+        self.preloading = after
+        if after is None:
+            self.preload_next()
+
+    def preload_next(self):
+        self.preloading = None
+        while self.preload_queue:
+            view = self.preload_queue.pop(0)
+            url = self.pending.pop(view, None)
+            if url is not None:
+                self.preloading = view
+                view.load(QUrl(url))
+                return
+
+    def load_finished(self, view):
+        self.restore_scroll(view)
+        if view is self.preloading:
+            self.preload_next()
+
+    def forget(self, view):
+        if view in self.preload_queue:
+            self.preload_queue.remove(view)
+        if view is self.preloading:
+            self.preload_next()
+        self.pending.pop(view, None)
+        self.last_active.pop(view, None)
+        self.scroll.pop(view, None)
+        if self.current is view:
+            self.current = None
+
+    def is_pending(self, view) -> bool:
+        return view in self.pending
+
+    def activate(self, index):
+        now = time.monotonic()
+        if self.current is not None:
+            # The tab being left starts idling from now
+            self.last_active[self.current] = now
+
+        view = self.tabs.widget(index)
+        self.current = view
+        if view is None:
+            return
+        self.last_active[view] = now
+
+        url = self.pending.pop(view, None)
+        if url is not None:
+            view.load(QUrl(url))
+            return
+
+        page = view.page()
+        if page.lifecycleState() != LifecycleState.Active:
+            if page.lifecycleState() != LifecycleState.Discarded:
+                # A frozen page keeps its layout, only a reload loses the scroll position
+                self.scroll.pop(view, None)
+            page.setLifecycleState(LifecycleState.Active)
+
+    def restore_scroll(self, view):
+        position = self.scroll.pop(view, None)
+        if position is not None:
+            view.page().runJavaScript('window.scrollTo(%d, %d)' % (position.x(), position.y()))
+
+    def set_state(self, view, state) -> bool:
+        page = view.page()
+        recommended = page.recommendedState()
+        if state.value > recommended.value:
+            state = recommended
+        if state.value <= page.lifecycleState().value:
+            return False
+        if state == LifecycleState.Discarded:
+            self.scroll[view] = page.scrollPosition()
+        page.setLifecycleState(state)
+        return True
+
+    def hibernate(self):
+        freeze_after = self.setting_manager.get_setting('tab_freeze_after')
+        discard_after = self.setting_manager.get_setting('tab_discard_after')
+        budget = self.setting_manager.get_setting('tab_memory_budget')
+
+        now = time.monotonic()
+        current = self.tabs.currentWidget()
+        live = []
+        for index in range(self.tabs.count()):
+            view = self.tabs.widget(index)
+            if view is current or view in self.pending:
+                continue
+            idle = now - self.last_active.get(view, now)
+            if discard_after and idle >= discard_after:
+                self.set_state(view, LifecycleState.Discarded)
+            elif freeze_after and idle >= freeze_after:
+                self.set_state(view, LifecycleState.Frozen)
+            if view.page().lifecycleState() != LifecycleState.Discarded:
+                live.append((idle, view))
+
+        if budget and live:
+            memory = renderer_memory()
+            if memory is not None and memory > budget * 1024 * 1024:
+                # Memory is released asynchronously, so discard one tab per check
+                for _, view in sorted(live, key=lambda item: item[0], reverse=True):
+                    if self.set_state(view, LifecycleState.Discarded):
+                        break
@@ -0,0 +1,288 @@
+import heapq
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+
+# Frecency is visit count times exp(-DECAY * age). Taking the log and dropping the term every entry
+# shares (the current time) leaves log(count) + DECAY * last_visit, which never has to be recomputed
+# as time passes: only a new visit changes an entry's score.
+HALF_LIFE = 14 * 24 * 3600
+DECAY = math.log(2) / HALF_LIFE
+EPOCH = 1700000000
+BOOKMARK_VISITS = 5
+
+# New URLs are searched linearly until this many have piled up, then the index is rebuilt
+OVERFLOW_LIMIT = 5000
+
+
+def frecency(visit_count, last_visit) -> float:
+    return math.log(max(visit_count, 1)) + DECAY * ((last_visit or EPOCH) - EPOCH)
+
+
+def url_key(url) -> str:
+    # What people type: no scheme, no www., lower case
+    key = url.lower()
+    if key.startswith(('https://', 'http://')):
+        key = key.partition('://')[2]
+    return key[4:] if key.startswith('www.') else key
+
+
+class PrefixIndex:
+    """
+    Sorted prefix keys with a max segment tree over their scores.
+
+    All keys starting with a prefix form one contiguous range of the sorted array; the segment tree
+    hands out the best entries of that range in score order in O(k log n), however wide it is.
+    Scores can be raised in place, new keys need a rebuild.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, pairs, scores):
+        # pairs: (key, entry id) with at most two keys per entry; scores: score per entry id
+        self.count = len(scores)
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        ids = [entry_id for _, entry_id in pairs]
+        self.ids = array('i', ids)
+
+        # Leaf positions of entry i are positions[2 * i] and positions[2 * i + 1], -1 when unused
+        positions = array('i', [-1]) * (2 * self.count)
+        for position, entry_id in enumerate(ids):
+            slot = 2 * entry_id
+            positions[slot if positions[slot] < 0 else slot + 1] = position
+        self.positions = positions
+
+        size = 1
+        while size < max(len(ids), 1):
+            size *= 2
+        self.size = size
+        leaves = [scores[entry_id] for entry_id in ids]
+        leaves.extend([-math.inf] * (size - len(ids)))
+        self.scores = array('d', leaves)
+
+        # tree[node] is the leaf position holding the best score below node, built a level at a time
+        levels = [list(range(size))]
+        while len(levels[-1]) > 1:
+            level = levels[-1]
+            levels.append([left if leaves[left] >= leaves[right] else right
+                           for left, right in zip(level[0::2], level[1::2])])
+        tree = [0]
+        for level in reversed(levels):
+            tree.extend(level)
+        self.tree = array('i', tree)
+
+    def update(self, entry_id, score):
+        for position in self.positions[2 * entry_id:2 * entry_id + 2]:
+            if position < 0:
+                continue
+            self.scores[position] = score
+            node = (self.size + position) // 2
+            while node:
+                left, right = self.tree[2 * node], self.tree[2 * node + 1]
+                self.tree[node] = left if self.scores[left] >= self.scores[right] else right
+                node //= 2
+
+    def best(self, prefix):
+        """
+        Yield (score, entry id) for keys starting with prefix, best first; an entry may repeat.
+
+        :param prefix: Normalized prefix.
+        :return: Generator
+        :since: 1.0.0
+        """
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + '\U0010ffff')
+        if lo >= hi:
+            return
+
+        # Canonical nodes exactly covering [lo, hi), then always expand the best one
+        heap = []
+        left, right = lo + self.size, hi + self.size
+        while left < right:
+            if left & 1:
+                heap.append((-self.scores[self.tree[left]], left))
+                left += 1
+            if right & 1:
+                right -= 1
+                heap.append((-self.scores[self.tree[right]], right))
+            left //= 2
+            right //= 2
+        heapq.heapify(heap)
+        while heap:
+            score, node = heapq.heappop(heap)
+            if node >= self.size:
+                yield -score, self.ids[node - self.size]
+            else:
+                for child in (2 * node, 2 * node + 1):
+                    heapq.heappush(heap, (-self.scores[self.tree[child]], child))
+
+
+class Omnibox:
+    """
+    Address bar suggestions from history and bookmarks, ranked by frecency.
+
+    URLs (without scheme and www.) and titles are indexed by prefix. The index is built in a
+    background thread from the history and bookmark databases; until it is ready suggest() returns
+    nothing. Visits and bookmarks recorded afterwards update it incrementally.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, history_manager, bookmark_manager):
+        self.history_manager = history_manager
+        self.bookmark_manager = bookmark_manager
+        self.lock = threading.RLock()
+        self.entries = []
+        self.by_url = {}
+        self.index = None
+        self.overflow = []
+        self.ready = threading.Event()
+        self.building = False
+        self.stale = False
+
+    def load(self, background=True):
+        """
+        Build the index from the databases, in a daemon thread unless background is False.
+
+        :param background: Build without blocking the caller.
+        :return: None
+        :since: 1.0.0
+        """
+        with self.lock:
+            if self.building:
+                # Whatever the running build has read may already be out of date
+                self.stale = True
+                return
+            self.building = True
+            self.stale = False
+        if background:
+            threading.Thread(target=self.build, daemon=True).start()
+        else:
+            self.build()
+
+    def bookmarks(self):
+        # (url, title, added) of every bookmark, added as Unix time
+        now = int(time.time())
+        for url, title, added in self.bookmark_manager.storage.execute('SELECT url, title, time FROM bookmark'):
+            try:
+                added = int(datetime.strptime(added, '%Y-%m-%d %H:%M:%S').timestamp())
+            except (TypeError, ValueError):
+                added = now
+            yield url, title, added
+
+    def build(self):
+        try:
+            # History URLs are unique already, so they become entries in one pass
+            self.history_manager.flush()
+            entries = [[url, title, visit_count, last_visit or 0, False]
+                       for url, title, visit_count, last_visit in self.history_manager.storage.execute(
+                           'SELECT url, title, visit_count, last_visit FROM urls WHERE url IS NOT NULL')]
+            by_url = {entry[0]: entry_id for entry_id, entry in enumerate(entries)}
+
+            # Bookmarks count as a few visits and are flagged in the suggestions
+            for url, title, added in self.bookmarks():
+                entry_id = by_url.get(url)
+                if entry_id is None:
+                    by_url[url] = len(entries)
+                    entries.append([url, title, BOOKMARK_VISITS, added, True])
+                else:
+                    entry = entries[entry_id]
+                    entry[1] = entry[1] or title
+                    entry[2] += BOOKMARK_VISITS
+                    entry[3] = max(entry[3], added)
+                    entry[4] = True
+
+            pairs = [(url_key(entry[0]), entry_id) for entry_id, entry in enumerate(entries)]
+            pairs.extend((entry[1].lower(), entry_id) for entry_id, entry in enumerate(entries) if entry[1])
+            index = PrefixIndex(pairs, [frecency(entry[2], entry[3]) for entry in entries])
+
+            with self.lock:
+                # Visits recorded while building are replayed on top of the fresh index
+                late = [self.entries[entry_id] for entry_id, _, _ in self.overflow if self.entries[entry_id][0] not in by_url]
+                self.entries, self.by_url, self.index, self.overflow = entries, by_url, index, []
+                for url, title, visit_count, last_visit, bookmarked in late:
+                    self.add(url, title, visit_count, last_visit, bookmarked)
+        finally:
+            with self.lock:
+                self.building = False
+                stale = self.stale
+            self.ready.set()
+        if stale:
+            self.load()
+
+    def add(self, url, title, visit_count, last_visit, bookmarked=False):
+        with self.lock:
+            entry_id = self.by_url.get(url)
+            if entry_id is not None:
+                entry = self.entries[entry_id]
+                entry[1] = title or entry[1]
+                entry[2] += visit_count
+                entry[3] = max(entry[3], last_visit)
+                entry[4] = entry[4] or bookmarked
+                if self.index is not None and entry_id < self.index.count:
+                    self.index.update(entry_id, frecency(entry[2], entry[3]))
+                return
+            self.by_url[url] = len(self.entries)
+            self.entries.append([url, title, visit_count, last_visit, bookmarked])
+            self.overflow.append((len(self.entries) - 1, url_key(url), (title or '').lower()))
+            rebuild = len(self.overflow) > OVERFLOW_LIMIT and self.ready.is_set()
+        if rebuild:
+            self.load()
+
+    def record_visit(self, url, title=None, when=None):
+        """
+        Count a visit of url, e.g. right after it was added to the history.
+
+        :param url: Visited URL.
+        :param title: Page title.
+        :param when: Unix time of the visit, now when None.
+        :return: None
+        :since: 1.0.0
+        """
+        self.add(url, title, 1, int(when or time.time()))
+
+    def record_bookmark(self, url, title=None):
+        self.add(url, title, BOOKMARK_VISITS, int(time.time()), True)
+
+    def invalidate(self):
+        # Deleted history and imported rows cannot be merged in place; rebuild from the databases
+        self.load()
+
+    def suggest(self, text, limit=8):
+        """
+        Return up to limit suggestions for what was typed so far, best first.
+
+        :param text: Text in the address bar.
+        :param limit: Maximum number of suggestions.
+        :return: List of (url, title, bookmarked) tuples.
+        :since: 1.0.0
+        """
+        prefix = url_key(text.strip())
+        if not prefix:
+            return []
+        with self.lock:
+            entries = self.entries
+            found = []
+            seen = set()
+            if self.index is not None:
+                for score, entry_id in self.index.best(prefix):
+                    if entry_id not in seen:
+                        seen.add(entry_id)
+                        found.append((score, entry_id))
+                        if len(found) == limit:
+                            break
+
+            # URLs first visited since the last build, at most OVERFLOW_LIMIT of them
+            for entry_id, key, title in self.overflow:
+                if key.startswith(prefix) or title.startswith(prefix):
+                    entry = entries[entry_id]
+                    found.append((frecency(entry[2], entry[3]), entry_id))
+
+            found.sort(reverse=True)
+            return [(entries[entry_id][0], entries[entry_id][1], entries[entry_id][4])
+                    for _, entry_id in found[:limit]]
@@ -0,0 +1,152 @@
+import math
+import os
+import time
+from urllib.parse import urlsplit
+
+from lib.storage import Storage, WriteBehind
+
+
+# Only the latest navigations are kept, older rows are dropped as new ones arrive
+MAX_ROWS = 5000
+METRICS = ('ttfb', 'dom_content_loaded', 'load', 'first_contentful_paint', 'qt_load')
+
+# Run in the page after loadFinished; times are milliseconds from the start of the navigation
+TIMING_SCRIPT = '''
+(() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    if (!nav) return null;
+    const paint = name => {
+        const entry = performance.getEntriesByName(name)[0];
+        return entry ? entry.startTime : null;
+    };
+    return {
+        dns: nav.domainLookupEnd - nav.domainLookupStart,
+        connect: nav.connectEnd - nav.connectStart,
+        ttfb: nav.responseStart - nav.startTime,
+        dom_content_loaded: nav.domContentLoadedEventEnd - nav.startTime,
+        load: (nav.loadEventEnd || nav.loadEventStart) - nav.startTime,
+        first_paint: paint('first-paint'),
+        first_contentful_paint: paint('first-contentful-paint'),
+        transfer_size: nav.transferSize,
+    };
+})()
+'''
+
+
+def percentile(values, fraction):
+    # Nearest rank of sorted values
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(math.ceil(fraction * len(values)) - 1, 0))]
+
+
+class Performance:
+    """
+    Timing of page loads: the Qt load signals plus the page's Navigation and Paint Timing.
+
+    Rows are queued and written in batches like visits, and the table is a ring buffer of the last
+    MAX_ROWS navigations, so it stays small however long the browser runs.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, db_path=None):
+        # Use absolute path for database file
+        current_dir = os.path.dirname(__file__)
+        self.db_path = db_path or os.path.join(current_dir, '..', 'data', 'performance.db')
+        self.storage = Storage.get(self.db_path)
+        self.init_db()
+        self.writer = WriteBehind(self.storage, self.write_navigations)
+
+    def init_db(self):
+        with self.storage.transaction() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS navigation (
+                    id INTEGER PRIMARY KEY,
+                    time INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    domain TEXT NOT NULL,
+                    qt_load REAL,
+                    dns REAL,
+                    connect REAL,
+                    ttfb REAL,
+                    dom_content_loaded REAL,
+                    load REAL,
+                    first_paint REAL,
+                    first_contentful_paint REAL,
+                    transfer_size INTEGER
+                )
+            ''')
+
+    @staticmethod
+    def write_navigations(cursor, rows):
+        cursor.executemany('''
+            INSERT INTO navigation (time, url, domain, qt_load, dns, connect, ttfb, dom_content_loaded, load,
+                                    first_paint, first_contentful_paint, transfer_size)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        cursor.execute('DELETE FROM navigation WHERE id <= (SELECT MAX(id) FROM navigation) - ?', (MAX_ROWS,))
+
+    def add_navigation(self, url, qt_load, timing=None):
+        """
+        Record one finished page load.
+
+        :param url: URL of the page.
+        :param qt_load: Milliseconds from loadStarted to loadFinished.
+        :param timing: Result of TIMING_SCRIPT, None when the page had no navigation entry.
+        :return: None
+        :since: 1.0.0
+        """
+        timing = timing if isinstance(timing, dict) else {}
+
+        def metric(name):
+            # Negative values mean the event had not happened when the timing was read
+            value = timing.get(name)
+            return value if isinstance(value, (int, float)) and value >= 0 else None
+
+        self.writer.put((int(time.time()), url, urlsplit(url).hostname or '', qt_load,
+                         metric('dns'), metric('connect'), metric('ttfb'), metric('dom_content_loaded'),
+                         metric('load'), metric('first_paint'), metric('first_contentful_paint'),
+                         metric('transfer_size')))
+
+    def get_summary(self, since=None):
+        """
+        Return p50 and p95 of every metric per domain, busiest domains first, after an "all" row.
+
+        :param since: Only navigations after this Unix time, all when None.
+        :return: List of dictionaries with domain, count and <metric>_p50 / <metric>_p95 keys.
+        :since: 1.0.0
+        """
+        self.writer.flush()
+        rows = self.storage.execute(f'''
+            SELECT domain, {', '.join(METRICS)} FROM navigation WHERE time >= ?
+        ''', (since or 0,)).fetchall()
+
+        # None is the "all" group; file:, about: and data: pages have an empty domain of their own
+        groups = {None: rows}
+        for row in rows:
+            groups.setdefault(row[0], []).append(row)
+
+        summary = []
+        for domain, group in groups.items():
+            entry = {'domain': 'all' if domain is None else domain or '(local)', 'count': len(group)}
+            for column, metric in enumerate(METRICS, 1):
+                values = sorted(row[column] for row in group if row[column] is not None)
+                entry[metric + '_p50'] = percentile(values, 0.5)
+                entry[metric + '_p95'] = percentile(values, 0.95)
+            summary.append(entry)
+        summary[1:] = sorted(summary[1:], key=lambda entry: (-entry['count'], entry['domain']))
+        return summary
+
+    def get_recent(self, limit=50):
+        self.writer.flush()
+        cursor = self.storage.execute(f'''
+            SELECT time, url, {', '.join(METRICS)}, transfer_size FROM navigation ORDER BY id DESC LIMIT ?
+        ''', (limit,))
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def clear(self):
+        self.writer.flush()
+        with self.storage.transaction() as cursor:
+            return cursor.execute('DELETE FROM navigation').rowcount
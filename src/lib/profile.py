@@ -0,0 +1,60 @@
+import os
+
+from PyQt6.QtWebEngineCore import QWebEngineProfile
+
+from lib.engine import USER_AGENT
+
+
+CACHE_TYPES = {
+    'disk': QWebEngineProfile.HttpCacheType.DiskHttpCache,
+    'memory': QWebEngineProfile.HttpCacheType.MemoryHttpCache,
+    'none': QWebEngineProfile.HttpCacheType.NoCache,
+}
+
+COOKIE_POLICIES = {
+    'none': QWebEngineProfile.PersistentCookiesPolicy.NoPersistentCookies,
+    'allow': QWebEngineProfile.PersistentCookiesPolicy.AllowPersistentCookies,
+    'force': QWebEngineProfile.PersistentCookiesPolicy.ForcePersistentCookies,
+}
+
+
+class JaalProfile(QWebEngineProfile):
+    """
+    The one profile shared by every tab, configured from the settings.
+
+    A named profile keeps its HTTP cache, cookies and local storage on disk under data/profile, so
+    repeat visits are served from the cache across restarts. The implicit default profile would pick
+    Qt's defaults and its own storage location instead. The cache settings can be changed while the
+    browser runs; apply() reads them again.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, setting_manager, storage_path=None, parent=None):
+        super().__init__('Jaal', parent)
+        current_dir = os.path.dirname(__file__)
+        self.setting_manager = setting_manager
+        self.storage_path = os.path.abspath(storage_path or os.path.join(current_dir, '..', 'data', 'profile'))
+        self.setPersistentStoragePath(self.storage_path)
+        self.apply()
+
+    def apply(self):
+        """
+        Apply the cache, cookie and user agent settings to the profile.
+
+        :return: None
+        :since: 1.0.0
+        """
+        cache_type = self.setting_manager.get_setting('cache_type')
+        self.setHttpCacheType(CACHE_TYPES.get(cache_type, CACHE_TYPES['disk']))
+        self.setCachePath(os.path.abspath(self.setting_manager.get_setting('cache_dir')
+                                          or os.path.join(self.storage_path, 'cache')))
+
+        # 0 lets Chromium size the disk cache itself
+        cache_size = self.setting_manager.get_setting('cache_size_mb') or 0
+        self.setHttpCacheMaximumSize(max(int(cache_size), 0) * 1024 * 1024)
+
+        cookie_policy = self.setting_manager.get_setting('persistent_cookies')
+        self.setPersistentCookiesPolicy(COOKIE_POLICIES.get(cookie_policy, COOKIE_POLICIES['allow']))
+
+        self.setHttpUserAgent(self.setting_manager.get_setting('user_agent') or USER_AGENT)
@@ -0,0 +1,261 @@
+import io
+from urllib.parse import urlsplit
+
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QUrl
+from PyQt6.QtWebEngineCore import QWebEngineUrlRequestJob, QWebEngineUrlScheme, QWebEngineUrlSchemeHandler
+from werkzeug.exceptions import HTTPException
+
+
+SCHEME = b'jaal'
+# Most bytes of a streamed response produced per read, so the GUI thread is never held long
+READ_SIZE = 64 * 1024
+
+
+def register_scheme():
+    """
+    Register the jaal:// scheme with Qt WebEngine. Must run before the QApplication is created.
+
+    :return: None
+    :since: 1.0.0
+    """
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    # A local scheme, like file:, so web pages can neither load nor fetch jaal:// URLs
+    scheme.setFlags(
+        QWebEngineUrlScheme.Flag.SecureScheme
+        | QWebEngineUrlScheme.Flag.LocalScheme
+        | QWebEngineUrlScheme.Flag.LocalAccessAllowed
+        | QWebEngineUrlScheme.Flag.FetchApiAllowed
+    )
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def request_bodies_supported() -> bool:
+    """
+    Check whether scheme handlers can read request bodies, which Qt WebEngine exposes from Qt 6.7.
+
+    Without them every POST from an internal page reaches its route empty.
+
+    :return: bool
+    :since: 1.0.0
+    """
+    return hasattr(QWebEngineUrlRequestJob, 'requestBody')
+
+
+def route_path(app, url, method='GET') -> str:
+    """
+    Map a jaal:// URL to the path of an internal route.
+
+    The host names the page (jaal://history is /history). Sub-resources requested relative to a page,
+    like jaal://history/get_history, fall back to their path when host and path together match no route.
+
+    :param app: Flask application serving the internal pages.
+    :param url: Requested jaal:// URL.
+    :param method: HTTP method of the request.
+    :return: str
+    :since: 1.0.0
+    """
+    parts = urlsplit(url)
+    path = '/' + parts.netloc + parts.path.rstrip('/') if parts.netloc else parts.path
+    try:
+        app.url_map.bind('localhost').match(path, method=method)
+        return path
+    except HTTPException:
+        return parts.path or '/'
+
+
+def open_route(client, app, url, method='GET', body=b'', content_type=None):
+    """
+    Run a jaal:// request through the Flask routes in-process, without a socket.
+
+    The response is not buffered: a streamed body, like an export, is only produced as it is read.
+    A request body given as a binary stream is read by the route as it goes, like an import.
+
+    :param client: Flask test client of the application.
+    :param app: Flask application serving the internal pages.
+    :param url: Requested jaal:// URL.
+    :param method: HTTP method of the request.
+    :param body: Request body, bytes or a binary stream of unknown length.
+    :param content_type: Content type of the request body.
+    :return: werkzeug.test.TestResponse, to be closed by the caller.
+    :since: 1.0.0
+    """
+    if hasattr(body, 'read'):
+        # Read to the end of the stream, as no Content-Length is known up front
+        source = {'environ_overrides': {'wsgi.input': body, 'wsgi.input_terminated': True}}
+    else:
+        source = {'data': body}
+    return client.open(
+        route_path(app, url, method),
+        method=method,
+        query_string=urlsplit(url).query,
+        headers={'Content-Type': content_type} if body and content_type else {},
+        buffered=False,
+        **source
+    )
+
+
+def dispatch(client, app, url, method='GET', body=b'', content_type='application/json'):
+    """
+    Serve a jaal:// request from the Flask routes in-process, with the whole body in memory.
+
+    :param client: Flask test client of the application.
+    :param app: Flask application serving the internal pages.
+    :param url: Requested jaal:// URL.
+    :param method: HTTP method of the request.
+    :param body: Request body.
+    :param content_type: Content type of the request body.
+    :return: Tuple of status code, MIME type, body and redirect location.
+    :since: 1.0.0
+    """
+    response = open_route(client, app, url, method, body, content_type)
+    try:
+        return response.status_code, response.mimetype, response.get_data(), response.headers.get('Location')
+    finally:
+        response.close()
+
+
+def request_header(job, name):
+    # Request headers are only exposed from Qt 6.5
+    if not hasattr(job, 'requestHeaders'):
+        return None
+    for key, value in job.requestHeaders().items():
+        if bytes(key).decode('latin-1').lower() == name:
+            return bytes(value).decode('latin-1')
+    return None
+
+
+class RequestStream(io.RawIOBase):
+    """
+    Binary file over the request body device of a jaal:// job, so routes read uploads as they go.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, device):
+        super().__init__()
+        self.device = device
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = bytes(self.device.read(len(buffer)))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class ResponseDevice(QIODevice):
+    """
+    Sequential device over the body of a streamed Flask response.
+
+    Chunks are pulled from the response as Qt WebEngine reads the reply, so a large export is sent
+    as it is generated instead of being built in memory first. Generating still happens on the GUI
+    thread, one chunk per read.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, response, parent=None):
+        super().__init__(parent)
+        self.response = response
+        self.chunks = response.iter_encoded()
+        self.pending = b''
+        self.done = False
+        self.open(QIODevice.OpenModeFlag.ReadOnly)
+
+    def fill(self):
+        while not self.pending and not self.done:
+            try:
+                self.pending = next(self.chunks)
+            except StopIteration:
+                self.done = True
+                self.response.close()
+
+    def isSequential(self):
+        return True
+
+    def bytesAvailable(self):
+        self.fill()
+        return len(self.pending) + super().bytesAvailable()
+
+    def atEnd(self):
+        self.fill()
+        return self.done and not self.pending and super().atEnd()
+
+    def readData(self, maxlen):
+        # Export chunks are single lines; gather up to READ_SIZE bytes into one read
+        parts = []
+        size = min(maxlen, READ_SIZE)
+        while size > 0:
+            self.fill()
+            if not self.pending:
+                break
+            part, self.pending = self.pending[:size], self.pending[size:]
+            parts.append(part)
+            size -= len(part)
+        return b''.join(parts)
+
+    def writeData(self, data):
+        return -1
+
+    def close(self):
+        if not self.done:
+            self.done = True
+            self.response.close()
+        super().close()
+
+
+class JaalSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Serve jaal:// pages and APIs from memory on the GUI thread.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, app, parent=None):
+        super().__init__(parent)
+        self.app = app
+        self.client = app.test_client()
+
+    def requestStarted(self, job):
+        # Only jaal:// pages and the browser itself (no initiator) may use the internal routes
+        initiator = job.initiator()
+        if not initiator.isEmpty() and initiator.scheme() != SCHEME.decode():
+            job.fail(QWebEngineUrlRequestJob.Error.RequestDenied)
+            return
+
+        method = bytes(job.requestMethod()).decode()
+        url = job.requestUrl().toString()
+
+        body = b''
+        device = job.requestBody() if request_bodies_supported() else None
+        if device is not None:
+            body = io.BufferedReader(RequestStream(device), READ_SIZE)
+        # Without request headers (before Qt 6.5) the bodies of the internal pages are JSON
+        content_type = request_header(job, 'content-type') if hasattr(job, 'requestHeaders') else 'application/json'
+
+        response = open_route(self.client, self.app, url, method, body, content_type)
+        status = response.status_code
+        location = response.headers.get('Location')
+
+        if 300 <= status < 400 and location:
+            response.close()
+            job.redirect(QUrl(location))
+        elif status == 404:
+            response.close()
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+        elif status >= 400:
+            response.close()
+            job.fail(QWebEngineUrlRequestJob.Error.RequestFailed)
+        else:
+            # Devices are parented to the job so they live exactly as long as the reply
+            mimetype = QByteArray((response.mimetype or 'application/octet-stream').encode())
+            if response.is_streamed:
+                job.reply(mimetype, ResponseDevice(response, job))
+                return
+            buffer = QBuffer(job)
+            buffer.setData(QByteArray(response.get_data()))
+            buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+            response.close()
+            job.reply(mimetype, buffer)
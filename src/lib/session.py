@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+
+from lib.storage import Storage, WriteBehind
+
+
+class Session:
+    """
+    Journal of the open tabs, one row per tab, so the browser can be restored after a crash.
+
+    Every change is queued and written as a small transaction touching only the tabs that changed;
+    several changes of one tab within a flush collapse into a single row write. The database runs in
+    WAL mode, so a crash loses at most the last flush interval and never leaves a half-written file.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, db_path=None):
+        # Use absolute path for database file
+        current_dir = os.path.dirname(__file__)
+        self.db_path = db_path or os.path.join(current_dir, '..', 'data', 'session.db')
+        self.storage = Storage.get(self.db_path)
+        self.init_db()
+
+        self.lock = threading.Lock()
+        self.last_id = self.storage.execute('SELECT COALESCE(MAX(id), 0) FROM tab').fetchone()[0]
+        self.writer = WriteBehind(self.storage, self.write_changes, flush_interval=1.0)
+
+    def init_db(self):
+        with self.storage.transaction() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tab (
+                    id INTEGER PRIMARY KEY,
+                    url TEXT,
+                    title TEXT,
+                    entries TEXT,
+                    entry_index INTEGER NOT NULL DEFAULT 0,
+                    last_active INTEGER
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS state (
+                    name TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            ''')
+
+    @staticmethod
+    def write_changes(cursor, rows):
+        # Keep only the latest change per tab (a save or its removal), in the order they were last touched
+        latest = {}
+        for row in rows:
+            key = row[0] if row[0] == 'active' else row[1]
+            latest.pop(key, None)
+            latest[key] = row
+        for row in latest.values():
+            if row[0] == 'tab':
+                cursor.execute('''
+                    INSERT INTO tab (id, url, title, entries, entry_index, last_active) VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        url = excluded.url,
+                        title = excluded.title,
+                        entries = COALESCE(excluded.entries, entries),
+                        entry_index = excluded.entry_index,
+                        last_active = COALESCE(excluded.last_active, last_active)
+                ''', row[1:])
+            elif row[0] == 'remove':
+                cursor.execute('DELETE FROM tab WHERE id = ?', (row[1],))
+            elif row[0] == 'active':
+                cursor.execute("INSERT OR REPLACE INTO state (name, value) VALUES ('active_tab', ?)", (row[1],))
+
+    def new_tab_id(self) -> int:
+        with self.lock:
+            self.last_id += 1
+            return self.last_id
+
+    def save_tab(self, tab_id, url, title, entries=None, entry_index=0, last_active=None):
+        """
+        Record the current state of a tab.
+
+        :param tab_id: Id from new_tab_id(), or the id the tab was restored with.
+        :param url: Current URL of the tab.
+        :param title: Current title of the tab.
+        :param entries: Navigation history as a list of (url, title), None to keep the stored one.
+        :param entry_index: Index of the current entry in entries.
+        :param last_active: Unix time the tab was last shown, None to keep the stored one.
+        :return: None
+        :since: 1.0.0
+        """
+        self.writer.put(('tab', tab_id, url, title, json.dumps(entries) if entries is not None else None,
+                         entry_index, last_active))
+
+    def activate_tab(self, tab_id):
+        self.writer.put(('active', tab_id))
+
+    def remove_tab(self, tab_id):
+        self.writer.put(('remove', tab_id))
+
+    def load(self):
+        """
+        Return the saved tabs in their tab-bar order and the id of the tab that was active.
+
+        :return: Tuple of a list of dicts and the active tab id or None.
+        :since: 1.0.0
+        """
+        self.writer.flush()
+        tabs = []
+        for tab_id, url, title, entries, entry_index, last_active in self.storage.execute(
+                'SELECT id, url, title, entries, entry_index, last_active FROM tab ORDER BY id'):
+            tabs.append({
+                'id': tab_id,
+                'url': url,
+                'title': title,
+                'entries': json.loads(entries) if entries else [],
+                'entry_index': entry_index,
+                'last_active': last_active or 0
+            })
+        active = self.storage.execute("SELECT value FROM state WHERE name = 'active_tab'").fetchone()
+        return tabs, int(active[0]) if active and active[0] is not None else None
+
+    def clear(self):
+        self.writer.flush()
+        with self.storage.transaction() as cursor:
+            cursor.execute('DELETE FROM tab')
+            cursor.execute('DELETE FROM state')
+
+    def flush(self):
+        return self.writer.flush()
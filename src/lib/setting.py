@@ -1,90 +1,208 @@
 import os
-import sqlite3
-from datetime import datetime
+import threading
+
+from lib.storage import Storage, WriteBehind
+
+
+def to_text(value) -> str:
+    # Settings are stored as TEXT; booleans as 'true'/'false' so they read back unambiguously
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def from_text(text, default):
+    # The type of the default decides how a stored value is read back
+    if text is None or default is None or isinstance(default, str):
+        return text
+    try:
+        if isinstance(default, bool):
+            return text.strip().lower() in ('true', '1', 'yes', 'on')
+        if isinstance(default, int):
+            return int(text)
+        if isinstance(default, float):
+            return float(text)
+    except ValueError:
+        return default
+    return text
+
+
+class SettingCache:
+    """
+    Typed in-memory copy of the setting table, shared by every Setting on one database.
+
+    Reads never touch SQLite. Writes update the copy at once and reach the database through a
+    write-behind queue, where several changes of the same key collapse into one UPSERT.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, storage, rows, defaults):
+        self.lock = threading.Lock()
+        self.defaults = defaults
+        self.values = {name: from_text(value, defaults.get(name)) for name, value in rows}
+        self.listeners = []
+        self.writer = WriteBehind(storage, self.write, flush_interval=1.0)
+
+    @staticmethod
+    def write(cursor, rows):
+        # Only the last value queued for a key matters; None removes the key
+        latest = dict(rows)
+        cursor.executemany('DELETE FROM setting WHERE name = ?',
+                           [(name,) for name, value in latest.items() if value is None])
+        cursor.executemany('''
+            INSERT INTO setting (name, value) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET value = excluded.value
+        ''', [(name, value) for name, value in latest.items() if value is not None])
+
+    def get(self, name):
+        with self.lock:
+            if name in self.values:
+                return self.values[name]
+        return self.defaults.get(name)
+
+    def set(self, name, value) -> bool:
+        # Typed as a reload would read it back, e.g. '60' for an int setting becomes 60
+        if value is not None:
+            value = from_text(to_text(value), self.defaults.get(name))
+        with self.lock:
+            if (self.values[name] == value) if name in self.values else value is None:
+                return False
+            if value is None:
+                self.values.pop(name, None)
+            else:
+                self.values[name] = value
+        self.writer.put((name, None if value is None else to_text(value)))
+        self.notify(name, self.get(name))
+        return True
+
+    def notify(self, name, value):
+        # Listeners run on the thread that changed the setting
+        for callback, key in list(self.listeners):
+            if key is None or key == name:
+                try:
+                    callback(name, value)
+                except Exception as e:
+                    print(f"Error in setting listener: {e}")
 
 
 class Setting:
-    def __init__(self):
+    # One cache per database file, so the browser and the server thread see the same settings
+    caches = {}
+    caches_lock = threading.Lock()
+
+    def __init__(self, db_path=None):
         # Use absolute path for database file
         current_dir = os.path.dirname(__file__)
-        self.db_path = os.path.join(current_dir, '..', 'data', 'bookmark.db')
-        self.init_db()
+        self.db_path = db_path or os.path.join(current_dir, '..', 'data', 'bookmark.db')
+        self.storage = Storage.get(self.db_path)
 
         self.default_setting = {
             'homepage': 'jaal://home',
             'search_engine': 'google',
             'mode': 'light',
+            'internal_pages': 'scheme',
+            'server_engine': 'threaded',
             'download_dir': os.path.join(os.path.expanduser('~'), 'Downloads'),
+            'tab_freeze_after': 300,
+            'tab_discard_after': 1800,
+            'tab_memory_budget': 0,
+            'session_preload_tabs': 3,
+            'block_requests': True,
+            'blocklists': 'https://easylist.to/easylist/easylist.txt https://easylist.to/easylist/easyprivacy.txt',
+            'cache_type': 'disk',
+            'cache_size_mb': 256,
+            'cache_dir': '',
+            'persistent_cookies': 'allow',
+            'user_agent': '',
+            'dashboard_ttl': 600,
+            'dashboard_weather_url': 'https://api.openweathermap.org/data/2.5/weather?q=Dhaka&appid=your_api_key&units=metric',
+            'dashboard_news_url': 'https://news.ulkaa.com/wp-json/wp/v2/posts?_fields=title,link,date&per_page=6',
+            'dashboard_currency_url': 'https://api.exchangerate-api.com/v4/latest/USD',
             'user': None
         }
 
+        self.cache = self.load_cache()
+
     def init_db(self):
-        # Ensure directory exists before connecting
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        # Create tables if they don't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS setting (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                value TEXT NOT NULL
-            )
-        ''')
-        conn.commit()
-        conn.close()
-
-    def set_setting(self, name, value):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('INSERT INTO setting (name, value) VALUES (?, ?)', (name, value))
-        conn.commit()
-        conn.close()
+        with self.storage.transaction() as cursor:
+            # Create tables if they don't exist
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS setting (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    value TEXT NOT NULL
+                )
+            ''')
+
+            # Older builds could insert a name twice; keep the latest row so names can be unique
+            if not cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_setting_name'").fetchone():
+                cursor.execute('DELETE FROM setting WHERE id NOT IN (SELECT MAX(id) FROM setting GROUP BY name)')
+                cursor.execute('CREATE UNIQUE INDEX idx_setting_name ON setting (name)')
+
+    def load_cache(self):
+        with Setting.caches_lock:
+            cache = Setting.caches.get(self.storage.db_path)
+            if cache is None:
+                self.init_db()
+                cache = SettingCache(self.storage, self.storage.execute('SELECT name, value FROM setting'),
+                                     self.default_setting)
+                Setting.caches[self.storage.db_path] = cache
+            return cache
+
+    def set_setting(self, name, value, defer=True):
+        return self.update_setting(name, value, defer)
 
     def get_setting(self, name):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT value FROM setting WHERE name = ?', (name,))
-        setting = cursor.fetchone()
-        conn.close()
-        return setting[0] if setting else None
-
-    def update_setting(self, name, value):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('UPDATE setting SET value = ? WHERE name = ?', (value, name))
-        conn.commit()
-        conn.close()
+        return self.cache.get(name)
+
+    def update_setting(self, name, value, defer=True):
+        # Inserts the key when it was never stored; unchanged values cost nothing
+        changed = self.cache.set(name, value)
+        if changed and not defer:
+            self.flush()
+        return changed
 
     def delete_setting(self, name):
         get_default_setting = self.default_setting.get(name)
         self.update_setting(name, get_default_setting)
 
     def get_all_setting(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT name, value FROM setting')
-        setting = cursor.fetchall()
-        conn.close()
-        return setting
+        values = dict(self.default_setting)
+        with self.cache.lock:
+            values.update(self.cache.values)
+        return list(values.items())
 
     def remove_all_setting(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM setting')
-        conn.commit()
-        conn.close()
+        with self.cache.lock:
+            names = list(self.cache.values)
+        for name in names:
+            self.cache.set(name, None)
+        self.flush()
 
     def is_setting(self, name) -> bool:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id FROM setting WHERE name = ?', (name,))
-        setting = cursor.fetchone()
-        return setting is not None
+        with self.cache.lock:
+            return name in self.cache.values
 
     def set_default_setting(self):
         for name, value in self.default_setting.items():
-            if not self.is_setting(name):
-                self.set_setting(name, value)
-            else:
-                self.update_setting(name, value)
+            self.update_setting(name, value)
+        self.flush()
+
+    def subscribe(self, callback, name=None):
+        """
+        Call ``callback(name, value)`` whenever a setting changes, from any thread.
+
+        :param callback: Function receiving the setting name and its new value.
+        :param name: Only report this setting, or every setting when None.
+        :return: The callback, for unsubscribe().
+        :since: 1.0.0
+        """
+        self.cache.listeners.append((callback, name))
+        return callback
+
+    def unsubscribe(self, callback):
+        self.cache.listeners[:] = [listener for listener in self.cache.listeners if listener[0] != callback]
+
+    def flush(self):
+        return self.cache.writer.flush()
@@ -0,0 +1,334 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+def match_expression(text) -> str:
+    """
+    Turn free text typed by the user into an FTS5 query matching every word as a prefix.
+
+    :param text: Search text.
+    :return: str
+    :since: 1.0.0
+    """
+    words = re.findall(r'\w+', text or '')
+    return ' '.join('"%s"*' % word for word in words)
+
+
+def like_pattern(text) -> str:
+    """
+    Turn search text into a LIKE pattern matching it anywhere, escaped with a backslash.
+
+    :param text: Search text.
+    :return: str
+    :since: 1.0.0
+    """
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def create_fts_index(cursor, table, columns) -> bool:
+    """
+    Create an external-content FTS5 index over some columns of a table, kept in sync by triggers.
+
+    The index is filled from the table the first time it is created. Returns False when this
+    SQLite build has no FTS5, so callers can fall back to LIKE scans.
+
+    :param cursor: Cursor inside an open transaction.
+    :param table: Indexed table with an INTEGER PRIMARY KEY ``id``.
+    :param columns: Indexed column names.
+    :return: bool
+    :since: 1.0.0
+    """
+    fts = table + '_fts'
+    exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)).fetchone()
+    if exists is None:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE %s USING fts5(%s, content='%s', content_rowid='id')"
+                           % (fts, ', '.join(columns), table))
+        except sqlite3.OperationalError:
+            return False
+        cursor.execute("INSERT INTO %s (%s) VALUES ('rebuild')" % (fts, fts))
+
+    values = {
+        'table': table,
+        'fts': fts,
+        'names': ', '.join(columns),
+        'new': ', '.join('new.' + column for column in columns),
+        'old': ', '.join('old.' + column for column in columns),
+    }
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS %(table)s_fts_insert AFTER INSERT ON %(table)s BEGIN
+            INSERT INTO %(fts)s (rowid, %(names)s) VALUES (new.id, %(new)s);
+        END
+    ''' % values)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS %(table)s_fts_delete AFTER DELETE ON %(table)s BEGIN
+            INSERT INTO %(fts)s (%(fts)s, rowid, %(names)s) VALUES ('delete', old.id, %(old)s);
+        END
+    ''' % values)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS %(table)s_fts_update AFTER UPDATE OF %(names)s ON %(table)s BEGIN
+            INSERT INTO %(fts)s (%(fts)s, rowid, %(names)s) VALUES ('delete', old.id, %(old)s);
+            INSERT INTO %(fts)s (rowid, %(names)s) VALUES (new.id, %(new)s);
+        END
+    ''' % values)
+    return True
+
+
+class Storage:
+    """
+    Long-lived SQLite connections for one database file, one connection per thread.
+
+    The Qt thread and the Flask thread both talk to the same files, so every thread gets its own
+    connection, opened once and reused for the lifetime of the process. Statements are cached by
+    the connection itself (``cached_statements``), so repeated queries skip the parse step.
+    """
+
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    # auto_vacuum only takes effect on a new file, so it has to come before journal_mode writes the header
+    PRAGMAS = (
+        'PRAGMA auto_vacuum = INCREMENTAL',
+        'PRAGMA journal_mode = WAL',
+        'PRAGMA synchronous = NORMAL',
+        'PRAGMA cache_size = -8000',
+        'PRAGMA temp_store = MEMORY',
+        'PRAGMA busy_timeout = 5000',
+    )
+    CACHED_STATEMENTS = 256
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.writers = []
+
+    @classmethod
+    def get(cls, db_path):
+        """
+        Return the shared storage for a database file, creating it on first use.
+
+        :param db_path: Path of the SQLite database file.
+        :return: Storage
+        :since: 1.0.0
+        """
+        db_path = os.path.abspath(db_path)
+        with cls._registry_lock:
+            storage = cls._registry.get(db_path)
+            if storage is None:
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+                storage = cls(db_path)
+                cls._registry[db_path] = storage
+            return storage
+
+    @classmethod
+    def close_all(cls):
+        """
+        Close every connection of every shared storage, e.g. on browser exit.
+
+        :return: None
+        :since: 1.0.0
+        """
+        with cls._registry_lock:
+            storages = list(cls._registry.values())
+        for storage in storages:
+            storage.close()
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Return the connection owned by the calling thread, opening it on first use.
+
+        :return: sqlite3.Connection
+        :since: 1.0.0
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                cached_statements=self.CACHED_STATEMENTS,
+                check_same_thread=False
+            )
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def execute(self, sql, params=()) -> sqlite3.Cursor:
+        """
+        Run a read-only statement on the calling thread's connection.
+
+        :param sql: SQL statement.
+        :param params: Statement parameters.
+        :return: sqlite3.Cursor
+        :since: 1.0.0
+        """
+        return self.connection().execute(sql, params)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run a block of writes as a single transaction, committed on success and rolled back on error.
+
+        :return: sqlite3.Cursor
+        :since: 1.0.0
+        """
+        conn = self.connection()
+        with conn:
+            yield conn.cursor()
+
+    def close(self):
+        """
+        Flush pending writes, then close all connections opened for this database.
+
+        :return: None
+        :since: 1.0.0
+        """
+        for writer in list(self.writers):
+            # A writer that cannot flush, e.g. on a locked database, must not keep the others from flushing
+            try:
+                writer.close()
+            except sqlite3.Error as e:
+                print(f"Error flushing pending writes to {self.db_path}: {e}")
+
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+class WriteBehind:
+    """
+    Buffer rows in memory and write them in one transaction from a background thread.
+
+    ``write`` is either an INSERT statement run with ``executemany`` or a callable taking the cursor
+    and the list of rows. A flush happens when ``flush_size`` rows are waiting, every
+    ``flush_interval`` seconds, on an explicit ``flush()`` and when the owning storage is closed.
+    """
+
+    # Flushes failing with busy or locked errors in a row before the batch is dropped
+    max_retries = 5
+
+    def __init__(self, storage, write, flush_size=50, flush_interval=2.0):
+        self.storage = storage
+        self.write = write
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self.failures = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        storage.writers.append(self)
+
+    def put(self, params):
+        """
+        Queue one row for insertion.
+
+        :param params: Statement parameters of the row.
+        :return: None
+        :since: 1.0.0
+        """
+        with self._condition:
+            self.pending.append(params)
+            if len(self.pending) >= self.flush_size:
+                self._condition.notify()
+
+    def snapshot(self) -> list:
+        """
+        Return a copy of the rows that are not written yet.
+
+        :return: list
+        :since: 1.0.0
+        """
+        with self._condition:
+            return list(self.pending)
+
+    def flush(self) -> int:
+        """
+        Write every pending row in a single transaction.
+
+        :return: Number of rows written.
+        :since: 1.0.0
+        """
+        with self._flush_lock:
+            with self._condition:
+                rows, self.pending = self.pending, []
+            if not rows:
+                return 0
+            try:
+                self._write(rows)
+            except sqlite3.OperationalError as e:
+                # Busy or locked: put the rows back for the next flush, a few times at most
+                self.failures += 1
+                if self.failures <= self.max_retries:
+                    with self._condition:
+                        self.pending[:0] = rows
+                    raise
+                print(f"Dropping {len(rows)} rows after {self.failures} failed writes: {e}")
+                self.failures = 0
+                return 0
+            except sqlite3.Error:
+                # A row that can never be written must not block the others; write them one by one
+                self.failures = 0
+                return self._write_each(rows)
+            self.failures = 0
+            return len(rows)
+
+    def _write(self, rows):
+        with self.storage.transaction() as cursor:
+            if isinstance(self.write, str):
+                cursor.executemany(self.write, rows)
+            else:
+                self.write(cursor, rows)
+
+    def _write_each(self, rows) -> int:
+        written = 0
+        for row in rows:
+            try:
+                self._write([row])
+                written += 1
+            except sqlite3.Error as e:
+                print(f"Dropping row that cannot be written: {e}")
+        return written
+
+    def close(self):
+        """
+        Stop the background thread and write whatever is still pending.
+
+        :return: None
+        :since: 1.0.0
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout=5)
+        if self in self.storage.writers:
+            self.storage.writers.remove(self)
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed or len(self.pending) >= self.flush_size,
+                    timeout=self.flush_interval
+                )
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Busy or locked: rows stay queued and are retried on the next tick
+                pass
@@ -0,0 +1,222 @@
+import functools
+import hashlib
+import importlib.metadata
+import os
+import threading
+
+
+# Bump when the generated stylesheets change so cached ones are rebuilt
+THEME_VERSION = 1
+MODES = ('light', 'dark')
+
+# Futuristic accents on top of the qdarktheme dark palette
+CUSTOM_QSS = {
+    'dark': """
+        /* Main Window */
+        QMainWindow {
+            background-color: #000000;
+        }
+
+        /* ToolBar */
+        QToolBar {
+            background-color: #0a0a0a;
+            border-bottom: 1px solid #333333;
+            spacing: 10px;
+            padding: 5px;
+        }
+
+        QToolButton {
+            background-color: transparent;
+            border: 1px solid transparent;
+            border-radius: 4px;
+            color: #ffffff;
+            padding: 4px;
+        }
+
+        QToolButton:hover {
+            background-color: rgba(57, 255, 20, 0.1); /* Green tint */
+            border: 1px solid rgba(57, 255, 20, 0.3);
+        }
+
+        /* Address Bar */
+        QLineEdit {
+            background-color: rgba(255, 255, 255, 0.08);
+            border: 1px solid #333333;
+            border-radius: 8px;
+            color: #ffffff;
+            padding: 6px 12px;
+            font-size: 14px;
+            selection-background-color: #A855F7; /* Purple */
+        }
+
+        QLineEdit:focus {
+            border: 1px solid #39FF14; /* Green */
+            background-color: rgba(255, 255, 255, 0.12);
+        }
+
+        /* Tab Widget */
+        QTabWidget::pane {
+            border: 1px solid #333333;
+            background-color: #000000;
+        }
+
+        QTabBar::tab {
+            background-color: #111111;
+            color: #888888;
+            border: 1px solid #222222;
+            border-bottom: none;
+            border-top-left-radius: 6px;
+            border-top-right-radius: 6px;
+            padding: 8px 16px;
+            margin-right: 2px;
+            min-width: 120px;
+        }
+
+        QTabBar::tab:selected {
+            background-color: #000000;
+            color: #39FF14; /* Green text */
+            border-top: 2px solid #39FF14; /* Green top border */
+            border-bottom: 1px solid #000000; /* Seamless blend */
+        }
+
+        QTabBar::tab:hover:!selected {
+            background-color: #1a1a1a;
+            color: #ffffff;
+        }
+
+        /* Status Bar */
+        QStatusBar {
+            background-color: #0a0a0a;
+            color: #888888;
+            border-top: 1px solid #222222;
+        }
+
+        /* Menu Bar */
+        QMenuBar {
+            background-color: #0a0a0a;
+            color: #ffffff;
+        }
+
+        QMenuBar::item:selected {
+            background-color: rgba(57, 255, 20, 0.1);
+            color: #39FF14;
+        }
+
+        QMenu {
+            background-color: #111111;
+            border: 1px solid #333333;
+            color: #ffffff;
+        }
+
+        QMenu::item:selected {
+            background-color: rgba(168, 85, 247, 0.2); /* Purple tint */
+            color: #ffffff;
+        }
+""",
+    'light': '',
+}
+
+
+@functools.lru_cache(maxsize=None)
+def qdarktheme_version() -> str:
+    # From the package metadata, so a cache hit never imports qdarktheme before the first paint
+    try:
+        return importlib.metadata.version('pyqtdarktheme')
+    except importlib.metadata.PackageNotFoundError:
+        return ''
+
+
+class ThemeCache:
+    """
+    Build each theme stylesheet once and keep it in memory and on disk.
+
+    A stylesheet is the qdarktheme palette for the mode followed by the custom QSS of the mode. Files
+    under data/theme are named by mode and a key over THEME_VERSION, the qdarktheme version and the
+    custom QSS, so an upgrade of either rebuilds them and older files are removed. Applying a theme
+    replaces the application stylesheet in a single call, which restyles the widgets once and never
+    grows the stylesheet.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, cache_dir=None):
+        current_dir = os.path.dirname(__file__)
+        self.cache_dir = cache_dir or os.path.join(current_dir, '..', 'data', 'theme')
+        self.stylesheets = {}
+        self.applied = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(mode) -> str:
+        source = f"{THEME_VERSION}\0{qdarktheme_version()}\0{CUSTOM_QSS.get(mode, '')}"
+        return hashlib.sha1(source.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def build(mode) -> str:
+        import qdarktheme
+
+        return qdarktheme.load_stylesheet(mode) + CUSTOM_QSS.get(mode, '')
+
+    def stylesheet(self, mode) -> str:
+        """
+        Return the stylesheet of a mode, from memory, the disk cache or freshly built.
+
+        :param mode: 'light' or 'dark'.
+        :return: str
+        :since: 1.0.0
+        """
+        mode = mode if mode in MODES else 'light'
+        with self.lock:
+            stylesheet = self.stylesheets.get(mode)
+            if stylesheet is not None:
+                return stylesheet
+
+            name = f"{mode}-{self.key(mode)}.qss"
+            path = os.path.join(self.cache_dir, name)
+            try:
+                with open(path, encoding='utf-8') as file:
+                    stylesheet = file.read()
+            except OSError:
+                stylesheet = self.build(mode)
+                self.store(mode, name, stylesheet)
+            self.stylesheets[mode] = stylesheet
+            return stylesheet
+
+    def store(self, mode, name, stylesheet):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Written under a temporary name and renamed, so a reader never sees half a stylesheet
+            path = os.path.join(self.cache_dir, name)
+            with open(path + '.tmp', 'w', encoding='utf-8') as file:
+                file.write(stylesheet)
+            os.replace(path + '.tmp', path)
+            for other in os.listdir(self.cache_dir):
+                if other.startswith(mode + '-') and other != name:
+                    os.remove(os.path.join(self.cache_dir, other))
+        except OSError as e:
+            print(f"Error caching {mode} stylesheet: {e}")
+
+    def warm(self, modes=MODES):
+        """
+        Build the stylesheets of modes in a daemon thread, so switching to them later is a single restyle.
+
+        :param modes: Modes to prepare.
+        :return: None
+        :since: 1.0.0
+        """
+        threading.Thread(target=lambda: [self.stylesheet(mode) for mode in modes], daemon=True).start()
+
+    def apply(self, app, mode):
+        """
+        Replace the stylesheet of the application with the one of mode.
+
+        :param app: QApplication to restyle.
+        :param mode: 'light' or 'dark'.
+        :return: None
+        :since: 1.0.0
+        """
+        stylesheet = self.stylesheet(mode)
+        # Setting the same stylesheet again would still restyle every widget
+        if self.applied is not stylesheet:
+            app.setStyleSheet(stylesheet)
+            self.applied = stylesheet
@@ -0,0 +1,366 @@
+import html
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from html.parser import HTMLParser
+from urllib.request import pathname2url
+
+from lib.history import to_timestamp
+
+
+# Rows per transaction when importing, and per fetch from the export cursor
+BATCH = 10000
+FETCH_SIZE = 1000
+FORMATS = ('jsonl', 'html')
+MIMETYPES = {
+    'jsonl': 'application/x-ndjson',
+    'html': 'text/html; charset=utf-8',
+}
+
+
+def format_of(path, default='jsonl') -> str:
+    # Netscape bookmark files are HTML, anything else is taken for JSON Lines
+    return 'html' if path.lower().endswith(('.html', '.htm')) else default
+
+
+def text_lines(lines):
+    # Lines read from binary streams, e.g. a request body, are UTF-8
+    for line in lines:
+        yield line.decode('utf-8', 'replace') if isinstance(line, (bytes, bytearray)) else line
+
+
+def checked(value, types=(str,)):
+    # Fields of an imported line go to SQLite as they are; anything else skips the line
+    if value is not None and (not isinstance(value, types) or isinstance(value, bool)):
+        raise TypeError(f"Unexpected value: {value!r}")
+    return value
+
+
+def local_time(timestamp) -> str:
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+@contextmanager
+def snapshot(db_path):
+    """
+    Open a read-only connection of its own on a database, inside one read transaction.
+
+    An export may be read slowly by a client; on its own connection it neither holds the shared
+    connection of the thread nor sees rows written while it runs.
+
+    :param db_path: Path of the SQLite database file.
+    :return: sqlite3.Connection
+    :since: 1.0.0
+    """
+    conn = sqlite3.connect('file:%s?mode=ro' % pathname2url(os.path.abspath(db_path)), uri=True,
+                           check_same_thread=False)
+    try:
+        conn.execute('BEGIN')
+        yield conn
+    finally:
+        conn.close()
+
+
+def fetch(conn, sql, params=()):
+    # Rows of a query, FETCH_SIZE at a time from the cursor
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        yield from rows
+
+
+def export_history(history_manager):
+    """
+    Yield the history as JSON Lines, one visit per line, oldest first.
+
+    Each line holds ``url``, ``title`` and ``time`` (Unix seconds). Favicons are not exported.
+
+    :param history_manager: History to export.
+    :return: Generator of lines.
+    :since: 1.0.0
+    """
+    history_manager.flush()
+    with snapshot(history_manager.db_path) as conn:
+        for url, title, time in fetch(conn, '''
+            SELECT urls.url, urls.title, visits.time FROM visits JOIN urls ON urls.id = visits.url_id
+            ORDER BY visits.id
+        '''):
+            yield json.dumps({'url': url, 'title': title, 'time': time}, ensure_ascii=False) + '\n'
+
+
+def folder_rows(conn):
+    # Every folder reachable from a top-level one, parents before their children
+    return fetch(conn, '''
+        WITH RECURSIVE tree (id, depth) AS (
+            SELECT id, 0 FROM folder WHERE parent_id IS NULL OR parent_id NOT IN (SELECT id FROM folder)
+            UNION
+            SELECT folder.id, tree.depth + 1 FROM folder JOIN tree ON folder.parent_id = tree.id
+        )
+        SELECT folder.id, folder.name, folder.parent_id, folder.time FROM folder JOIN tree ON tree.id = folder.id
+        ORDER BY tree.depth, folder.id
+    ''')
+
+
+def export_bookmarks(bookmark_manager, format='jsonl'):
+    """
+    Yield the bookmarks and their folders as JSON Lines or as a Netscape bookmark file.
+
+    JSON Lines has a ``{"type": "folder", ...}`` line per folder, parents first, then a
+    ``{"type": "bookmark", ...}`` line per bookmark. The Netscape format is the HTML file every
+    browser imports; bookmarks are read folder by folder, so only the folders are held in memory.
+
+    :param bookmark_manager: Bookmark to export.
+    :param format: 'jsonl' or 'html'.
+    :return: Generator of lines.
+    :since: 1.0.0
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+    with snapshot(bookmark_manager.db_path) as conn:
+        if format == 'jsonl':
+            for folder_id, name, parent_id, time in folder_rows(conn):
+                yield json.dumps({'type': 'folder', 'id': folder_id, 'name': name, 'parent_id': parent_id,
+                                  'time': time}, ensure_ascii=False) + '\n'
+            for title, url, time, folder_id in fetch(conn, 'SELECT title, url, time, folder_id FROM bookmark ORDER BY id'):
+                yield json.dumps({'type': 'bookmark', 'title': title, 'url': url, 'time': time,
+                                  'folder_id': folder_id}, ensure_ascii=False) + '\n'
+            return
+
+        children = {}
+        for folder_id, name, parent_id, time in folder_rows(conn):
+            children.setdefault(parent_id, []).append((folder_id, name, time))
+        folder_ids = {folder[0] for folders in children.values() for folder in folders}
+
+        yield ('<!DOCTYPE NETSCAPE-Bookmark-file-1>\n'
+               '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+               '<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n')
+
+        def add_date(time):
+            timestamp = to_timestamp(time)
+            return f' ADD_DATE="{timestamp}"' if timestamp else ''
+
+        def folder(folder_id, depth):
+            # Subfolders first, then the bookmarks; top-level folders hang off None or a missing parent
+            indent = '    ' * depth
+            if folder_id is None:
+                subfolders = [child for parent, folders in children.items() if parent not in folder_ids
+                              for child in folders]
+                rows = fetch(conn, '''
+                    SELECT title, url, time FROM bookmark
+                    WHERE folder_id IS NULL OR folder_id NOT IN (SELECT id FROM folder)
+                    ORDER BY id
+                ''')
+            else:
+                subfolders = children.get(folder_id, [])
+                rows = fetch(conn, 'SELECT title, url, time FROM bookmark WHERE folder_id = ? ORDER BY id', (folder_id,))
+            for child_id, name, time in subfolders:
+                yield '%s<DT><H3%s>%s</H3>\n%s<DL><p>\n' % (indent, add_date(time), html.escape(name), indent)
+                yield from folder(child_id, depth + 1)
+                yield '%s</DL><p>\n' % indent
+            for title, url, time in rows:
+                yield '%s<DT><A HREF="%s"%s>%s</A>\n' % (indent, html.escape(url), add_date(time),
+                                                         html.escape(title or url))
+
+        yield from folder(None, 1)
+        yield '</DL><p>\n'
+
+
+def import_history(history_manager, lines, batch=BATCH, progress=None):
+    """
+    Add the visits of a JSON Lines history export, BATCH visits per transaction.
+
+    Visits are added to the existing history, so importing a file twice counts its visits twice.
+
+    :param history_manager: History to import into.
+    :param lines: Iterable of lines, str or UTF-8 bytes, e.g. an open file or a request stream.
+    :param batch: Visits per transaction.
+    :param progress: Called with the number of visits imported so far after each transaction.
+    :return: Dictionary with the number of imported and skipped lines.
+    :since: 1.0.0
+    """
+    history_manager.flush()
+    imported = skipped = 0
+    rows = []
+
+    def write():
+        with history_manager.storage.transaction() as cursor:
+            history_manager.write_visits(cursor, rows)
+        rows.clear()
+        if progress:
+            progress(imported)
+
+    for line in text_lines(lines):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+            url = checked(entry['url'])
+            title = checked(entry.get('title'))
+            time = to_timestamp(checked(entry.get('time'), (str, int, float)))
+        except (ValueError, TypeError, KeyError):
+            skipped += 1
+            continue
+        if not url or time is None:
+            skipped += 1
+            continue
+        rows.append((title, url, time, None))
+        imported += 1
+        if len(rows) >= batch:
+            write()
+    if rows:
+        write()
+    # Open pages and the address bar suggestions reload from the database
+    if imported:
+        history_manager.notify()
+    return {'imported': imported, 'skipped': skipped}
+
+
+class BookmarkImport:
+    """
+    Folders and bookmarks queued and inserted BATCH at a time, in the order they were read.
+
+    Entries refer to folders by keys of the source, a JSON Lines id or a counter for HTML; the keys
+    are mapped to the new folder ids as the folders are inserted. Unknown keys mean the top level.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, bookmark_manager, batch=BATCH, progress=None):
+        self.bookmark_manager = bookmark_manager
+        self.batch = batch
+        self.progress = progress
+        self.folder_ids = {}
+        self.pending = []
+        self.folders = 0
+        self.bookmarks = 0
+
+    def add_folder(self, key, name, parent_key=None, time=None):
+        self.pending.append(('folder', key, name or 'Folder', parent_key, time))
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def add_bookmark(self, title, url, folder_key=None, time=None):
+        self.pending.append(('bookmark', title or url, url, folder_key, time))
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        added = []
+        with self.bookmark_manager.storage.transaction() as cursor:
+            for kind, key_or_title, name_or_url, parent_key, time in self.pending:
+                if kind == 'folder':
+                    cursor.execute('INSERT INTO folder (name, time, parent_id) VALUES (?, ?, ?)',
+                                   (name_or_url, time, self.folder_ids.get(parent_key)))
+                    self.folder_ids[key_or_title] = cursor.lastrowid
+                    self.folders += 1
+                else:
+                    cursor.execute('INSERT INTO bookmark (title, url, time, folder_id) VALUES (?, ?, ?, ?)',
+                                   (key_or_title, name_or_url, time, self.folder_ids.get(parent_key)))
+                    added.append((cursor.lastrowid, name_or_url))
+        for bookmark_id, url in added:
+            self.bookmark_manager.index.add(bookmark_id, url)
+        self.bookmarks += len(added)
+        self.pending.clear()
+        if self.progress:
+            self.progress(self.folders + self.bookmarks)
+
+
+class NetscapeParser(HTMLParser):
+    """
+    Incremental reader of Netscape bookmark files, fed one chunk at a time.
+
+    Each ``<H3>`` starts a folder whose contents are the ``<DL>`` after it; ``<A HREF>`` is a
+    bookmark of the innermost open folder.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+        self.stack = [None]
+        self.opened = None
+        self.count = 0
+        self.tag = None
+        self.attrs = {}
+        self.text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('a', 'h3'):
+            self.tag, self.attrs, self.text = tag, dict(attrs), []
+            self.opened = None
+        elif tag == 'dl':
+            # The outermost list is the top level, every other one belongs to the folder just read
+            self.stack.append(self.opened if self.opened is not None else self.stack[-1])
+            self.opened = None
+
+    def handle_endtag(self, tag):
+        if tag == 'dl' and len(self.stack) > 1:
+            self.stack.pop()
+        if tag != self.tag:
+            return
+        self.tag = None
+        title = ''.join(self.text).strip()
+        time = self.attrs.get('add_date')
+        time = local_time(int(time)) if time and time.isdigit() else None
+        if tag == 'h3':
+            self.count += 1
+            self.target.add_folder(self.count, title, self.stack[-1], time)
+            self.opened = self.count
+        elif self.attrs.get('href'):
+            self.target.add_bookmark(title, self.attrs['href'], self.stack[-1], time)
+
+    def handle_data(self, data):
+        if self.tag:
+            self.text.append(data)
+
+
+def import_bookmarks(bookmark_manager, lines, format='jsonl', batch=BATCH, progress=None):
+    """
+    Add the folders and bookmarks of a JSON Lines export or a Netscape bookmark file.
+
+    Everything is added next to the existing bookmarks, the folder tree as it was in the file.
+
+    :param bookmark_manager: Bookmark to import into.
+    :param lines: Iterable of lines, str or UTF-8 bytes, e.g. an open file or a request stream.
+    :param format: 'jsonl' or 'html'.
+    :param batch: Folders and bookmarks per transaction.
+    :param progress: Called with the number of entries imported so far after each transaction.
+    :return: Dictionary with the number of imported folders and bookmarks, and of skipped lines.
+    :since: 1.0.0
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format: {format}")
+    target = BookmarkImport(bookmark_manager, batch, progress)
+    skipped = 0
+    if format == 'html':
+        parser = NetscapeParser(target)
+        for line in text_lines(lines):
+            parser.feed(line)
+        parser.close()
+    else:
+        for line in text_lines(lines):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                if entry['type'] == 'folder':
+                    target.add_folder(checked(entry['id'], (int, str)), checked(entry.get('name')),
+                                      checked(entry.get('parent_id'), (int, str)), checked(entry.get('time')))
+                elif entry['type'] == 'bookmark' and checked(entry['url']):
+                    target.add_bookmark(checked(entry.get('title')), entry['url'],
+                                        checked(entry.get('folder_id'), (int, str)), checked(entry.get('time')))
+                else:
+                    skipped += 1
+            except (ValueError, TypeError, KeyError):
+                skipped += 1
+    target.flush()
+    if target.folders or target.bookmarks:
+        bookmark_manager.notify()
+    return {'folders': target.folders, 'bookmarks': target.bookmarks, 'skipped': skipped}
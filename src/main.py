@@ -15,26 +15,56 @@ License URI: https://opensource.org/licenses/MIT
 
 import sys
 import os
-import threading
-import ctypes
-from datetime import datetime
-from urllib.parse import urlparse
 
-from PyQt6.QtCore import QUrl
-from PyQt6.QtGui import QAction, QIcon
-from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtWidgets import QApplication, QMainWindow, QPushButton, QLineEdit, QTabWidget, QMessageBox, QToolBar
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Imported before everything else so the startup timeline covers the imports
+from lib.startup import timeline
 
-import qdarktheme
+import argparse
+import ctypes
+import time
+from datetime import datetime
 
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from PyQt6.QtCore import QBuffer, QIODevice, QObject, Qt, QTimer, QUrl, pyqtSignal
+from PyQt6.QtGui import QAction, QIcon, QStandardItem, QStandardItemModel
+from PyQt6.QtWebEngineCore import QWebEnginePage
+from PyQt6.QtWebEngineWidgets import QWebEngineView
+from PyQt6.QtWidgets import QApplication, QCompleter, QMainWindow, QPushButton, QLineEdit, QTabWidget, QMessageBox, QToolBar
 
-from server.app import app as flask_app
 from lib.engine import JaalEngine
 from lib.setting import Setting
 from lib.bookmark import Bookmark
+from lib.favicon import Favicon
 from lib.history import History
+from lib.lifecycle import TabLifecycle
+from lib.omnibox import Omnibox
+from lib.performance import TIMING_SCRIPT, Performance
+from lib.profile import JaalProfile
+from lib.scheme import SCHEME, register_scheme, request_bodies_supported
+from lib.session import Session
+from lib.storage import Storage
+from lib.theme import ThemeCache
+
+
+class SettingSignal(QObject):
+    """
+    Re-emit setting changes as a Qt signal, so changes made on the server thread reach the GUI thread.
+
+    :since: 1.0.0
+    """
+
+    changed = pyqtSignal(str, object)
+
+
+class DataSignal(QObject):
+    """
+    Re-emit history and bookmark changes as a Qt signal, with the internal page that shows them.
+
+    :since: 1.0.0
+    """
+
+    changed = pyqtSignal(str)
 
 
 class Jaal(QMainWindow):
@@ -59,10 +89,17 @@ class Jaal(QMainWindow):
         self.setWindowTitle('Jaal Browser')
         self.setWindowIcon(QIcon('image/Jaal-Logo-Round.svg'))
         self.setting_manager = Setting()
-        self.bookmark_manager = Bookmark()
-        self.history_manager = History()
         self.dark_mode = self.setting_manager.get_setting('mode') == 'dark'
 
+        # Stylesheets are built once and cached on disk, so the theme is cheap enough for the first frame
+        self.theme = ThemeCache()
+        self.theme.apply(QApplication.instance(), 'dark' if self.dark_mode else 'light')
+
+        # React to settings changed anywhere, e.g. from jaal://setting, without polling the database
+        self.setting_signal = SettingSignal(self)
+        self.setting_signal.changed.connect(self.setting_changed)
+        self.setting_manager.subscribe(self.setting_signal.changed.emit)
+
         # Tab Widget
         self.tabs = QTabWidget()
         self.tabs.setTabsClosable(True)
@@ -70,6 +107,188 @@ class Jaal(QMainWindow):
         self.setCentralWidget(self.tabs)
         self.tabs.currentChanged.connect(self.update_url_input)
 
+        # Background tabs load on first activation and hibernate when left idle
+        self.lifecycle = TabLifecycle(self.tabs, self.setting_manager, parent=self)
+
+        # Open tabs are journaled as they change so the session survives a crash
+        self.session = Session()
+        self.tab_ids = {}
+        self.tab_activity = {}
+        self.saved_back = {}
+        self.restoring = set()
+        self.restore_started = None
+        self.load_started = {}
+        self.tabs.currentChanged.connect(self.journal_active_tab)
+
+        # Status Bar
+        self.status_bar = self.statusBar()
+        self.status_bar.showMessage('Welcome')
+
+        # Tool Bar
+        self.toolbar = QToolBar()
+        self.addToolBar(self.toolbar)
+
+        self.back_button = QAction(QIcon('image/back.svg'), 'Back', self)
+        self.back_button.triggered.connect(self.back)
+        self.back_button.setShortcut('Alt+Left')
+        self.toolbar.addAction(self.back_button)
+
+        self.forward_button = QAction(QIcon('image/forward.svg'), 'Forward', self)
+        self.forward_button.triggered.connect(self.forward)
+        self.toolbar.addAction(self.forward_button)
+
+        self.reload_button = QAction(QIcon('image/reload.svg'), 'Reload', self)
+        self.reload_button.triggered.connect(self.reload)
+        self.reload_button.setShortcut('Ctrl+R')
+        self.reload_button.setShortcut('F5')
+        self.toolbar.addAction(self.reload_button)
+
+        self.stop_button = QAction(QIcon('image/stop.svg'), 'Stop', self)
+        self.stop_button.triggered.connect(self.stop)
+        self.stop_button.setShortcut('Esc')
+        self.toolbar.addAction(self.stop_button)
+
+        self.home_button = QAction(QIcon('image/home.svg'), 'Home', self)
+        self.home_button.triggered.connect(self.go_home)
+        self.toolbar.addAction(self.home_button)
+
+        self.url_input = QLineEdit(self)
+        self.url_input.returnPressed.connect(self.load_url)
+        self.toolbar.addWidget(self.url_input)
+
+        # The omnibox ranks the suggestions itself, so the completer shows them unfiltered
+        self.suggestions = QStandardItemModel(self)
+        self.completer = QCompleter(self.suggestions, self)
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.completer.setCompletionRole(Qt.ItemDataRole.UserRole)
+        self.completer.setMaxVisibleItems(8)
+        self.completer.activated.connect(self.suggestion_activated)
+        self.url_input.setCompleter(self.completer)
+        self.url_input.textEdited.connect(self.suggest_urls)
+
+        self.toolbar.addSeparator()
+
+        # New Tab Button
+        self.new_tab_button = QAction(QIcon('image/new.svg'), 'New Tab', self)
+        self.new_tab_button.triggered.connect(self.create_tab)
+        self.new_tab_button.setShortcut('Ctrl+T')
+        self.toolbar.addAction(self.new_tab_button)
+
+        # Bookmark Widget
+        self.add_bookmark_action = QAction(QIcon('image/add-bookmark.svg'), 'Add Bookmark', self)
+        self.add_bookmark_action.triggered.connect(self.add_bookmark)
+        self.toolbar.addAction(self.add_bookmark_action)
+
+        self.remove_bookmark_action = QAction(QIcon('image/remove-bookmark.svg'), 'Remove Bookmark', self)
+        self.remove_bookmark_action.triggered.connect(self.remove_bookmark)
+        self.toolbar.addAction(self.remove_bookmark_action)
+
+        self.showMaximized()
+        timeline.mark('window shown')
+
+        # Everything the first frame does not need runs once the event loop has painted the window
+        QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """
+        Function to run the startup work that can wait until the window is on screen.
+
+        Pages start loading before the menus are built.
+
+        :return: None
+        :since: 1.0.0
+        """
+        timeline.mark('first paint')
+
+        self.open_databases()
+        timeline.mark('databases')
+
+        self.setup_profile()
+        timeline.mark('profile and pages')
+
+        # Start the browser with the tabs of the last session
+        if not self.restore_session():
+            self.create_tab()
+        timeline.mark('tabs')
+
+        # The timeline ends when the first page has loaded
+        if self.tabs.currentWidget() is not None:
+            self.tabs.currentWidget().loadFinished.connect(self.first_page_loaded)
+
+        self.build_menus()
+        timeline.mark('menus')
+
+        # Prepare the other mode too, so the first toggle is a single restyle as well
+        self.theme.warm()
+
+    def first_page_loaded(self):
+        self.sender().loadFinished.disconnect(self.first_page_loaded)
+        timeline.mark('first page loaded')
+        timeline.report()
+
+    def open_databases(self):
+        """
+        Function to open the history and bookmark databases and start indexing them for the address bar.
+
+        :return: None
+        :since: 1.0.0
+        """
+        self.favicon_manager = Favicon()
+        self.bookmark_manager = Bookmark(favicon_manager=self.favicon_manager)
+        self.history_manager = History(favicon_manager=self.favicon_manager)
+        self.performance_manager = Performance()
+
+        # Address bar suggestions, indexed in the background and rebuilt when history is deleted or imported
+        self.omnibox = Omnibox(self.history_manager, self.bookmark_manager)
+        self.omnibox.load()
+        self.history_manager.subscribe(self.omnibox.invalidate)
+        self.bookmark_manager.subscribe(self.omnibox.invalidate)
+
+        # Open history and bookmark pages reload after deletions and imports, which may come from the server thread
+        self.data_signal = DataSignal(self)
+        self.data_signal.changed.connect(self.reload_internal_page)
+        self.history_manager.subscribe(lambda: self.data_signal.changed.emit('history'))
+        self.bookmark_manager.subscribe(lambda: self.data_signal.changed.emit('bookmark'))
+
+    def setup_profile(self):
+        """
+        Function to create the browser profile with its internal pages and request interceptor.
+
+        :return: None
+        :since: 1.0.0
+        """
+        # One profile with a persistent HTTP cache for all tabs; owned by the application so it outlives the pages
+        self.profile = JaalProfile(self.setting_manager, parent=QApplication.instance())
+
+        # Serve internal pages in-process through jaal://, or from the Flask server in a separate thread
+        self.internal_pages = self.setting_manager.get_setting('internal_pages') or 'scheme'
+        if self.internal_pages != 'http' and not request_bodies_supported():
+            # Before Qt 6.7 the handler never sees POST bodies, so the internal pages could not save anything
+            print("Qt WebEngine is older than 6.7, serving internal pages over http")
+            self.internal_pages = 'http'
+        if self.internal_pages == 'http' and not self.start_flask_server():
+            # Fall back to the in-process handler when the server cannot listen, e.g. the port is taken
+            self.internal_pages = 'scheme'
+        if self.internal_pages != 'http':
+            from server.app import app as flask_app
+            from lib.scheme import JaalSchemeHandler
+            self.scheme_handler = JaalSchemeHandler(flask_app, self)
+            self.profile.installUrlSchemeHandler(SCHEME, self.scheme_handler)
+
+        # Ads and trackers are blocked once the filter lists are compiled in the background
+        from lib.interceptor import RequestInterceptor
+        self.interceptor = RequestInterceptor(self.setting_manager, parent=self)
+        self.interceptor.blocked.connect(self.request_blocked)
+        self.profile.setUrlRequestInterceptor(self.interceptor)
+        self.interceptor.load()
+
+    def build_menus(self):
+        """
+        Function to build the menu bar.
+
+        :return: None
+        :since: 1.0.0
+        """
         # Menu Bar
         self.menu_bar = self.menuBar()
         self.file_menu = self.menu_bar.addMenu('File')
@@ -102,20 +321,20 @@ class Jaal(QMainWindow):
         self.exit_action.setShortcut('Ctrl+Q')
         self.file_menu.addAction(self.exit_action)
 
-        self.mode_action = QAction('Dark Mode', self)
+        self.mode_action = QAction('Light Mode' if self.dark_mode else 'Dark Mode', self)
         self.mode_action.triggered.connect(self.mode)
         self.mode_action.setShortcut('Ctrl+M')
         self.file_menu.addAction(self.mode_action)
 
         # Edit Menu
-        self.add_bookmark_action = QAction('Add Bookmark', self)
-        self.add_bookmark_action.triggered.connect(self.add_bookmark)
-        self.add_bookmark_action.setShortcut('Ctrl+D')
-        self.edit_menu.addAction(self.add_bookmark_action)
+        self.add_bookmark_menu_action = QAction('Add Bookmark', self)
+        self.add_bookmark_menu_action.triggered.connect(self.add_bookmark)
+        self.add_bookmark_menu_action.setShortcut('Ctrl+D')
+        self.edit_menu.addAction(self.add_bookmark_menu_action)
 
-        self.remove_bookmark_action = QAction('Remove Bookmark', self)
-        self.remove_bookmark_action.triggered.connect(self.remove_bookmark)
-        self.edit_menu.addAction(self.remove_bookmark_action)
+        self.remove_bookmark_menu_action = QAction('Remove Bookmark', self)
+        self.remove_bookmark_menu_action.triggered.connect(self.remove_bookmark)
+        self.edit_menu.addAction(self.remove_bookmark_menu_action)
 
         # View Menu
         self.toggle_toolbar_action = QAction('Toggle Toolbar', self)
@@ -138,81 +357,26 @@ class Jaal(QMainWindow):
         self.stop_action.triggered.connect(self.stop)
         self.view_menu.addAction(self.stop_action)
 
-        self.stop_action = QAction('Stop', self)
-        self.stop_action.triggered.connect(self.stop)
-        self.view_menu.addAction(self.stop_action)
-
         # Help Menu
         self.about_action = QAction('About', self)
         self.about_action.triggered.connect(self.about)
         self.help_menu.addAction(self.about_action)
 
-        # Status Bar
-        self.status_bar = self.statusBar()
-        self.status_bar.showMessage('Welcome')
-
-        # Tool Bar
-        self.toolbar = QToolBar()
-        self.addToolBar(self.toolbar)
-
-        self.back_button = QAction(QIcon('image/back.svg'), 'Back', self)
-        self.back_button.triggered.connect(self.back)
-        self.back_button.setShortcut('Alt+Left')
-        self.toolbar.addAction(self.back_button)
-
-        self.forward_button = QAction(QIcon('image/forward.svg'), 'Forward', self)
-        self.forward_button.triggered.connect(self.forward)
-        self.toolbar.addAction(self.forward_button)
-
-        self.reload_button = QAction(QIcon('image/reload.svg'), 'Reload', self)
-        self.reload_button.triggered.connect(self.reload)
-        self.reload_button.setShortcut('Ctrl+R')
-        self.reload_button.setShortcut('F5')
-        self.toolbar.addAction(self.reload_button)
-
-        self.stop_button = QAction(QIcon('image/stop.svg'), 'Stop', self)
-        self.stop_button.triggered.connect(self.stop)
-        self.stop_button.setShortcut('Esc')
-        self.toolbar.addAction(self.stop_button)
-
-        self.home_button = QAction(QIcon('image/home.svg'), 'Home', self)
-        self.home_button.triggered.connect(self.go_home)
-        self.toolbar.addAction(self.home_button)
-
-        self.url_input = QLineEdit(self)
-        self.url_input.returnPressed.connect(self.load_url)
-        self.toolbar.addWidget(self.url_input)
-
-        self.toolbar.addSeparator()
-
-        # New Tab Button
-        self.new_tab_button = QAction(QIcon('image/new.svg'), 'New Tab', self)
-        self.new_tab_button.triggered.connect(self.create_tab)
-        self.new_tab_button.setShortcut('Ctrl+T')
-        self.toolbar.addAction(self.new_tab_button)
-
-        # Bookmark Widget
-        self.add_bookmark_action = QAction(QIcon('image/add-bookmark.svg'), 'Add Bookmark', self)
-        self.add_bookmark_action.triggered.connect(self.add_bookmark)
-        self.toolbar.addAction(self.add_bookmark_action)
-
-        self.remove_bookmark_action = QAction(QIcon('image/remove-bookmark.svg'), 'Remove Bookmark', self)
-        self.remove_bookmark_action.triggered.connect(self.remove_bookmark)
-        self.toolbar.addAction(self.remove_bookmark_action)
-
-        # Start the Flask server in a separate thread
-        self.start_flask_server()
-
-        # Start the browser
-        self.create_tab()
-        self.apply_mode()
-        self.showMaximized()
+    def create_tab(self, url='jaal://home', background=False, title=None, tab_id=None):
+        """
+        Function to open a URL in a new tab.
 
-    def create_tab(self, url='jaal://home'):
-        self.tab = QWebEngineView()
-        page = JaalEngine(self.tab)
+        :param url: URL to open.
+        :param background: Keep the current tab and only load the URL when the new tab is first shown.
+        :param title: Tab text until the page sets its own title.
+        :param tab_id: Session id of a restored tab, a new one is assigned when None.
+        :return: QWebEngineView of the new tab.
+        :since: 1.0.0
+        """
+        tab = QWebEngineView()
+        page = JaalEngine(self.profile, tab)
         page.createWindow = self.handle_create_new_tab
-        self.tab.setPage(page)
+        tab.setPage(page)
 
         if not isinstance(url, str):
             url = 'jaal://home'
@@ -220,12 +384,20 @@ class Jaal(QMainWindow):
         if url.startswith('jaal://'):
             url = self.handle_jaal_url(url)
 
-        self.tab.load(QUrl(url))
-        self.tab.titleChanged.connect(lambda title: self.tabs.setTabText(self.tabs.indexOf(self.tab), title))
-        self.tab.loadStarted.connect(self.tab_load_started)
-        self.tab.loadFinished.connect(self.tab_load_finished)
-        self.tabs.addTab(self.tab, 'New Tab')
-        self.tabs.setCurrentWidget(self.tab)
+        tab.titleChanged.connect(lambda title: self.tabs.setTabText(self.tabs.indexOf(tab), title))
+        tab.loadStarted.connect(self.tab_load_started)
+        tab.loadFinished.connect(self.tab_load_finished)
+        self.journal_new_tab(tab, url, title, tab_id)
+
+        if background:
+            self.lifecycle.defer(tab, url)
+            self.tabs.addTab(tab, title or url)
+        else:
+            self.lifecycle.track(tab)
+            tab.load(QUrl(url))
+            self.tabs.addTab(tab, title or 'New Tab')
+            self.tabs.setCurrentWidget(tab)
+        return tab
 
     def update_url_input(self, index):
         """
@@ -237,33 +409,181 @@ class Jaal(QMainWindow):
         """
         current_tab = self.tabs.widget(index)
         if current_tab:
+            self.tab = current_tab
             url = current_tab.url().toString()
             if url.startswith('http://localhost:5000/'):
                 url = url.replace('http://localhost:5000/', 'jaal://')
             self.url_input.setText(url)
 
-    def handle_create_new_tab(self, _):
+    def handle_create_new_tab(self, window_type):
         new_tab = QWebEngineView()
-        new_tab.setPage(JaalEngine(new_tab))
-
-        # Create a new tab for the request
-        self.tabs.addTab(new_tab, 'New Tab')
-        self.tabs.setCurrentWidget(new_tab)
-
-        # Update the Address Bar
-        url = new_tab.url().toString()
-        if url.startswith('http://localhost:5000/'):
-            url = url.replace('http://localhost:5000/', 'jaal://')
-        self.url_input.setText(url)
+        new_tab.setPage(JaalEngine(self.profile, new_tab))
+        self.lifecycle.track(new_tab)
 
         new_tab.titleChanged.connect(lambda title: self.tabs.setTabText(self.tabs.indexOf(new_tab), title))
         new_tab.loadStarted.connect(self.tab_load_started)
         new_tab.loadFinished.connect(self.tab_load_finished)
+        self.journal_new_tab(new_tab)
+
+        # Create a new tab for the request; middle-clicked links stay in the background
+        self.tabs.addTab(new_tab, 'New Tab')
+        if window_type != QWebEnginePage.WebWindowType.WebBrowserBackgroundTab:
+            self.tabs.setCurrentWidget(new_tab)
+
+            # Update the Address Bar
+            url = new_tab.url().toString()
+            if url.startswith('http://localhost:5000/'):
+                url = url.replace('http://localhost:5000/', 'jaal://')
+            self.url_input.setText(url)
 
         return new_tab.page()
 
-    @staticmethod
-    def handle_jaal_url(url):
+    def journal_new_tab(self, tab, url=None, title=None, tab_id=None):
+        """
+        Function to add a tab to the session journal and keep its entry current.
+
+        :param tab: QWebEngineView of the tab.
+        :param url: URL the tab opens with.
+        :param title: Title the tab opens with.
+        :param tab_id: Session id of a restored tab, a new one is assigned when None.
+        :return: None
+        :since: 1.0.0
+        """
+        if tab_id is None:
+            tab_id = self.session.new_tab_id()
+            self.session.save_tab(tab_id, url, title, last_active=int(time.time()))
+        self.tab_ids[tab] = tab_id
+        tab.urlChanged.connect(lambda _: self.journal_tab(tab))
+        tab.titleChanged.connect(lambda _: self.journal_tab(tab))
+
+    def journal_tab(self, tab):
+        """
+        Function to record the URL, title and navigation history of a tab in the session journal.
+
+        :param tab: QWebEngineView of the tab.
+        :return: None
+        :since: 1.0.0
+        """
+        tab_id = self.tab_ids.get(tab)
+        if tab_id is None or self.lifecycle.is_pending(tab) or tab.url().isEmpty():
+            return
+        history = tab.history()
+        back = self.saved_back.get(tab, [])
+        entries = back + [[item.url().toString(), item.title()] for item in history.items()]
+        self.session.save_tab(tab_id, tab.url().toString(), tab.title(), entries,
+                              len(back) + history.currentItemIndex(), self.tab_activity.get(tab))
+
+    def journal_active_tab(self, index):
+        """
+        Function to record which tab is active and when it was last shown.
+
+        :param index: Index of the current tab.
+        :return: None
+        :since: 1.0.0
+        """
+        tab = self.tabs.widget(index)
+        if tab not in self.tab_ids:
+            return
+        self.tab_activity[tab] = int(time.time())
+        self.session.activate_tab(self.tab_ids[tab])
+        self.journal_tab(tab)
+
+    def restore_session(self):
+        """
+        Function to reopen the tabs of the last session.
+
+        Every tab gets a placeholder right away, only the active one is loaded. The most recently used
+        other tabs are then loaded one after another, the rest wait until they are shown.
+
+        :return: True if a session was restored.
+        :since: 1.0.0
+        """
+        start = time.perf_counter()
+        saved_tabs, active_id = self.session.load()
+        if not saved_tabs:
+            return False
+
+        # Placeholders only; the first added tab would otherwise become current and load
+        self.tabs.blockSignals(True)
+        tabs = {}
+        for saved in saved_tabs:
+            tab = self.create_tab(saved['url'] or 'jaal://home', background=True, title=saved['title'],
+                                  tab_id=saved['id'])
+            self.saved_back[tab] = saved['entries'][max(0, saved['entry_index'] - 50):saved['entry_index']]
+            self.tab_activity[tab] = saved['last_active']
+            self.restoring.add(tab)
+            tabs[saved['id']] = tab
+        self.tabs.blockSignals(False)
+        placeholders = (time.perf_counter() - start) * 1000
+
+        active = tabs.get(active_id) or tabs[saved_tabs[-1]['id']]
+        self.restore_started = time.time()
+        active.loadFinished.connect(lambda ok: self.measure_first_paint(active, len(saved_tabs), placeholders))
+        if self.tabs.currentWidget() is active:
+            self.tabs.currentChanged.emit(self.tabs.currentIndex())
+        else:
+            self.tabs.setCurrentWidget(active)
+
+        recent = sorted((tab for tab in tabs.values() if tab is not active),
+                        key=lambda tab: self.tab_activity.get(tab) or 0, reverse=True)
+        self.lifecycle.preload(recent[:self.setting_manager.get_setting('session_preload_tabs')], after=active)
+        return True
+
+    def measure_first_paint(self, tab, count, placeholders):
+        """
+        Function to report how long the restored session took to paint its active tab.
+
+        :param tab: QWebEngineView of the active tab.
+        :param count: Number of restored tabs.
+        :param placeholders: Milliseconds spent creating the placeholder tabs.
+        :return: None
+        :since: 1.0.0
+        """
+        if self.restore_started is None:
+            return
+        started, self.restore_started = self.restore_started, None
+
+        def report(painted):
+            # Paint timing is relative to the page's time origin; fall back to the end of the load
+            finished = painted / 1000 if painted else time.time()
+            message = 'Session restored: %d tabs, placeholders in %.0f ms, first paint after %.0f ms' % (
+                count, placeholders, (finished - started) * 1000)
+            # Printed only with --profile-startup, next to the startup timeline
+            if timeline.enabled:
+                print(message)
+            self.status_bar.showMessage(message, 5000)
+
+        tab.page().runJavaScript('''
+            (() => {
+                const paint = performance.getEntriesByName('first-contentful-paint')[0]
+                    || performance.getEntriesByName('first-paint')[0];
+                return paint ? performance.timeOrigin + paint.startTime : null;
+            })()
+        ''', report)
+
+    def record_timing(self, tab, url, qt_load):
+        """
+        Function to store the timing of a finished page load with the page's own Navigation and Paint Timing.
+
+        :param tab: QWebEngineView of the loaded page.
+        :param url: URL of the page.
+        :param qt_load: Milliseconds between the loadStarted and loadFinished signals.
+        :return: None
+        :since: 1.0.0
+        """
+        tab.page().runJavaScript(TIMING_SCRIPT, lambda timing: self.performance_manager.add_navigation(url, qt_load, timing))
+
+    def handle_jaal_url(self, url):
+        """
+        Function to map a jaal:// URL to the address that serves it.
+
+        :param url: jaal:// URL.
+        :return: The URL itself when the scheme handler is installed, else the Flask server URL.
+        :since: 1.0.0
+        """
+        if self.internal_pages != 'http':
+            return url
+
         if url == 'jaal://home':
             return 'http://localhost:5000/'
         elif url == 'jaal://about':
@@ -286,6 +606,8 @@ class Jaal(QMainWindow):
             return 'http://localhost:5000/remove_history'
         elif url == 'jaal://setting':
             return 'http://localhost:5000/setting'
+        elif url == 'jaal://performance':
+            return 'http://localhost:5000/performance'
         else:
             return 'http://localhost:5000/'
 
@@ -299,36 +621,53 @@ class Jaal(QMainWindow):
         :return: None
         :since: 1.0.0
         """
+        tab = self.sender() if isinstance(self.sender(), QWebEngineView) else self.tab
+        self.load_started[tab] = time.monotonic()
+
         self.status_bar.showMessage('Loading ...')
         self.reload_button.setVisible(False)
         self.stop_button.setVisible(True)
 
-    def tab_load_finished(self):
+    def tab_load_finished(self, ok=True):
         """
         Function to show a message in the status bar when a tab is loaded.
 
+        :param ok: Whether the page loaded successfully.
         :return: None
         :since: 1.0.0
         """
-        self.status_bar.showMessage('Page is Ready')
-        self.reload_button.setVisible(True)
-        self.stop_button.setVisible(False)
+        tab = self.sender() if isinstance(self.sender(), QWebEngineView) else self.tab
+        url = tab.url().toString()
 
         # Add favicon to the tab
-        url = self.tab.url().toString()
-        domain = urlparse(url).netloc
-        self.tabs.setTabIcon(self.tabs.indexOf(self.tab), self.tab.icon())
+        self.tabs.setTabIcon(self.tabs.indexOf(tab), tab.icon())
+
+        # Add the Current URL to the History; reopening a tab of the last session is not a new visit
+        if tab in self.restoring:
+            self.restoring.discard(tab)
+        elif not url.startswith('jaal://') and not url.startswith('http://localhost:5000/'):
+            favicon = self.icon_data(tab.icon())
+            self.add_history_entry(tab.title(), url, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), favicon)
+
+        # Time web page loads for jaal://performance
+        started = self.load_started.pop(tab, None)
+        if ok and started is not None and not url.startswith(('jaal://', 'http://localhost:5000/')):
+            self.record_timing(tab, url, (time.monotonic() - started) * 1000)
+
+        # Background tabs finish loading too; only the current one drives the toolbar
+        if tab is not self.tabs.currentWidget():
+            return
+
+        blocked = self.interceptor.blocked_count(url)
+        self.status_bar.showMessage('Page is Ready, %d requests blocked' % blocked if blocked else 'Page is Ready')
+        self.reload_button.setVisible(True)
+        self.stop_button.setVisible(False)
 
         # Update the Address Bar
         if url.startswith('http://localhost:5000/'):
             url = url.replace('http://localhost:5000/', 'jaal://')
         self.url_input.setText(url)
 
-        # Add the Current URL to the History
-        if not url.startswith('jaal://') and not url.startswith('http://localhost:5000/'):
-            icon_path = self.tab.icon().pixmap(16, 16).toImage().save(domain + '.ico', 'ICO')
-            self.add_history_entry(self.tab.title(), url, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), icon_path)
-
         # Update bookmark actions based on whether the URL is bookmarked
         if self.bookmark_manager.is_bookmarked(url):
             self.add_bookmark_action.setVisible(False)
@@ -337,6 +676,35 @@ class Jaal(QMainWindow):
             self.add_bookmark_action.setVisible(True)
             self.remove_bookmark_action.setVisible(False)
 
+    def request_blocked(self, page_url, count):
+        """
+        Function to show the number of blocked requests of the current page in the status bar.
+
+        :param page_url: First-party URL of the blocked request.
+        :param count: Requests blocked on that page so far.
+        :return: None
+        :since: 1.0.0
+        """
+        tab = self.tabs.currentWidget()
+        if tab is not None and tab.url().toString() == page_url:
+            self.status_bar.showMessage('%d requests blocked' % count, 3000)
+
+    @staticmethod
+    def icon_data(icon):
+        """
+        Function to encode a page icon as PNG bytes for the favicon store.
+
+        :param icon: QIcon of the page.
+        :return: bytes or None if the page has no icon.
+        :since: 1.0.0
+        """
+        if icon.isNull():
+            return None
+        buffer = QBuffer()
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        icon.pixmap(16, 16).toImage().save(buffer, 'PNG')
+        return bytes(buffer.data())
+
     def add_bookmark(self):
         """
         Function to add a bookmark.
@@ -349,7 +717,8 @@ class Jaal(QMainWindow):
             title = self.tab.title()
 
             if not self.bookmark_manager.is_bookmarked(url):
-                self.bookmark_manager.add_bookmark(title, url, favicon=self.tab.icon().pixmap(16, 16).toImage().save(url + '.ico', 'ICO'))
+                self.bookmark_manager.add_bookmark(title, url, favicon=self.icon_data(self.tab.icon()))
+                self.omnibox.record_bookmark(url, title)
                 QMessageBox.information(self, 'Add Bookmark', 'Bookmark added successfully.')
                 self.add_bookmark_action.setVisible(False)
                 self.remove_bookmark_action.setVisible(True)
@@ -365,9 +734,8 @@ class Jaal(QMainWindow):
         """
         if self.tab:
             url = self.tab.url().toString()
-            self.bookmark_manager.remove_bookmark(url)
 
-            if self.bookmark_manager.is_bookmarked(url):
+            if self.bookmark_manager.remove_bookmark_url(url):
                 QMessageBox.information(self, 'Remove Bookmark', 'Bookmark removed successfully.')
                 self.add_bookmark_action.setVisible(True)
                 self.remove_bookmark_action.setVisible(False)
@@ -388,6 +756,7 @@ class Jaal(QMainWindow):
         :return: None
         """
         self.history_manager.add_history_entry(title, url, time, favicon)
+        self.omnibox.record_visit(url, title)
 
     def remove_history_entry(self, history_id):
         """
@@ -415,8 +784,20 @@ class Jaal(QMainWindow):
         :return: None
         :since: 1.0.0
         """
+        tab = self.tabs.widget(index)
         self.tabs.removeTab(index)
 
+        # removeTab() only hides the view, delete it to free its renderer
+        if tab is not None:
+            self.lifecycle.forget(tab)
+            self.interceptor.forget(tab.url().toString())
+            if tab in self.tab_ids:
+                self.session.remove_tab(self.tab_ids.pop(tab))
+            for state in (self.tab_activity, self.saved_back, self.load_started):
+                state.pop(tab, None)
+            self.restoring.discard(tab)
+            tab.deleteLater()
+
         # Close the browser if there are no tabs left
         if self.tabs.count() == 0:
             self.exit_browser()
@@ -430,6 +811,35 @@ class Jaal(QMainWindow):
         """
         self.tab.setUrl(QUrl('https://www.stechbd.net'))
 
+    def suggest_urls(self, text):
+        """
+        Function to fill the address bar suggestions for the typed text.
+
+        :param text: Text in the address bar.
+        :return: None
+        :since: 1.0.0
+        """
+        self.suggestions.clear()
+        for url, title, bookmarked in self.omnibox.suggest(text):
+            item = QStandardItem(('\u2605 ' if bookmarked else '') + (title + ' \u2014 ' + url if title else url))
+            item.setData(url, Qt.ItemDataRole.UserRole)
+            self.suggestions.appendRow(item)
+        if self.suggestions.rowCount():
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+
+    def suggestion_activated(self, url):
+        """
+        Function to open the suggestion picked in the address bar.
+
+        :param url: URL of the suggestion.
+        :return: None
+        :since: 1.0.0
+        """
+        self.url_input.setText(url)
+        self.load_url()
+
     def load_url(self):
         """
         Function to load the URL in the address bar.
@@ -455,6 +865,12 @@ class Jaal(QMainWindow):
         :return: None
         :since: 1.0.0
         """
+        # A restored tab continues into the history it had in the last session
+        if not self.tab.history().canGoBack() and self.saved_back.get(self.tab):
+            url = self.saved_back[self.tab].pop()[0]
+            self.tab.history().clear()
+            self.tab.setUrl(QUrl(url))
+            return
         self.tab.back()
 
     def forward(self):
@@ -510,6 +926,7 @@ class Jaal(QMainWindow):
         :return: None
         :since: 1.0.0
         """
+        Storage.close_all()
         QApplication.quit()
 
     def mode(self):
@@ -522,150 +939,81 @@ class Jaal(QMainWindow):
         self.dark_mode = not self.dark_mode
         self.apply_mode()
 
-    def apply_mode(self):
+    def reload_internal_page(self, page):
         """
-        Apply the current mode (dark or light).
-        """
-        if self.dark_mode:
-            # Apply base dark theme
-            QApplication.instance().setStyleSheet(qdarktheme.load_stylesheet('dark'))
-            
-            # Apply custom futuristic theme
-            self.load_custom_theme()
-            
-            self.mode_action.setText('Light Mode')
-            self.setting_manager.update_setting('mode', 'dark')
-        else:
-            QApplication.instance().setStyleSheet(qdarktheme.load_stylesheet('light'))
-            self.mode_action.setText('Dark Mode')
-            self.setting_manager.update_setting('mode', 'light')
-
-    def load_custom_theme(self):
-        """
-        Load and apply the custom futuristic QSS theme.
-        """
-        qss = """
-        /* Main Window */
-        QMainWindow {
-            background-color: #000000;
-        }
-
-        /* ToolBar */
-        QToolBar {
-            background-color: #0a0a0a;
-            border-bottom: 1px solid #333333;
-            spacing: 10px;
-            padding: 5px;
-        }
-        
-        QToolButton {
-            background-color: transparent;
-            border: 1px solid transparent;
-            border-radius: 4px;
-            color: #ffffff;
-            padding: 4px;
-        }
-        
-        QToolButton:hover {
-            background-color: rgba(57, 255, 20, 0.1); /* Green tint */
-            border: 1px solid rgba(57, 255, 20, 0.3);
-        }
-
-        /* Address Bar */
-        QLineEdit {
-            background-color: rgba(255, 255, 255, 0.08);
-            border: 1px solid #333333;
-            border-radius: 8px;
-            color: #ffffff;
-            padding: 6px 12px;
-            font-size: 14px;
-            selection-background-color: #A855F7; /* Purple */
-        }
-        
-        QLineEdit:focus {
-            border: 1px solid #39FF14; /* Green */
-            background-color: rgba(255, 255, 255, 0.12);
-        }
-
-        /* Tab Widget */
-        QTabWidget::pane {
-            border: 1px solid #333333;
-            background-color: #000000;
-        }
-        
-        QTabBar::tab {
-            background-color: #111111;
-            color: #888888;
-            border: 1px solid #222222;
-            border-bottom: none;
-            border-top-left-radius: 6px;
-            border-top-right-radius: 6px;
-            padding: 8px 16px;
-            margin-right: 2px;
-            min-width: 120px;
-        }
-        
-        QTabBar::tab:selected {
-            background-color: #000000;
-            color: #39FF14; /* Green text */
-            border-top: 2px solid #39FF14; /* Green top border */
-            border-bottom: 1px solid #000000; /* Seamless blend */
-        }
-        
-        QTabBar::tab:hover:!selected {
-            background-color: #1a1a1a;
-            color: #ffffff;
-        }
-        
-        /* Status Bar */
-        QStatusBar {
-            background-color: #0a0a0a;
-            color: #888888;
-            border-top: 1px solid #222222;
-        }
-
-        /* Menu Bar */
-        QMenuBar {
-            background-color: #0a0a0a;
-            color: #ffffff;
-        }
-        
-        QMenuBar::item:selected {
-            background-color: rgba(57, 255, 20, 0.1);
-            color: #39FF14;
-        }
-        
-        QMenu {
-            background-color: #111111;
-            border: 1px solid #333333;
-            color: #ffffff;
-        }
-        
-        QMenu::item:selected {
-            background-color: rgba(168, 85, 247, 0.2); /* Purple tint */
-            color: #ffffff;
-        }
-        """
-        
-        # Append to existing stylesheet
-        current_style = QApplication.instance().styleSheet()
-        QApplication.instance().setStyleSheet(current_style + qss)
+        Function to reload the open tabs showing an internal page.
 
-    @staticmethod
-    def start_flask_server():
+        :param page: Name of the page, e.g. history for jaal://history.
+        :return: None
+        :since: 1.0.0
+        """
+        for index in range(self.tabs.count()):
+            tab = self.tabs.widget(index)
+            if not isinstance(tab, QWebEngineView):
+                continue
+            url = tab.url()
+            if (url.scheme() == SCHEME.decode() and url.host() == page) or \
+                    url.toString().rstrip('/') == 'http://localhost:5000/' + page:
+                tab.reload()
+
+    def setting_changed(self, name, value):
+        """
+        Function to apply a setting that changed while the browser is running.
+
+        :param name: Name of the setting.
+        :param value: New value of the setting.
+        :return: None
+        :since: 1.0.0
+        """
+        if name == 'mode' and (value == 'dark') != self.dark_mode:
+            self.dark_mode = value == 'dark'
+            self.apply_mode()
+        elif name == 'block_requests':
+            self.interceptor.set_enabled(value)
+        elif name == 'blocklists':
+            self.interceptor.load()
+        elif name in ('cache_type', 'cache_size_mb', 'cache_dir', 'persistent_cookies', 'user_agent'):
+            self.profile.apply()
+
+    def apply_mode(self):
         """
-        Function to start the Flask server in a separate thread.
+        Function to apply the current mode (dark or light) and remember it.
 
         :return: None
         :since: 1.0.0
         """
-        flask_thread = threading.Thread(target=flask_app.run)
-        flask_thread.daemon = True
-        flask_thread.start()
+        mode = 'dark' if self.dark_mode else 'light'
+        self.theme.apply(QApplication.instance(), mode)
+        self.mode_action.setText('Light Mode' if self.dark_mode else 'Dark Mode')
+        self.setting_manager.update_setting('mode', mode)
+
+    def start_flask_server(self):
+        """
+        Function to start the Flask server in a separate thread and wait until it listens.
+
+        :return: True if the server is ready to accept connections.
+        :since: 1.0.0
+        """
+        from server.app import app as flask_app
+        from server.runner import ServerThread
+
+        engine = self.setting_manager.get_setting('server_engine') or 'threaded'
+        self.server_thread = ServerThread(flask_app, port=5000, engine=engine)
+        self.server_thread.start()
+        return self.server_thread.wait_ready()
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description='Jaal Browser')
+    parser.add_argument('--profile-startup', action='store_true', help='Print how long each startup phase takes')
+    args, qt_args = parser.parse_known_args()
+    timeline.enabled = args.profile_startup
+    timeline.mark('imports')
+
+    # Custom schemes must be known to Qt WebEngine before the application starts
+    register_scheme()
+    app = QApplication(sys.argv[:1] + qt_args)
+    timeline.mark('application')
 
     # Set the app user model ID for Windows
     if os.name == 'nt':  # Check if the OS is Windows
@@ -673,6 +1021,9 @@ if __name__ == '__main__':
         ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
 
     app.setWindowIcon(QIcon('image/Jaal-Logo-Round.ico'))
+
+    # Flush buffered history and close database connections however the window is closed
+    app.aboutToQuit.connect(Storage.close_all)
     Jaal()
 
     sys.exit(app.exec())
@@ -3,19 +3,56 @@ import os
 import sys
 from datetime import datetime
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, make_response, send_file
 
-# Add the project root to the Python path to handle imports correctly
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+# Add the source root to the Python path so the browser and the server share the same lib modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.lib.bookmark import Bookmark
-from src.lib.history import History
+from lib.bookmark import Bookmark
+from lib.dashboard import DEFAULT_WAIT, WIDGETS, Dashboard
+from lib.favicon import Favicon, favicon_mime
+from lib.history import History
+from lib.image import ImageVariants
+from lib.performance import Performance
+from lib.setting import Setting
+from lib.transfer import FORMATS, MIMETYPES, export_bookmarks, export_history, import_bookmarks, import_history
+
+
+# The browser's data directory, unless JAAL_DATA_DIR points elsewhere, e.g. at a benchmark dataset
+data_dir = os.environ.get('JAAL_DATA_DIR')
+
+
+def data_path(name):
+    return os.path.join(data_dir, name) if data_dir else None
 
 
 app = Flask(__name__)
-bookmark_manager = Bookmark()
-history_manager = History()
+favicon_manager = Favicon(data_path('favicon.db'))
+bookmark_manager = Bookmark(data_path('bookmark.db'), favicon_manager=favicon_manager)
+history_manager = History(data_path('history.db'), favicon_manager=favicon_manager)
+setting_manager = Setting(data_path('bookmark.db'))
+dashboard = Dashboard(setting_manager)
+performance_manager = Performance(data_path('performance.db'))
 app.static_folder = os.path.join(os.path.dirname(__file__), 'static')
+images = ImageVariants(os.path.join(app.static_folder, 'img'), data_path('image'))
+
+
+def decode_favicon(favicon):
+    # Favicons are posted base64-encoded
+    if not isinstance(favicon, str) or not favicon:
+        return None
+    try:
+        return base64.b64decode(favicon)
+    except (TypeError, ValueError) as e:
+        print(f"Invalid favicon data: {e}")
+        return None
+
+
+def end_of_day(end_time):
+    # A bare date as upper bound includes the whole day
+    if isinstance(end_time, str) and len(end_time) == 10:
+        return end_time + ' 23:59:59'
+    return end_time
 
 
 @app.route('/')
@@ -35,9 +72,42 @@ def img_dir():
 
 @app.route('/img/<string:file>')
 def img(file):
+    # ?w= picks the WebP variant for that display width; without it, or without WebP support, the original
+    width = request.args.get('w', type=int)
+    if width and request.accept_mimetypes.best_match(('image/webp', 'image/jpeg')) == 'image/webp':
+        found = images.variant(file, width)
+        if found is not None:
+            digest, width, path = found
+            # Revalidated on every use, so a changed source is picked up; unchanged ones cost a 304
+            response = send_file(path, mimetype='image/webp', etag=f'{digest}-{width}', max_age=0)
+            return response.make_conditional(request)
     return app.send_static_file('img/' + file)
 
 
+@app.route('/img/<string:digest>/<int:width>.webp')
+def img_variant(digest, width):
+    path = images.find(digest, width)
+    if path is None:
+        return 'Image not found', 404
+
+    # Variants are addressed by the hash of their source, so a URL never changes what it serves
+    response = send_file(path, mimetype='image/webp', etag=f'{digest}-{width}', max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+
+@app.route('/get_backgrounds', methods=['GET'])
+def get_backgrounds():
+    # Pages put the srcset on an <img sizes="100vw"> and the engine picks the variant for the viewport
+    names = sorted(name for name in os.listdir(images.source_dir) if name.startswith('background-'))
+    images.warm(names)
+    return jsonify([{
+        'src': 'img/' + name,
+        'srcset': ', '.join(f'{url} {width}w' for url, width in images.srcset(name)),
+    } for name in names])
+
+
 @app.route('/js')
 def js_dir():
     return 'JS not found'
@@ -58,6 +128,30 @@ def css(file):
     return app.send_static_file('css/' + file)
 
 
+@app.route('/favicon/<string:digest>')
+def favicon(digest):
+    data = favicon_manager.get_favicon(digest)
+    if data is None:
+        return 'Favicon not found', 404
+
+    # Icons are addressed by their content hash, so a URL never changes what it serves
+    response = make_response(data)
+    response.headers['Content-Type'] = favicon_mime(data)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.set_etag(digest)
+    return response.make_conditional(request)
+
+
+@app.route('/dashboard', methods=['GET'])
+def get_dashboard():
+    # Every home tab polls this; each widget is fetched upstream at most once per dashboard_ttl
+    widgets = request.args.get('widgets')
+    wait = min(request.args.get('wait', DEFAULT_WAIT, type=float), 10)
+    response = jsonify(dashboard.get(widgets.split(',') if widgets else WIDGETS, wait))
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 @app.route('/about', methods=['GET'])
 def about():
     return 'Jaal is a web browser developed by S Technologies.<br/>Version: 1.0.0'
@@ -80,7 +174,7 @@ def add_folder():
     data = request.get_json()
     name = data['name']
     parent_id = data['parent_id']
-    bookmark_manager.add_folder(name, parent_id)
+    bookmark_manager.add_folder(name, parent_id=parent_id)
     return jsonify({'message': 'Folder added successfully'})
 
 
@@ -92,6 +186,16 @@ def remove_folder():
     return jsonify({'message': 'Folder removed successfully'})
 
 
+@app.route('/get_tree', methods=['GET'])
+def get_tree():
+    # The whole folder tree, or the subtree under folder_id, with bookmarks nested in their folders
+    folder_id = request.args.get('folder_id', type=int)
+    tree = bookmark_manager.get_tree(folder_id)
+    if tree is None:
+        return jsonify({'message': 'Folder not found'}), 404
+    return jsonify(tree)
+
+
 @app.route('/get_bookmark', methods=['GET'])
 def get_bookmarks():
     folder_id = request.args.get('folder_id')
@@ -107,8 +211,8 @@ def add_bookmark():
     title = data['title']
     url = data['url']
     folder_id = data['folder_id']
-    favicon = data['favicon']
-    bookmark_manager.add_bookmark(title, url, folder_id, favicon)
+    favicon = decode_favicon(data.get('favicon'))
+    bookmark_manager.add_bookmark(title, url, favicon=favicon, folder_id=folder_id)
     return jsonify({'message': 'Bookmark added successfully'})
 
 
@@ -120,6 +224,24 @@ def remove_bookmark():
     return jsonify({'message': 'Bookmark removed successfully'})
 
 
+@app.route('/get_setting', methods=['GET'])
+def get_setting():
+    # Served from the in-memory settings cache
+    name = request.args.get('name')
+    if name:
+        return jsonify({name: setting_manager.get_setting(name)})
+    return jsonify(dict(setting_manager.get_all_setting()))
+
+
+@app.route('/update_setting', methods=['POST'])
+def update_setting():
+    # The browser window is subscribed and applies the change immediately
+    data = request.get_json()
+    for name, value in data.items():
+        setting_manager.update_setting(name, value)
+    return jsonify({'message': 'Setting updated successfully'})
+
+
 @app.route('/history')
 def history():
     return app.send_static_file('history.html')
@@ -127,7 +249,14 @@ def history():
 
 @app.route('/get_history')
 def get_history():
-    history_entries = history_manager.get_history()
+    # Keyset pagination: pass the smallest id of the previous page as before_id
+    before_id = request.args.get('before_id', type=int)
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+    start_time = request.args.get('from') or None
+    end_time = end_of_day(request.args.get('to') or None)
+    query = request.args.get('q', '').strip() or None
+
+    history_entries = history_manager.get_history(before_id, limit, start_time, end_time, query)
     history_list = []
     for entry in history_entries:
         history_list.append({
@@ -135,11 +264,27 @@ def get_history():
             'title': entry[1],
             'url': entry[2],
             'time': entry[3],
-            'favicon': base64.b64encode(entry[4]).decode('utf-8') if entry[4] else None
+            'favicon': entry[4]
         })
     return jsonify(history_list)
 
 
+@app.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('type', 'all')
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    result = {}
+    if kind in ('all', 'history'):
+        result['history'] = [{'id': entry[0], 'title': entry[1], 'url': entry[2], 'time': entry[3], 'favicon': entry[4]}
+                             for entry in history_manager.search(query, limit)] if query else []
+    if kind in ('all', 'bookmark'):
+        result['bookmark'] = [{'id': bookmark[0], 'title': bookmark[1], 'url': bookmark[2], 'favicon': bookmark[3],
+                               'folder_id': bookmark[4]}
+                              for bookmark in bookmark_manager.search(query, limit)] if query else []
+    return jsonify(result)
+
+
 @app.route('/add_history', methods=['POST'])
 def add_history():
     data = request.get_json()
@@ -147,13 +292,7 @@ def add_history():
     url = data['url']
     time = data['time']
 
-    # Handle favicon correctly
-    favicon = None
-    if 'favicon' in data and isinstance(data['favicon'], str) and data['favicon']:
-        try:
-            favicon = base64.b64decode(data['favicon'])
-        except (TypeError, ValueError) as e:
-            print(f"Invalid favicon data: {e}")
+    favicon = decode_favicon(data.get('favicon'))
 
     # Add history entry to database
     history_manager.add_history_entry(title, url, time, favicon)
@@ -171,11 +310,107 @@ def remove_history():
 
 @app.route('/clear_history', methods=['POST'])
 def clear_history():
-    history_entries = history_manager.get_history()
-    for entry in history_entries:
-        history_manager.remove_history_entry(entry[0])
-    return jsonify({'message': 'History cleared successfully'})
+    deleted = history_manager.clear_history()
+    return jsonify({'message': 'History cleared successfully', 'deleted': deleted})
+
+
+@app.route('/delete_history', methods=['POST'])
+def delete_history():
+    # One of: a list of ids, a domain with its subdomains, or a from/to range (either end may be open)
+    data = request.get_json(silent=True) or {}
+    vacuum = bool(data.get('vacuum', True))
+    ids = data.get('ids')
+    if ids is not None and not (isinstance(ids, list) and all(type(history_id) is int for history_id in ids)):
+        return jsonify({'message': 'ids must be a list of integers'}), 400
+    if data.get('domain') is not None and not isinstance(data['domain'], str):
+        return jsonify({'message': 'domain must be a string'}), 400
+    if ids:
+        deleted = history_manager.remove_history_entries(ids, vacuum)
+    elif data.get('domain'):
+        deleted = history_manager.remove_history_domain(data['domain'], vacuum)
+    elif data.get('from') or data.get('to'):
+        deleted = history_manager.remove_history_range(data.get('from') or None, end_of_day(data.get('to') or None),
+                                                       vacuum)
+    else:
+        return jsonify({'message': 'Pass ids, domain, from or to'}), 400
+    return jsonify({'message': 'History entries removed successfully', 'deleted': deleted})
+
+
+def download(lines, filename, format):
+    # Streamed line by line as the export reads its cursor, so memory stays flat however large the file
+    return Response(lines, mimetype=MIMETYPES[format],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+def upload_error(format):
+    # Imports take a raw body rather than JSON, so a cross-site form could post one: only the file's own
+    # content type is accepted, which makes browsers send a CORS preflight this server never answers
+    origin = request.headers.get('Origin')
+    if origin and not origin.startswith('jaal://') and origin.rstrip('/') != request.host_url.rstrip('/'):
+        return jsonify({'message': "Imports are only accepted from the browser's own pages"}), 403
+    expected = MIMETYPES[format].split(';')[0]
+    if request.mimetype != expected:
+        return jsonify({'message': f'Content-Type must be {expected}'}), 415
+    return None
+
+
+@app.route('/export_history', methods=['GET'])
+def export_history_file():
+    return download(export_history(history_manager), 'history.jsonl', 'jsonl')
+
+
+@app.route('/import_history', methods=['POST'])
+def import_history_file():
+    error = upload_error('jsonl')
+    if error:
+        return error
+
+    # The body is read line by line from the request stream and written in batched transactions
+    result = import_history(history_manager, request.stream)
+    return jsonify(dict({'message': 'History imported successfully'}, **result))
+
+
+@app.route('/export_bookmark', methods=['GET'])
+def export_bookmark_file():
+    format = request.args.get('format', 'jsonl')
+    if format not in FORMATS:
+        return jsonify({'message': 'Format must be jsonl or html'}), 400
+    return download(export_bookmarks(bookmark_manager, format), 'bookmarks.' + format, format)
+
+
+@app.route('/import_bookmark', methods=['POST'])
+def import_bookmark_file():
+    format = request.args.get('format', 'jsonl')
+    if format not in FORMATS:
+        return jsonify({'message': 'Format must be jsonl or html'}), 400
+    error = upload_error(format)
+    if error:
+        return error
+    result = import_bookmarks(bookmark_manager, request.stream, format)
+    return jsonify(dict({'message': 'Bookmarks imported successfully'}, **result))
+
+
+@app.route('/performance')
+def performance():
+    return app.send_static_file('performance.html')
+
+
+@app.route('/get_performance', methods=['GET'])
+def get_performance():
+    since = request.args.get('since', type=int)
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    return jsonify({
+        'domains': performance_manager.get_summary(since),
+        'recent': performance_manager.get_recent(limit)
+    })
+
+
+@app.route('/clear_performance', methods=['POST'])
+def clear_performance():
+    deleted = performance_manager.clear()
+    return jsonify({'message': 'Timings cleared successfully', 'deleted': deleted})
 
 
 if __name__ == '__main__':
     app.run(port=5000)
+
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+ENGINES = ('threaded', 'asgi')
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    # HTTP/1.1 keeps connections open between requests of the same page
+    protocol_version = 'HTTP/1.1'
+
+    def log_request(self, code='-', size='-'):
+        # Writing a log line per request costs more than serving the internal APIs
+        pass
+
+
+class ServerThread(threading.Thread):
+    """
+    Run the internal Flask app in a daemon thread with a selectable server engine.
+
+    ``threaded`` serves the WSGI app from a thread pool (waitress when installed, otherwise the
+    multi-threaded Werkzeug server with HTTP/1.1 keep-alive). ``asgi`` wraps the same routes for
+    uvicorn's asyncio loop and needs ``uvicorn`` and ``asgiref``. ``ready`` is set once the socket
+    is listening, or when starting failed, in which case ``error`` holds the reason.
+
+    :since: 1.0.0
+    """
+
+    def __init__(self, app, host='127.0.0.1', port=5000, engine='threaded', threads=8, keep_alive=15):
+        super().__init__(daemon=True)
+        self.app = app
+        self.host = host
+        self.port = port
+        self.engine = engine if engine in ENGINES else 'threaded'
+        self.threads = threads
+        self.keep_alive = keep_alive
+        self.ready = threading.Event()
+        self.error = None
+        self.server = None
+
+    def wait_ready(self, timeout=5.0) -> bool:
+        """
+        Block until the server listens or failed to start.
+
+        :param timeout: Seconds to wait at most.
+        :return: True if the server is listening.
+        :since: 1.0.0
+        """
+        return self.ready.wait(timeout) and self.error is None
+
+    def run(self):
+        try:
+            if self.engine == 'asgi':
+                self.run_asgi()
+            else:
+                self.run_threaded()
+        except (Exception, SystemExit) as e:
+            # uvicorn exits instead of raising when it cannot bind
+            self.error = e
+            print(f"Internal server stopped: {e}")
+        finally:
+            self.ready.set()
+
+    def run_threaded(self):
+        try:
+            from waitress import create_server
+        except ImportError:
+            create_server = None
+
+        # Both servers bind in their constructor, so the port is listening once it returns
+        if create_server:
+            self.server = create_server(self.app, host=self.host, port=self.port, threads=self.threads,
+                                        channel_timeout=self.keep_alive)
+            self.ready.set()
+            self.server.run()
+        else:
+            self.server = make_server(self.host, self.port, self.app, threaded=True,
+                                      request_handler=KeepAliveRequestHandler)
+            self.ready.set()
+            self.server.serve_forever()
+
+    def run_asgi(self):
+        import uvicorn
+        from asgiref.wsgi import WsgiToAsgi
+
+        config = uvicorn.Config(WsgiToAsgi(self.app), host=self.host, port=self.port, log_level='warning',
+                                timeout_keep_alive=self.keep_alive)
+        self.server = uvicorn.Server(config)
+
+        async def serve():
+            task = asyncio.ensure_future(self.server.serve())
+            while not self.server.started and not task.done():
+                await asyncio.sleep(0.005)
+            if self.server.started:
+                self.ready.set()
+            await task
+
+        asyncio.run(serve())
+        if not self.server.started:
+            raise RuntimeError(f"could not listen on {self.host}:{self.port}")
+
+    def stop(self):
+        """
+        Ask the server to stop serving.
+
+        :return: None
+        :since: 1.0.0
+        """
+        if self.server is None:
+            return
+        if hasattr(self.server, 'should_exit'):
+            self.server.should_exit = True
+        elif hasattr(self.server, 'shutdown'):
+            self.server.shutdown()
+        else:
+            self.server.close()
@@ -1,4 +1,3 @@
-const API_KEY = 'your_api_key';
 const weatherWidget = document.getElementById('weather-widget');
 const newsWidget = document.getElementById('news-widget');
 const currencyWidget = document.getElementById('currency-widget');
@@ -27,109 +26,65 @@ const search = async (query) => {
 	}
 };
 
-// Helper function to cache data in localStorage
-const cacheData = (key, data) => {
-	localStorage.setItem(key, JSON.stringify({ timestamp: Date.now(), data }));
-};
-
-// Helper function to retrieve cached data
-const getCachedData = (key, maxAge = 600000) => { // 10 minutes cache
-	const cached = localStorage.getItem(key);
-	if (!cached) return null;
+// Weather, news and currency come from one internal endpoint, cached on the server for all home tabs
+const fetchDashboard = async (retries = 3) => {
+	try {
+		const response = await fetch('dashboard');
+		const { widgets, pending } = await response.json();
 
-	const { timestamp, data } = JSON.parse(cached);
-	if (Date.now() - timestamp > maxAge) {
-		localStorage.removeItem(key);
-		return null;
-	}
-	return data;
-};
+		if (widgets.weather) updateWeather(widgets.weather);
+		if (widgets.news) updateNews(widgets.news);
+		if (widgets.currency) updateCurrency(widgets.currency);
 
-// Fetch weather data
-const fetchWeather = async () => {
-	const cachedWeather = getCachedData('weather');
-	if (cachedWeather) {
-		updateWeather(cachedWeather);
-		return;
-	}
-
-	try {
-		const response = await fetch(`https://api.openweathermap.org/data/2.5/weather?q=Dhaka&appid=${API_KEY}&units=metric`);
-		const data = await response.json();
-		cacheData('weather', data);
-		updateWeather(data);
+		// Widgets fetched for the first time may still be on their way
+		const waiting = pending.filter(name => !widgets[name]);
+		if (waiting.length && retries > 0) {
+			setTimeout(() => fetchDashboard(retries - 1), 1000);
+		}
 	} catch (error) {
 		// Fail silently or show minimal error to keep UI clean
-		console.error('Unable to fetch weather data.');
+		console.error('Unable to fetch dashboard data.');
 	}
 };
 
-const updateWeather = (data) => {
+const updateWeather = (weather) => {
 	const tempEl = document.getElementById('weather-temp');
 	const descEl = document.getElementById('weather-desc');
 	const loader = document.querySelector('#weather-widget .loading');
 
-	if (tempEl) tempEl.textContent = `${Math.round(data.main.temp)}°C`;
-	if (descEl) descEl.textContent = data.weather[0].description;
+	if (tempEl) tempEl.textContent = `${Math.round(weather.temp)}°C`;
+	if (descEl) descEl.textContent = weather.description;
 	if (loader) loader.remove();
 };
 
-// Fetch news data from Ulkaa News
-const fetchNews = async () => {
-	const cachedNews = getCachedData('news');
-	if (cachedNews) {
-		updateNews(cachedNews);
-		return;
-	}
-
-	try {
-		const response = await fetch('https://news.ulkaa.com/wp-json/wp/v2/posts?_fields=title,link,date&per_page=6');
-		const data = await response.json();
-		cacheData('news', data);
-		updateNews(data);
-	} catch (error) {
-		console.error('Unable to fetch news.');
-	}
+const escapeHtml = (text) => {
+	const div = document.createElement('div');
+	div.textContent = text;
+	return div.innerHTML;
 };
 
 const updateNews = (articles) => {
 	const newsList = document.getElementById('news-list');
 	if (!newsList) return;
 
+	// Feed titles and links are third-party text, so they are never parsed as HTML on the jaal:// page
+
 	newsList.innerHTML = articles.map(article => `
         <li class="group">
-            <a href="${article.link}" target="_blank" class="block p-4 rounded-xl bg-white/5 hover:bg-white/10 transition-all border border-white/5 hover:border-white/20">
-                <h3 class="text-gray-200 group-hover:text-green-400 font-medium transition-colors line-clamp-2 mb-2">${article.title.rendered}</h3>
+            <a target="_blank" class="block p-4 rounded-xl bg-white/5 hover:bg-white/10 transition-all border border-white/5 hover:border-white/20">
+                <h3 class="text-gray-200 group-hover:text-green-400 font-medium transition-colors line-clamp-2 mb-2">${escapeHtml(article.title)}</h3>
                 <p class="text-xs text-gray-500">
                     ${new Date(article.date).toLocaleString('en-US', { dateStyle: 'medium' })}
                 </p>
             </a>
         </li>
     `).join('');
+	newsList.querySelectorAll('a').forEach((link, i) => link.setAttribute('href', articles[i].link));
 };
 
-// Fetch currency exchange data
-const fetchCurrencyRate = async () => {
-	const cachedCurrency = getCachedData('currency');
-	if (cachedCurrency) {
-		updateCurrency(cachedCurrency);
-		return;
-	}
-
-	try {
-		const response = await fetch(`https://api.exchangerate-api.com/v4/latest/USD`);
-		const data = await response.json();
-		const rate = data.rates.BDT;
-		cacheData('currency', rate);
-		updateCurrency(rate);
-	} catch (error) {
-		console.error('Unable to fetch currency rate.');
-	}
-};
-
-const updateCurrency = (rate) => {
+const updateCurrency = (currency) => {
 	const rateEl = document.getElementById('currency-rate');
-	if (rateEl) rateEl.textContent = `৳ ${rate.toFixed(2)}`;
+	if (rateEl) rateEl.textContent = `৳ ${currency.rate.toFixed(2)}`;
 };
 
 // Neuron Animation (Canvas)
@@ -340,9 +295,7 @@ const initCalendar = () => {
 
 // Initialization
 document.addEventListener("DOMContentLoaded", () => {
-	fetchWeather();
-	fetchNews();
-	fetchCurrencyRate();
+	fetchDashboard();
 	initNeuronAnimation();
 	initClock();
 	initCalendar();
@@ -355,7 +308,5 @@ document.addEventListener("DOMContentLoaded", () => {
 	}, 1000);
 
 	// Refresh data periodically
-	setInterval(fetchWeather, 600000);
-	setInterval(fetchNews, 600000);
-	setInterval(fetchCurrencyRate, 600000);
+	setInterval(fetchDashboard, 600000);
 });
@@ -0,0 +1,18 @@
+/** Tailwind build for the internal pages, see tool/build_css.py */
+module.exports = {
+    content: {
+        relative: true,
+        files: ['./static/*.html', './static/js/*.js'],
+    },
+    darkMode: 'class',
+    theme: {
+        extend: {
+            colors: {
+                primary: '#39FF14',
+                secondary: '#A855F7',
+                accent: '#06B6D4',
+            }
+        }
+    },
+    plugins: [],
+}
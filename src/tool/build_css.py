@@ -0,0 +1,50 @@
+"""
+Build the Tailwind stylesheet of the internal pages into server/static/css/tailwind.css.
+
+The internal pages link the generated file instead of compiling CSS in the page. Run this after
+changing classes in server/static/*.html or server/static/js/*.js. Uses the tailwindcss executable
+when it is on PATH (see requirements.txt), otherwise the npm package through npx.
+
+Usage: python tool/build_css.py [--watch]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+
+TAILWIND_VERSION = '3.4.5'
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server'))
+CONFIG = os.path.join(SERVER_DIR, 'tailwind.config.js')
+INPUT = os.path.join(SERVER_DIR, 'tailwind.css')
+OUTPUT = os.path.join(SERVER_DIR, 'static', 'css', 'tailwind.css')
+
+
+def tailwind_command():
+    if shutil.which('tailwindcss'):
+        return ['tailwindcss']
+    if shutil.which('npx'):
+        return ['npx', '--yes', 'tailwindcss@' + TAILWIND_VERSION]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--watch', action='store_true', help='Rebuild whenever a page changes')
+    args = parser.parse_args()
+
+    command = tailwind_command()
+    if command is None:
+        print('tailwindcss not found: install the requirements, or Node.js for npx', file=sys.stderr)
+        sys.exit(1)
+
+    command += ['-c', CONFIG, '-i', INPUT, '-o', OUTPUT, '--minify']
+    if args.watch:
+        command.append('--watch')
+    sys.exit(subprocess.call(command, cwd=SERVER_DIR))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Convert history databases to the current schema in place.
+
+Usage: python tool/migrate_history.py [data/history.db ...]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lib.favicon import Favicon
+from lib.history import SCHEMA_VERSION, migrate
+from lib.storage import Storage
+
+
+def migrate_file(db_path):
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    favicon_manager = Favicon(os.path.join(os.path.dirname(os.path.abspath(db_path)), 'favicon.db'))
+    try:
+        with conn:
+            before = migrate(conn.cursor(), favicon_manager)
+        visits = conn.execute('SELECT COUNT(*) FROM visits').fetchone()[0]
+        urls = conn.execute('SELECT COUNT(*) FROM urls').fetchone()[0]
+        if before < SCHEMA_VERSION:
+            # Give the space of the dropped per-visit rows back to the file system, and switch to
+            # incremental auto-vacuum so later bulk deletes can shrink the file cheaply
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+    finally:
+        conn.close()
+    print('%s: version %d -> %d, %d visits, %d urls (%.2fs)'
+          % (db_path, before, SCHEMA_VERSION, visits, urls, time.perf_counter() - start))
+
+
+def main():
+    default_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'history.db')
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='*', default=[default_path], help='History database files')
+    args = parser.parse_args()
+
+    for db_path in args.paths:
+        if not os.path.exists(db_path):
+            print('%s: not found' % db_path, file=sys.stderr)
+            continue
+        migrate_file(db_path)
+    Storage.close_all()
+
+
+if __name__ == '__main__':
+    main()
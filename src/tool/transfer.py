@@ -0,0 +1,77 @@
+"""
+Export history or bookmarks to a file, or import them from one, streaming row by row.
+
+History is JSON Lines; bookmarks are JSON Lines or a Netscape bookmark file (.html), which other
+browsers import and export. Imports add to the existing data. Use - for stdout or stdin.
+
+Usage: python tool/transfer.py export|import history|bookmark FILE [--format jsonl|html] [--data DIR]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from lib.bookmark import Bookmark
+from lib.favicon import Favicon
+from lib.history import History
+from lib.transfer import BATCH, FORMATS, export_bookmarks, export_history, format_of, import_bookmarks, import_history
+
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('action', choices=('export', 'import'))
+    parser.add_argument('kind', choices=('history', 'bookmark'))
+    parser.add_argument('file', help='File to write or read, - for stdout or stdin')
+    parser.add_argument('--format', choices=FORMATS, help='Bookmark file format, by default from the file name')
+    parser.add_argument('--data', default=DATA_DIR, help='Directory of the browser databases')
+    parser.add_argument('--batch', type=int, default=BATCH, help='Rows per transaction when importing')
+    args = parser.parse_args()
+
+    format = args.format or format_of(args.file)
+    if args.kind == 'history' and format != 'jsonl':
+        sys.exit('History is exported and imported as JSON Lines only')
+    if args.action == 'import' and args.file != '-' and not os.path.isfile(args.file):
+        sys.exit(f"{args.file} not found")
+
+    favicon_manager = Favicon(os.path.join(args.data, 'favicon.db'))
+    if args.kind == 'history':
+        manager = History(os.path.join(args.data, 'history.db'), favicon_manager)
+    else:
+        manager = Bookmark(os.path.join(args.data, 'bookmark.db'), favicon_manager)
+    start = time.perf_counter()
+
+    if args.action == 'export':
+        lines = export_history(manager) if args.kind == 'history' else export_bookmarks(manager, format)
+        output = sys.stdout if args.file == '-' else open(args.file, 'w', encoding='utf-8', newline='\n')
+        try:
+            output.writelines(lines)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        print('Exported %s to %s in %.1f s' % (args.kind, args.file, time.perf_counter() - start), file=sys.stderr)
+        return
+
+    def progress(count):
+        print('\r%d imported' % count, end='', file=sys.stderr, flush=True)
+
+    source = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8', errors='replace')
+    try:
+        if args.kind == 'history':
+            result = import_history(manager, source, args.batch, progress)
+        else:
+            result = import_bookmarks(manager, source, format, args.batch, progress)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print('\r' + ', '.join('%s %d' % item for item in result.items()) + ' in %.1f s' % (time.perf_counter() - start),
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()